@@ -0,0 +1,90 @@
+# =============================================================================
+# ### ARCHIVO: alert_manager.py ###
+# =============================================================================
+# Máquina de estados de las alertas tipadas. Cada par (nodo, tipo) está
+# abierto o resuelto; el estado se mantiene en memoria para que deduplicar y
+# resolver sean búsquedas O(1), y se persiste en las columnas alert_type/state.
+#
+# NotificationAggregator agrupa las notificaciones de escritorio por tipo
+# dentro de una ventana de tiempo para que una avalancha de alertas (p. ej.
+# todos los nodos desconectados al reiniciar el gateway) genere un resumen.
+import collections
+import time
+
+ALERT_NODE_OFFLINE = "node_offline"
+ALERT_BATTERY_DRAIN = "battery_drain"
+
+ALERT_TITLES = {
+    ALERT_NODE_OFFLINE: "Alerta de Conexión",
+    ALERT_BATTERY_DRAIN: "Alerta de Batería",
+}
+
+class AlertManager:
+    def __init__(self, db_manager, on_raise=None):
+        self.db = db_manager
+        self.on_raise = on_raise    # on_raise(node_id, tipo, mensaje, severidad) por cada alerta nueva
+        # (node_id, alert_type) -> id de la alerta abierta
+        self.open_alerts = {(node_id, alert_type): alert_id for alert_id, node_id, alert_type in db_manager.get_open_alerts()}
+
+    def is_open(self, node_id, alert_type):
+        return (node_id, alert_type) in self.open_alerts
+
+    def raise_alert(self, node_id, alert_type, message, severity):
+        """Abre una alerta. Devuelve su id, o None si ya había una abierta del mismo tipo para el nodo."""
+        key = (node_id, alert_type)
+        if key in self.open_alerts: return None
+        alert_id = self.db.insert_alert(node_id, message, severity, alert_type)
+        self.open_alerts[key] = alert_id
+        if self.on_raise: self.on_raise(node_id, alert_type, message, severity)
+        return alert_id
+
+    def resolve(self, node_id, alert_type):
+        """Cierra la alerta abierta del tipo indicado. Devuelve True si había una."""
+        alert_id = self.open_alerts.pop((node_id, alert_type), None)
+        if alert_id is None: return False
+        self.db.resolve_alert(alert_id)
+        return True
+
+
+class NotificationAggregator:
+    def __init__(self, window_s, rate_window_s, max_per_rate_window, max_listed=5):
+        self.window_s = window_s
+        self.rate_window_s = rate_window_s
+        self.max_per_rate_window = max_per_rate_window
+        self.max_listed = max_listed
+        self.pending = {}                   # alert_type -> (inicio de la ventana, [(asunto, mensaje)])
+        self.sent_times = collections.deque()
+
+    def add(self, alert_type, subject, message, now=None):
+        now = time.time() if now is None else now
+        if alert_type not in self.pending:
+            self.pending[alert_type] = (now, [])
+        self.pending[alert_type][1].append((subject, message))
+
+    def flush(self, now=None):
+        """Devuelve ([(título, mensaje)], suprimidas) de los grupos cuya ventana ya terminó."""
+        now = time.time() if now is None else now
+        while self.sent_times and now - self.sent_times[0] >= self.rate_window_s:
+            self.sent_times.popleft()
+
+        notifications, suppressed = [], 0
+        for alert_type, (started, items) in list(self.pending.items()):
+            if now - started < self.window_s: continue
+            del self.pending[alert_type]
+            if len(self.sent_times) >= self.max_per_rate_window:
+                suppressed += len(items)
+                continue
+            notifications.append(self.summarize(alert_type, items))
+            self.sent_times.append(now)
+        return notifications, suppressed
+
+    def summarize(self, alert_type, items):
+        label = ALERT_TITLES.get(alert_type, "Alerta")
+        if len(items) == 1:
+            subject, message = items[0]
+            return (f"{label}: {subject}", message)
+        subjects = list(dict.fromkeys(subject for subject, _ in items))
+        listed = ", ".join(subjects[:self.max_listed])
+        if len(subjects) > self.max_listed:
+            listed += f" y {len(subjects) - self.max_listed} más"
+        return (f"{label}: {len(items)} alertas", f"Nodos afectados: {listed}.")
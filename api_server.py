@@ -0,0 +1,171 @@
+# =============================================================================
+# ### ARCHIVO: api_server.py ###
+# =============================================================================
+# API HTTP/JSON local para que otros sistemas consulten los datos sin
+# exportar CSV. Cada petición se atiende en su propio hilo con su propia
+# conexión de solo lectura, de modo que los clientes no frenan la ingesta.
+#
+#   GET /api/latest                 Últimos valores de cada nodo (desde memoria)
+#   GET /api/latest/<node_id>       Últimos valores de un nodo
+#   GET /api/history?node=&start=&end=&before_ts=&before_id=&limit=
+#   GET /api/alerts?severity=&node=&before_ts=&before_id=&limit=
+#   GET /api/stream                 Server-Sent Events con cada lectura nueva
+#   GET /metrics                    Métricas internas en formato de texto de Prometheus
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from database_manager import TELEMETRY_HISTORY_COLUMNS
+from metrics import REGISTRY, PACKETS_DROPPED
+
+HISTORY_FIELDS = [column.split(".")[-1] for column in TELEMETRY_HISTORY_COLUMNS.split(", ")]
+ALERT_FIELDS = ["id", "timestamp", "alias", "message", "severity", "is_read"]
+MAX_PAGE_SIZE = 1000
+
+def _json_default(value):
+    if isinstance(value, datetime): return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def _encode(payload):
+    return json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+
+class ApiServer:
+    def __init__(self, db_manager, timeseries_store, host, port, log_queue, stream_queue_size=100):
+        self.db = db_manager
+        self.store = timeseries_store
+        self.log_queue = log_queue
+        self.stream_queue_size = stream_queue_size
+        self.subscribers = set()
+        self.subscribers_lock = threading.Lock()
+        self.running = False
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        self.log_queue.put(("INFO", f"API local disponible en http://{host}:{port}/api/latest"))
+
+    def stop(self):
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def publish(self, node_id, data, timestamp=None):
+        """Reparte una lectura nueva a los clientes SSE. Nunca bloquea: si un cliente va lento, pierde eventos."""
+        if not self.subscribers: return
+        event = {key: value for key, value in data.items() if key != 'alias'}
+        event['node_id'] = node_id
+        event['timestamp'] = (timestamp or datetime.now()).isoformat()
+        payload = _encode(event)
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                PACKETS_DROPPED.inc(reason="cliente_sse_lento")
+
+    @staticmethod
+    def _page_limit(params, default):
+        # Un límite negativo sería LIMIT -1 en SQLite (toda la tabla)
+        return max(1, min(int(params.get("limit", default)), MAX_PAGE_SIZE))
+
+    # --- Endpoints ---
+    def latest(self, node_id=None):
+        if node_id is None:
+            return 200, self.store.get_all_latest()
+        latest = self.store.get_latest(node_id)
+        return (200, latest) if latest else (404, {"error": f"Sin datos recientes del nodo {node_id}"})
+
+    def history(self, params):
+        limit = self._page_limit(params, 200)
+        before = (params["before_ts"], int(params["before_id"])) if "before_ts" in params and "before_id" in params else None
+        # Una conexión por petición: el cursor del DatabaseManager pertenece al hilo principal
+        # y ThreadingHTTPServer usa un hilo nuevo para cada petición
+        with closing(self.db.create_reader()) as conn:
+            rows = self.db.get_telemetry_history(node_id_suffix=params.get("node"), start_date=params.get("start"), end_date=params.get("end"),
+                                                 before=before, limit=limit, conn=conn)
+        items = [dict(zip(HISTORY_FIELDS, row)) for row in rows]
+        # Cursor para pedir la página siguiente (más antigua)
+        next_page = {"before_ts": rows[-1][1], "before_id": rows[-1][0]} if rows and len(rows) == limit else None
+        return 200, {"items": items, "next": next_page}
+
+    def alerts(self, params):
+        limit = self._page_limit(params, 100)
+        before = (params["before_ts"], int(params["before_id"])) if "before_ts" in params and "before_id" in params else None
+        with closing(self.db.create_reader()) as conn:
+            rows = self.db.get_alerts_page(severity=params.get("severity"), node_id=params.get("node"), before=before, limit=limit, conn=conn)
+        items = [dict(zip(ALERT_FIELDS, row)) for row in rows]
+        next_page = {"before_ts": rows[-1][1], "before_id": rows[-1][0]} if rows and len(rows) == limit else None
+        return 200, {"items": items, "next": next_page}
+
+    def stream(self, handler):
+        subscriber = queue.Queue(maxsize=self.stream_queue_size)
+        with self.subscribers_lock:
+            self.subscribers.add(subscriber)
+        try:
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Cache-Control", "no-cache")
+            handler.end_headers()
+            while self.running:
+                try:
+                    payload = subscriber.get(timeout=15)
+                    handler.wfile.write(b"event: reading\ndata: " + payload + b"\n\n")
+                except queue.Empty:
+                    handler.wfile.write(b": keepalive\n\n")
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.subscribers_lock:
+                self.subscribers.discard(subscriber)
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                parts = [part for part in url.path.split("/") if part]
+                try:
+                    if parts == ["api", "stream"]:
+                        api.stream(self)
+                        return
+                    if parts == ["metrics"]:
+                        self.send_text(200, REGISTRY.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+                        return
+                    if parts == ["api", "latest"]: status, payload = api.latest()
+                    elif len(parts) == 3 and parts[:2] == ["api", "latest"]: status, payload = api.latest(parts[2])
+                    elif parts == ["api", "history"]: status, payload = api.history(params)
+                    elif parts == ["api", "alerts"]: status, payload = api.alerts(params)
+                    else: status, payload = 404, {"error": "Ruta no encontrada"}
+                except ValueError as e:
+                    status, payload = 400, {"error": f"Parámetro no válido: {e}"}
+                except sqlite3.Error as e:
+                    status, payload = 500, {"error": f"Error de base de datos: {e}"}
+                self.send_text(status, _encode(payload), "application/json; charset=utf-8")
+
+            def send_text(self, status, body, content_type):
+                if isinstance(body, str): body = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass    # Sin ruido en la consola por cada petición
+
+        return Handler
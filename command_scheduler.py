@@ -0,0 +1,160 @@
+# =============================================================================
+# ### ARCHIVO: command_scheduler.py ###
+# =============================================================================
+# Programador de comandos diferidos y periódicos (p. ej. el "stop" de un
+# actuador). Los trabajos se guardan en la tabla scheduled_commands, así que
+# los pendientes se reanudan tras un reinicio. En memoria se usa una rueda de
+# temporización (timer wheel): un único hilo avanza un tic por intervalo y solo
+# revisa la ranura de ese tic, sin importar cuántos trabajos haya pendientes.
+#
+# Un trabajo disparado queda "en curso" (estado 'dispatched' en la BD) hasta
+# que la cola de transmisión confirma el envío (ACK si lo pide); solo entonces
+# se da por hecho. Si falla se reintenta pasado retry_s, y los que estaban en
+# curso al reiniciar se vuelven a enviar al arrancar.
+import math
+import threading
+import time
+
+class ScheduledCommand:
+    def __init__(self, job_id, due_at, node_id, command, channel_index, priority, want_ack, interval_s, label):
+        self.job_id = job_id
+        self.due_at = due_at
+        self.node_id = node_id
+        self.command = command
+        self.channel_index = channel_index
+        self.priority = priority
+        self.want_ack = bool(want_ack)
+        self.interval_s = interval_s    # None para comandos de una sola vez
+        self.label = label
+        self.tick = None
+        self.in_flight = False
+
+class CommandScheduler:
+    def __init__(self, db_manager, dispatch, log_queue, tick_s=1.0, wheel_size=512, retry_s=30):
+        self.db = db_manager
+        self.dispatch = dispatch        # dispatch(trabajo, on_result) -> True si se pudo encolar; on_result(éxito) al terminar el envío
+        self.log_queue = log_queue
+        self.tick_s = tick_s
+        self.wheel_size = wheel_size
+        self.retry_s = retry_s
+        self.slots = [[] for _ in range(wheel_size)]     # cada ranura: [(tic, trabajo)]
+        self.jobs = {}                                     # id -> trabajo vigente
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.current_tick = self._tick_for(time.time())
+        # Conexión propia: los trabajos se disparan desde el hilo del programador
+        self.conn = db_manager.create_reader()
+        self.thread = None
+
+    def _tick_for(self, timestamp):
+        return math.ceil(timestamp / self.tick_s)
+
+    def _place(self, job):
+        # Los trabajos vencidos (p. ej. tras un reinicio) se disparan en el siguiente tic
+        job.tick = max(self._tick_for(job.due_at), self.current_tick + 1)
+        self.slots[job.tick % self.wheel_size].append((job.tick, job))
+
+    def start(self):
+        """Carga los trabajos pendientes de la BD y arranca el hilo."""
+        with self.lock:
+            for row in self.db.get_pending_commands(conn=self.conn):
+                job = ScheduledCommand(*row)
+                self.jobs[job.job_id] = job
+                self._place(job)
+        if self.jobs:
+            self.log_queue.put(("INFO", f"{len(self.jobs)} comando(s) programado(s) restaurado(s)."))
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self.conn.close()
+
+    def schedule(self, command, node_id=None, delay_s=0, interval_s=None, channel_index=0, priority=0, want_ack=False, label=None):
+        """Programa un comando. Devuelve el id del trabajo."""
+        due_at = time.time() + delay_s
+        with self.lock:
+            job_id = self.db.add_scheduled_command(due_at, node_id, command, channel_index, priority, want_ack, interval_s, label, conn=self.conn)
+            job = ScheduledCommand(job_id, due_at, node_id, command, channel_index, priority, want_ack, interval_s, label)
+            self.jobs[job_id] = job
+            self._place(job)
+        return job_id
+
+    def cancel(self, job_id):
+        with self.lock:
+            # La entrada de la rueda queda obsoleta y se descarta al llegar su tic
+            if self.jobs.pop(job_id, None) is None: return False
+            self.db.update_scheduled_command(job_id, state="cancelled", conn=self.conn)
+        return True
+
+    def reschedule(self, job_id, delay_s):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None: return False
+            job.due_at = time.time() + delay_s
+            job.in_flight = False
+            self.db.update_scheduled_command(job_id, due_at=job.due_at, state="pending", conn=self.conn)
+            self._place(job)
+        return True
+
+    def pending(self):
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda job: job.due_at)
+
+    def _worker(self):
+        while not self.stop_event.wait(max(0.0, (self.current_tick + 1) * self.tick_s - time.time())):
+            now_tick = self._tick_for(time.time())
+            due = []
+            with self.lock:
+                # Si el hilo se retrasó se recorren los tics perdidos (como mucho una vuelta)
+                first_tick = max(self.current_tick + 1, now_tick - self.wheel_size + 1)
+                for tick in range(first_tick, now_tick + 1):
+                    slot = self.slots[tick % self.wheel_size]
+                    remaining = []
+                    for entry_tick, job in slot:
+                        if self.jobs.get(job.job_id) is not job or job.tick != entry_tick:
+                            continue    # cancelado o reprogramado
+                        if entry_tick <= now_tick: due.append(job)
+                        else: remaining.append((entry_tick, job))
+                    self.slots[tick % self.wheel_size] = remaining
+                self.current_tick = now_tick
+
+            for job in due:
+                self._fire(job)
+
+    def _fire(self, job):
+        with self.lock:
+            if self.jobs.get(job.job_id) is not job: return
+            job.in_flight = True
+            self.db.update_scheduled_command(job.job_id, state="dispatched", conn=self.conn)
+        try:
+            queued = self.dispatch(job, lambda success: self._on_result(job, success))
+        except Exception as e:
+            self.log_queue.put(("ERROR", f"Error al ejecutar el comando programado #{job.job_id}: {e}"))
+            queued = False
+        if not queued:
+            self._on_result(job, False)
+
+    def _on_result(self, job, success):
+        """Resultado del envío de un trabajo en curso (puede llegar desde el hilo de transmisión)."""
+        with self.lock:
+            if self.jobs.get(job.job_id) is not job or not job.in_flight: return
+            job.in_flight = False
+            if not success:
+                # Sin conexión o sin ACK: se reintenta más tarde sin perder el comando
+                self.log_queue.put(("WARNING", f"El comando programado #{job.job_id} no se pudo entregar; se reintentará en {self.retry_s}s."))
+                job.due_at = time.time() + self.retry_s
+                self.db.update_scheduled_command(job.job_id, due_at=job.due_at, state="pending", conn=self.conn)
+                self._place(job)
+            elif job.interval_s:
+                # Los periodos perdidos no se acumulan: se salta al siguiente instante futuro
+                now = time.time()
+                periods = max(1, math.ceil((now - job.due_at) / job.interval_s))
+                job.due_at += periods * job.interval_s
+                self.db.update_scheduled_command(job.job_id, due_at=job.due_at, state="pending", conn=self.conn)
+                self._place(job)
+            else:
+                del self.jobs[job.job_id]
+                self.db.update_scheduled_command(job.job_id, state="done", conn=self.conn)
@@ -6,6 +6,23 @@ DB_NAME = "ecolora_data.db"
 # --- Interfaz Gráfica ---
 UPDATE_INTERVAL_MS = 1000  # Intervalo de actualización de la GUI en milisegundos
 GRAPH_MAX_POINTS = 100     # Número máximo de puntos a mostrar en los gráficos en tiempo real
+HISTORY_CACHE_WINDOWS = 32 # Ventanas del historial (paneo/zoom del detalle) guardadas en caché
+TIMESERIES_MAX_NODES = 64  # Nodos con datos recientes en memoria; se descarta el menos usado (LRU)
+HISTORY_PAGE_SIZE = 200            # Filas que se piden a la BD por página en la pestaña Historial
+HISTORY_TABLE_MAX_ROWS = 1000      # Filas máximas en la tabla del historial; se descartan las del extremo opuesto
+HISTORY_PREFETCH_FRACTION = 0.15   # Fracción del desplazamiento a partir de la cual se precarga la siguiente página
+ALERTS_VISIBLE_ROWS = 15           # Filas de alerta reutilizables en la pestaña de Análisis
+ALERTS_PAGE_SIZE = 100             # Alertas pedidas a la BD por página
+MESSAGES_PAGE_SIZE = 100           # Mensajes cargados al abrir la pestaña y en cada página anterior
+SEARCH_RESULTS_LIMIT = 200         # Resultados máximos de la búsqueda de mensajes y alertas
+
+# --- Monitor Serial ---
+SERIAL_MONITOR_MAX_LINES = 2000        # Líneas máximas en el monitor; las más antiguas se recortan
+SERIAL_MONITOR_INDEX_SIZE = 20000      # Mensajes recientes en memoria para aplicar filtros de nivel/nodo
+SERIAL_MONITOR_PAGE_SIZE = 200         # Mensajes leídos del log persistente con "Cargar Anteriores"
+SERIAL_LOG_FILE = "ecolora_serial_log.jsonl"
+SERIAL_LOG_MAX_BYTES = 20 * 1024 * 1024  # Tamaño a partir del cual se rota el log persistente
+SERIAL_LOG_MAX_READS = 10              # Bloques leídos como máximo por búsqueda de mensajes que cumplan el filtro
 
 # --- Mapeo de Nodos ---
 # Asigna nombres amigables a los IDs de tus nodos Meshtastic.
@@ -17,3 +34,90 @@ NODE_ALIASES = {
     # Añade aquí los alias de tus otros nodos
 }
 
+# --- Perfil de Arranque ---
+STARTUP_PROFILE = False                       # También se activa con --profile-startup o ECOLORA_PROFILE_STARTUP=1
+STARTUP_PROFILE_FILE = "startup_profile.txt"  # Archivo donde se guarda el informe
+STARTUP_PROFILE_TOP_IMPORTS = 40              # Número de módulos más lentos a incluir en el informe
+
+# --- Perfil del Bucle de Eventos ---
+LOOP_PROFILE = False                    # También se activa con --profile-loop, ECOLORA_PROFILE_LOOP=1 o desde Diagnóstico
+LOOP_PROFILE_FILE = "loop_profile.txt"  # Archivo donde se acumulan los informes (para enviarlo desde campo)
+LOOP_PROFILE_SLOW_MS = 100              # Callbacks más lentos que esto se registran con pilas y memoria
+LOOP_PROFILE_SAMPLE_MS = 5              # Intervalo de muestreo de la pila del hilo principal
+LOOP_PROFILE_STACK_DEPTH = 15           # Marcos de pila guardados por muestra
+LOOP_PROFILE_TRACEMALLOC_FRAMES = 1     # Marcos por asignación que guarda tracemalloc
+LOOP_PROFILE_TRACEMALLOC_TOP = 10       # Líneas con más asignaciones nuevas en cada informe
+
+# --- Instantánea de Estado ---
+SNAPSHOT_FILE = "ecolora_state.snapshot"  # Estado en memoria guardado entre reinicios (JSON + gzip)
+SNAPSHOT_INTERVAL_MS = 300000             # Intervalo de guardado periódico (5 minutos)
+SNAPSHOT_MAX_AGE_HOURS = 24               # Las instantáneas más antiguas se ignoran al arrancar
+
+# --- Exportación ---
+EXPORT_CHUNK_SIZE = 5000  # Filas leídas de la BD y escritas por bloque al exportar
+
+# --- Detección de Nodos Desconectados ---
+HEARTBEAT_TIMEOUT_MINUTES = 30  # Minutos sin paquetes tras los que un nodo se considera desconectado
+# Tiempos de espera propios de algunos nodos (en minutos), p. ej. los que reportan con poca frecuencia.
+# Ejemplo: '!a1b2c3d4': 120
+NODE_HEARTBEAT_TIMEOUTS = {
+}
+
+# --- Notificaciones de Alertas ---
+ALERT_AGGREGATION_WINDOW_S = 5     # Segundos durante los que se agrupan alertas del mismo tipo en una notificación
+ALERT_NOTIFY_RATE_WINDOW_S = 60    # Ventana del límite de notificaciones de escritorio
+ALERT_NOTIFY_MAX_PER_WINDOW = 3    # Notificaciones máximas por ventana; el resto solo queda en la lista de alertas
+
+# --- Suavizado de Lecturas ---
+# Filtro de cada métrica (ver stream_filters.py): ("sma", N), ("ewma", alfa), ("median", N) o ("hampel", N, sigmas).
+# None deja la métrica sin suavizar.
+SMOOTHING_FILTERS = {
+    'temperature': ("sma", 5),
+    'humidity': ("sma", 5),
+    'pressure': ("sma", 5),
+    'iaq': ("median", 5),      # La resistencia del gas tiene picos aislados
+    'battery': ("sma", 5),
+}
+# Filtros propios de algunos nodos; sustituyen a los de SMOOTHING_FILTERS en las métricas indicadas.
+# Ejemplo: '!a1b2c3d4': {'temperature': ("hampel", 7, 3.0)}
+NODE_SMOOTHING_FILTERS = {
+}
+
+# --- Reglas del Bot ---
+RULE_DEFAULT_COOLDOWN_S = 600      # Tiempo mínimo entre dos disparos de una regla para el mismo nodo
+RULE_MAX_ACTIONS_PER_MINUTE = 5    # Máximo de acciones de reglas por minuto entre todas las reglas
+
+# --- Transmisión ---
+LORA_DUTY_CYCLE = 0.10       # Fracción máxima de tiempo en el aire (EU_868 banda g3: 10 %; usar 1.0 si la región no lo limita)
+LORA_BITRATE_BPS = 1070      # Tasa de datos del preset LongFast, para estimar el tiempo en el aire
+TX_ACK_TIMEOUT_S = 30        # Espera máxima del ACK antes de reintentar
+TX_MAX_RETRIES = 2           # Reintentos de los mensajes que piden ACK
+
+# --- Comandos Programados ---
+COMMAND_SCHEDULER_TICK_S = 1.0       # Resolución de la rueda de temporización
+COMMAND_SCHEDULER_WHEEL_SIZE = 512   # Ranuras de la rueda (una vuelta = 512 tics)
+COMMAND_RETRY_S = 30                 # Espera antes de reintentar un comando programado si no hay conexión
+
+# --- Sondeo de la Flota ---
+POLL_WINDOW_S = 300             # Ventana en la que se reparte una ronda de solicitudes a todos los nodos
+POLL_MIN_SPACING_S = 5          # Separación mínima entre dos solicitudes
+POLL_FRESHNESS_S = 600          # Los nodos con datos más recientes que esto no se vuelven a pedir
+POLL_TARGET_CHANNEL_UTIL = 25   # % de utilización del canal a partir del cual se espacian más las solicitudes
+
+# --- API Local ---
+API_ENABLED = True           # Servir los datos por HTTP/JSON para otros sistemas
+API_HOST = "127.0.0.1"       # Solo accesible desde este equipo; usar "0.0.0.0" para abrirla a la red
+API_PORT = 8765              # Puerto de la API local
+API_STREAM_QUEUE_SIZE = 100  # Eventos en espera por cliente SSE antes de descartar los nuevos
+
+# --- Diagnóstico ---
+DIAGNOSTICS_REFRESH_MS = 2000   # Intervalo de refresco del panel de diagnóstico
+READING_VISIBLE_SLA_S = 2.0     # Objetivo: lectura visible en pantalla antes de esto tras recibirla
+
+# --- Proceso de Ingesta ---
+INGEST_PROCESS = False                              # True: recepción, reglas y BD en un proceso aparte (también con --ingest-process)
+INGEST_RING_FILE = "ecolora_ingest.ring"            # Búfer compartido ingesta -> GUI (lecturas, nodos, posiciones, mensajes)
+INGEST_COMMAND_RING_FILE = "ecolora_commands.ring"  # Búfer compartido GUI -> ingesta (envíos); el servicio guarda en <archivo>.pos el último atendido
+INGEST_RING_CAPACITY = 4096                         # Registros por búfer (384 bytes cada uno)
+INGEST_HEARTBEAT_TIMEOUT_S = 5                      # Sin latido del proceso de ingesta durante esto se da por detenido
+INGEST_START_TIMEOUT_S = 30                         # Espera máxima a que el proceso de ingesta conecte con el nodo
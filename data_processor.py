@@ -4,20 +4,28 @@
 import collections
 from datetime import datetime, timedelta
 import json
+import time
+import config
+from metrics import RULE_EVALUATION_SECONDS, RULE_ACTIONS
+from alert_manager import ALERT_BATTERY_DRAIN
+from rule_throttle import RuleThrottle, condition_cleared
+from stream_filters import create_filter, filter_batch, DEFAULT_SPEC
 
 class DataProcessor:
-    def __init__(self, db_manager, log_queue):
+    def __init__(self, db_manager, log_queue, alert_manager):
         self.db_manager = db_manager
         self.log_queue = log_queue # Guardar referencia a la cola
-        self.node_data_history = {}
-        self.window_size = 5
+        self.alert_manager = alert_manager
+        self.node_data_history = {}     # node_id -> {métrica: filtro de stream_filters}
         self.last_battery_check = {}
+        self.rule_throttle = RuleThrottle(config.RULE_DEFAULT_COOLDOWN_S, config.RULE_MAX_ACTIONS_PER_MINUTE)
 
     def evaluate_rules(self, data, serial_manager):
         """Evalúa reglas multi-condicionales y ejecuta acciones."""
         node_id = data.get('node_id')
         if not node_id: return
 
+        start = time.perf_counter()
         rules = self.db_manager.get_bot_rules()
         self.log_queue.put(("DEBUG", f"Evaluando {len(rules)} reglas para el nodo {node_id[-4:]}"))
 
@@ -26,7 +34,9 @@ class DataProcessor:
                 conditions = json.loads(conditions_json)
                 action = json.loads(action_json)
                 
+                hysteresis = float(action.get('hysteresis', 0))
                 all_conditions_met = True
+                any_cleared = False
                 for condition in conditions:
                     metric = condition['metric']
                     operator = condition['operator']
@@ -34,9 +44,11 @@ class DataProcessor:
                     
                     if metric not in data or data[metric] is None:
                         all_conditions_met = False
-                        break
+                        continue
                     
                     current_value = data[metric]
+                    if condition_cleared(operator, current_value, value, hysteresis):
+                        any_cleared = True
                     
                     match = False
                     if operator == '>' and current_value > value: match = True
@@ -44,18 +56,27 @@ class DataProcessor:
                     elif operator == '==' and current_value == value: match = True
                     elif operator == '!=' and current_value != value: match = True
                     
+                    # Se revisan todas las condiciones: cualquiera despejada rearma la regla
                     if not match:
                         all_conditions_met = False
-                        break
                 
+                # La regla se rearma solo cuando la condición se despeja con margen de histéresis
+                if any_cleared:
+                    self.rule_throttle.clear(rule_id, node_id)
+
                 if all_conditions_met:
-                    # --- NUEVO LOG ---
-                    self.log_queue.put(("INFO", f"¡Regla '{alias}' cumplida! Ejecutando acción."))
-                    self.execute_action(action, data, serial_manager)
+                    fire, reason = self.rule_throttle.should_fire(rule_id, node_id, action.get('cooldown_s'))
+                    RULE_ACTIONS.inc(result="fired" if fire else reason)
+                    if fire:
+                        self.log_queue.put(("INFO", f"¡Regla '{alias}' cumplida! Ejecutando acción."))
+                        self.execute_action(action, data, serial_manager)
+                    elif reason != 'hysteresis':
+                        self.log_queue.put(("DEBUG", f"Regla '{alias}' cumplida pero suprimida ({reason})."))
 
             except (json.JSONDecodeError, KeyError, ValueError) as e:
                 serial_manager.log_queue.put(("ERROR", f"Error procesando regla ID {rule_id}: {e}"))
                 continue
+        RULE_EVALUATION_SECONDS.observe(time.perf_counter() - start)
         
         if 'battery' in data and data['battery'] is not None:
             self.check_battery_drain_rate(node_id, data['battery'])
@@ -95,45 +116,90 @@ class DataProcessor:
             drain_rate = last_check["level"] - current_battery
             
             if drain_rate > 15:
-                last_alert = self.db_manager.get_last_alert_for_node(node_id)
-                if not last_alert or "Descarga rápida de batería" not in last_alert[0]:
-                    message = f"Descarga rápida de batería detectada ({drain_rate}% en ~1 hora)."
-                    self.db_manager.insert_alert(node_id, message, "WARNING")
+                message = f"Descarga rápida de batería detectada ({drain_rate}% en ~1 hora)."
+                self.alert_manager.raise_alert(node_id, ALERT_BATTERY_DRAIN, message, "WARNING")
+            elif self.alert_manager.resolve(node_id, ALERT_BATTERY_DRAIN):
+                self.log_queue.put(("INFO", f"Descarga de batería del nodo {node_id[-4:]} normalizada."))
             
             self.last_battery_check[node_id] = {"level": current_battery, "time": now}
 
+    def filter_spec(self, node_id, metric):
+        """Filtro configurado para una métrica de un nodo (None: sin suavizado)."""
+        node_filters = config.NODE_SMOOTHING_FILTERS.get(node_id, {})
+        return node_filters[metric] if metric in node_filters else config.SMOOTHING_FILTERS.get(metric)
+
+    def get_filter(self, node_id, metric):
+        history = self.node_data_history.setdefault(node_id, {})
+        if metric not in history:
+            spec = self.filter_spec(node_id, metric)
+            if spec is None: return None
+            try:
+                history[metric] = create_filter(spec)
+            except ValueError as e:
+                self.log_queue.put(("ERROR", f"Filtro de suavizado no válido para '{metric}' del nodo {node_id[-4:]} ({e}); se usa {DEFAULT_SPEC}."))
+                history[metric] = create_filter(DEFAULT_SPEC)
+        return history[metric]
+
     def smooth_data(self, data):
-        """Aplica un suavizado de promedio móvil a los datos del nodo."""
+        """Suaviza las métricas de una lectura con el filtro de cada una. Modifica y devuelve el mismo diccionario."""
         node_id = data.get('node_id')
         if not node_id:
             return data # Devuelve los datos originales si no hay ID de nodo
 
-        # Inicializa el historial para un nodo nuevo
-        if node_id not in self.node_data_history:
-            self.node_data_history[node_id] = {
-                'temperature': collections.deque(maxlen=self.window_size),
-                'humidity': collections.deque(maxlen=self.window_size),
-                'pressure': collections.deque(maxlen=self.window_size),
-                'battery': collections.deque(maxlen=self.window_size),
-            }
-
-        history = self.node_data_history[node_id]
-        smoothed_data = data.copy()
-
-        # Itera sobre las métricas que se pueden promediar
-        for metric in ['temperature', 'humidity', 'pressure', 'battery']:
-            if metric in data and data[metric] is not None:
-                # Agrega el nuevo valor al historial
-                history[metric].append(data[metric])
-
-                # Calcula el promedio móvil si el historial está lleno
-                if len(history[metric]) > 0:
-                    avg_value = sum(history[metric]) / len(history[metric])
-                    # Redondea para que no tenga tantos decimales
-                    smoothed_data[metric] = round(avg_value, 2)
-
-        return smoothed_data
-     
+        for metric in config.SMOOTHING_FILTERS.keys() | config.NODE_SMOOTHING_FILTERS.get(node_id, {}).keys():
+            if data.get(metric) is None: continue
+            stream = self.get_filter(node_id, metric)
+            if stream is not None:
+                # Redondea para que no tenga tantos decimales
+                data[metric] = round(stream.update(data[metric]), 2)
+        return data
+
+    def smooth_batch(self, readings):
+        """Suaviza con NumPy lecturas ya ordenadas por fecha (p. ej. importadas) sin tocar los filtros en flujo. Modifica y devuelve la lista."""
+        by_node = collections.defaultdict(list)
+        for reading in readings:
+            if reading.get('node_id'): by_node[reading['node_id']].append(reading)
+        for node_id, node_readings in by_node.items():
+            for metric in config.SMOOTHING_FILTERS.keys() | config.NODE_SMOOTHING_FILTERS.get(node_id, {}).keys():
+                spec = self.filter_spec(node_id, metric)
+                present = [reading for reading in node_readings if reading.get(metric) is not None]
+                if spec is None or not present: continue
+                try:
+                    smoothed = filter_batch(spec, [reading[metric] for reading in present])
+                except ValueError:
+                    smoothed = filter_batch(DEFAULT_SPEC, [reading[metric] for reading in present])
+                for reading, value in zip(present, smoothed.round(2).tolist()):
+                    reading[metric] = value
+        return readings
+
+    def export_state(self):
+        """Devuelve las ventanas de suavizado y el control de batería en forma serializable."""
+        return {
+            'node_data_history': {
+                node_id: {metric: stream.state() for metric, stream in history.items()}
+                for node_id, history in self.node_data_history.items()
+            },
+            'last_battery_check': {
+                node_id: {"level": check["level"], "time": check["time"].isoformat()}
+                for node_id, check in self.last_battery_check.items()
+            },
+            'rule_throttle': self.rule_throttle.export_state(),
+        }
+
+    def import_state(self, state):
+        """Restaura el estado guardado por export_state()."""
+        # Cada filtro se reanuda con la ventana guardada, aunque la haya guardado otro tipo de filtro
+        for node_id, history in state.get('node_data_history', {}).items():
+            for metric, values in history.items():
+                stream = self.get_filter(node_id, metric)
+                if stream is not None: stream.load(values)
+        for node_id, check in state.get('last_battery_check', {}).items():
+            try:
+                self.last_battery_check[node_id] = {"level": check["level"], "time": datetime.fromisoformat(check["time"])}
+            except (KeyError, TypeError, ValueError):
+                continue
+        self.rule_throttle.import_state(state.get('rule_throttle', {}))
+
     def get_bot_analysis_message(self, data):
         alias = data.get('alias', data.get('node_id', 'desconocido')[-4:])
         temp = data.get('temperature')
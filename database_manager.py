@@ -2,16 +2,27 @@
 # ### ARCHIVO: database_manager.py ###
 # =============================================================================
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import json
+import time
+import config
+from metrics import DB_WRITE_SECONDS
+
+# Columnas del historial de lecturas (pestaña Historial y exportaciones)
+TELEMETRY_HISTORY_COLUMNS = "r.id, r.timestamp, r.node_id, n.alias, r.temperature, r.humidity, r.pressure, n.battery, n.latitude, n.longitude"
 
 class DatabaseManager:
     def __init__(self, db_name):
         self.db_name = db_name
         self.conn = sqlite3.connect(db_name, check_same_thread=False)
         self.cursor = self.conn.cursor()
+        # WAL: las lecturas largas de otras conexiones (exportaciones, historial, API, el
+        # proceso de ingesta) no bloquean las escrituras, ni estas a aquellas
+        self.cursor.execute("PRAGMA journal_mode=WAL")
         self.create_tables()
         self.check_and_update_tables()
+        self.fts_available = self.create_search_index()
         print("Base de datos configurada correctamente.")
 
     def create_tables(self):
@@ -47,11 +58,24 @@ class DatabaseManager:
                 is_read INTEGER DEFAULT 0,
                 FOREIGN KEY (node_id) REFERENCES nodes (node_id)
             )''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_time_id ON messages (timestamp, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_time_id ON alerts (timestamp, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_node_time ON alerts (node_id, timestamp)")
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS network_links (
                 source_node_id TEXT, target_node_id TEXT, last_snr REAL, last_seen TEXT,
                 PRIMARY KEY (source_node_id, target_node_id)
             )''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_readings_node_time ON readings (node_id, timestamp)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_readings_time_id ON readings (timestamp, id)")
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduled_commands (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                due_at REAL, node_id TEXT, command TEXT, channel_index INTEGER DEFAULT 0,
+                priority INTEGER, want_ack INTEGER DEFAULT 0, interval_s REAL,
+                label TEXT, state TEXT DEFAULT 'pending', created_at TEXT
+            )''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_state_due ON scheduled_commands (state, due_at)")
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS bot_rules (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -74,12 +98,48 @@ class DatabaseManager:
             for col, col_type in node_cols_to_add.items():
                 if col not in columns:
                     self.cursor.execute(f"ALTER TABLE nodes ADD COLUMN {col} {col_type}")
+
+            # Alertas tipadas: tipo (p. ej. 'node_offline') y estado 'open'/'resolved'
+            self.cursor.execute("PRAGMA table_info(alerts)")
+            columns = [info[1] for info in self.cursor.fetchall()]
+            alert_cols_to_add = {"alert_type": "TEXT", "state": "TEXT", "resolved_at": "TEXT"}
+            for col, col_type in alert_cols_to_add.items():
+                if col not in columns:
+                    self.cursor.execute(f"ALTER TABLE alerts ADD COLUMN {col} {col_type}")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_state ON alerts (state, node_id, alert_type)")
             self.conn.commit()
         except sqlite3.Error as e:
             print(f"Error al actualizar la base de datos: {e}")
 
-    def register_node(self, node_id, alias):
+    def create_search_index(self):
+        """Crea los índices FTS5 de mensajes y alertas. Devuelve False si SQLite no incluye FTS5."""
+        try:
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'alerts_fts')")
+            existing = {row[0] for row in self.cursor.fetchall()}
+            # Tablas de contenido externo: el texto se guarda una sola vez, en la tabla original
+            self.cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+            self.cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5(message, content='alerts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+            # Al crearlos por primera vez se indexa el historial existente
+            if 'messages_fts' not in existing:
+                self.cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+            if 'alerts_fts' not in existing:
+                self.cursor.execute("INSERT INTO alerts_fts(alerts_fts) VALUES ('rebuild')")
+            self.conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"Búsqueda de texto completo no disponible (FTS5): {e}")
+            return False
+
+    @contextmanager
+    def _write(self, operation):
+        """Transacción de escritura en la conexión principal, midiendo su latencia (incluido el commit)."""
+        start = time.perf_counter()
         with self.conn:
+            yield
+        DB_WRITE_SECONDS.observe(time.perf_counter() - start, operation=operation)
+
+    def register_node(self, node_id, alias):
+        with self._write("register_node"):
             self.cursor.execute("INSERT OR IGNORE INTO nodes (node_id, alias) VALUES (?, ?)", (node_id, alias))
 
     def update_node_alias(self, node_id, new_alias):
@@ -90,6 +150,18 @@ class DatabaseManager:
         with self.conn:
             self.cursor.execute("UPDATE nodes SET ui_prefs = ? WHERE node_id = ?", (json.dumps(prefs_dict), node_id))
 
+    def record_packet(self, record, local_node_id=None):
+        """Lo que se guarda de cada paquete recibido, tanto en la GUI como en el servicio: alta del
+        nodo, estadísticas de radio y enlace con el nodo local. Devuelve True si el nodo es nuevo."""
+        node_id = record.node_id
+        is_new = not self.get_node(node_id)
+        if is_new:
+            self.register_node(node_id, config.NODE_ALIASES.get(node_id, f"Nodo {node_id[-4:]}"))
+        self.update_node_stats(node_id, record.battery, record.snr, record.rssi, record.hops)
+        if local_node_id and record.snr is not None:
+            self.update_link(node_id, local_node_id, record.snr)
+        return is_new
+
     def get_node(self, node_id):
         self.cursor.execute("SELECT node_id, alias, last_seen, battery, snr, rssi, hops, latitude, longitude, ui_prefs FROM nodes WHERE node_id = ?", (node_id,))
         return self.cursor.fetchone()
@@ -98,16 +170,25 @@ class DatabaseManager:
         self.cursor.execute("SELECT node_id, alias, last_seen, battery, snr, rssi, hops, latitude, longitude, ui_prefs FROM nodes ORDER BY last_seen DESC")
         return self.cursor.fetchall()
     
+    def get_all_nodes(self):
+        self.cursor.execute("SELECT node_id, alias FROM nodes ORDER BY alias")
+        return self.cursor.fetchall()
+
+    def get_node_alias(self, node_id):
+        self.cursor.execute("SELECT alias FROM nodes WHERE node_id = ?", (node_id,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
     def update_node_stats(self, node_id, battery, snr, rssi, hops):
-        with self.conn:
+        with self._write("update_node_stats"):
             self.cursor.execute("UPDATE nodes SET last_seen = ?, battery = COALESCE(?, battery), snr = COALESCE(?, snr), rssi = COALESCE(?, rssi), hops = COALESCE(?, hops) WHERE node_id = ?", (datetime.now().isoformat(), battery, snr, rssi, hops, node_id))
     
     def update_node_position(self, node_id, lat, lon):
-        with self.conn:
+        with self._write("update_node_position"):
             self.cursor.execute("UPDATE nodes SET latitude = ?, longitude = ? WHERE node_id = ?", (lat, lon, node_id))
 
     def insert_reading(self, data):
-        with self.conn:
+        with self._write("insert_reading"):
             self.cursor.execute("INSERT INTO readings (node_id, timestamp, temperature, humidity, pressure, iaq) VALUES (?, ?, ?, ?, ?, ?)", (data.get('node_id'), datetime.now().isoformat(), data.get('temperature'), data.get('humidity'), data.get('pressure'), data.get('iaq')))
     
     def get_last_reading(self, node_id):
@@ -125,8 +206,85 @@ class DatabaseManager:
         self.cursor.execute("SELECT timestamp, temperature, humidity FROM readings WHERE node_id = ? AND temperature IS NOT NULL AND humidity IS NOT NULL ORDER BY timestamp DESC LIMIT ?", (node_id, limit))
         return self.cursor.fetchall()[::-1]
 
+    def get_recent_series(self, node_id, limit=100):
+        self.cursor.execute("SELECT timestamp, temperature, humidity, pressure, iaq, NULL FROM readings WHERE node_id = ? ORDER BY timestamp DESC LIMIT ?", (node_id, limit))
+        return self.cursor.fetchall()[::-1]
+
+    def create_reader(self):
+        """Abre una conexión adicional para consultas desde hilos en segundo plano."""
+        return sqlite3.connect(self.db_name, check_same_thread=False)
+
+    def get_readings_between(self, node_id, start, end, conn=None):
+        cursor = (conn or self.conn).cursor()
+        cursor.execute("SELECT timestamp, temperature, humidity FROM readings WHERE node_id = ? AND timestamp BETWEEN ? AND ? AND temperature IS NOT NULL AND humidity IS NOT NULL ORDER BY timestamp ASC", (node_id, start, end))
+        return cursor.fetchall()
+
+    def _telemetry_history_filter(self, node_id_suffix, start_date, end_date, cursor=None):
+        """Construye el WHERE común del historial. El sufijo se resuelve a IDs completos para usar los índices."""
+        cursor = cursor or self.cursor
+        clauses, params = [], []
+        if node_id_suffix:
+            cursor.execute("SELECT node_id FROM nodes WHERE node_id LIKE ?", (f"%{node_id_suffix}",))
+            node_ids = [row[0] for row in cursor.fetchall()] or [None]
+            clauses.append(f"r.node_id IN ({','.join('?' * len(node_ids))})")
+            params += node_ids
+        if start_date:
+            clauses.append("r.timestamp >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("r.timestamp <= ?")
+            params.append(end_date)
+        return clauses, params
+
+    def get_telemetry_history(self, node_id_suffix=None, start_date=None, end_date=None, before=None, after=None, limit=200, conn=None):
+        """Página del historial de lecturas, de la más reciente a la más antigua.
+
+        Usa paginación por clave sobre (timestamp, id): before=(ts, id) devuelve la
+        página siguiente hacia atrás y after=(ts, id) la anterior hacia delante.
+        Columnas: id, timestamp, node_id, alias, temperature, humidity, pressure,
+        battery, latitude, longitude.
+        """
+        cursor = conn.cursor() if conn else self.cursor
+        clauses, params = self._telemetry_history_filter(node_id_suffix, start_date, end_date, cursor)
+        order = "DESC"
+        if before:
+            clauses.append("(r.timestamp, r.id) < (?, ?)")
+            params += list(before)
+        elif after:
+            clauses.append("(r.timestamp, r.id) > (?, ?)")
+            params += list(after)
+            order = "ASC"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(f"""
+            SELECT {TELEMETRY_HISTORY_COLUMNS}
+            FROM readings r LEFT JOIN nodes n ON r.node_id = n.node_id
+            {where} ORDER BY r.timestamp {order}, r.id {order} LIMIT ?""", params + [limit])
+        rows = cursor.fetchall()
+        return rows[::-1] if after else rows
+
+    def count_telemetry_history(self, node_id_suffix=None, start_date=None, end_date=None, conn=None):
+        cursor = (conn or self.conn).cursor()
+        clauses, params = self._telemetry_history_filter(node_id_suffix, start_date, end_date, cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(f"SELECT COUNT(*) FROM readings r {where}", params)
+        return cursor.fetchone()[0]
+
+    def iter_telemetry_history(self, conn, node_id_suffix=None, start_date=None, end_date=None, chunk_size=5000):
+        """Recorre todo el historial filtrado en bloques de chunk_size filas (para exportaciones)."""
+        cursor = conn.cursor()
+        clauses, params = self._telemetry_history_filter(node_id_suffix, start_date, end_date, cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(f"""
+            SELECT {TELEMETRY_HISTORY_COLUMNS}
+            FROM readings r LEFT JOIN nodes n ON r.node_id = n.node_id
+            {where} ORDER BY r.timestamp DESC, r.id DESC""", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows: break
+            yield rows
+
     def insert_binary_reading(self, node_id, sensor_name, state):
-        with self.conn:
+        with self._write("insert_binary_reading"):
             self.cursor.execute("INSERT INTO binary_readings (node_id, timestamp, sensor_name, state) VALUES (?, ?, ?, ?)", (node_id, datetime.now().isoformat(), sensor_name, state))
 
     def get_last_binary_reading(self, node_id, sensor_name):
@@ -134,11 +292,17 @@ class DatabaseManager:
         return self.cursor.fetchone()
 
     def save_message(self, from_id, to_id, channel, text, is_direct):
-        with self.conn:
+        with self._write("save_message"):
             self.cursor.execute("INSERT INTO messages (from_id, to_id, channel, text, timestamp, is_direct) VALUES (?, ?, ?, ?, ?, ?)", (from_id, to_id, channel, text, datetime.now().isoformat(), 1 if is_direct else 0))
+            if self.fts_available:
+                self.cursor.execute("INSERT INTO messages_fts (rowid, text) VALUES (?, ?)", (self.cursor.lastrowid, text))
 
-    def get_messages(self, limit=100):
-        self.cursor.execute("SELECT from_id, to_id, text, timestamp, is_direct, channel FROM messages ORDER BY timestamp DESC LIMIT ?", (limit,))
+    def get_messages(self, limit=100, before=None):
+        """Últimos mensajes en orden cronológico. before=(timestamp, id) devuelve la página anterior a ese mensaje."""
+        if before:
+            self.cursor.execute("SELECT id, from_id, to_id, text, timestamp, is_direct, channel FROM messages WHERE (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?", (before[0], before[1], limit))
+        else:
+            self.cursor.execute("SELECT id, from_id, to_id, text, timestamp, is_direct, channel FROM messages ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,))
         return self.cursor.fetchall()[::-1]
 
     def get_setting(self, key, default=None):
@@ -150,15 +314,71 @@ class DatabaseManager:
         with self.conn:
             self.cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
 
-    def insert_alert(self, node_id, message, severity):
+    def insert_alert(self, node_id, message, severity, alert_type=None):
+        """Guarda una alerta y devuelve su id. Las alertas con tipo se crean abiertas ('open')."""
+        with self._write("insert_alert"):
+            self.cursor.execute("INSERT INTO alerts (timestamp, node_id, message, severity, alert_type, state) VALUES (?, ?, ?, ?, ?, ?)",
+                                (datetime.now().isoformat(), node_id, message, severity, alert_type, "open" if alert_type else None))
+            alert_id = self.cursor.lastrowid
+            if self.fts_available:
+                self.cursor.execute("INSERT INTO alerts_fts (rowid, message) VALUES (?, ?)", (alert_id, message))
+        return alert_id
+
+    def resolve_alert(self, alert_id):
         with self.conn:
-            self.cursor.execute("INSERT INTO alerts (timestamp, node_id, message, severity) VALUES (?, ?, ?, ?)",
-                                (datetime.now().isoformat(), node_id, message, severity))
+            self.cursor.execute("UPDATE alerts SET state = 'resolved', resolved_at = ? WHERE id = ? AND state = 'open'", (datetime.now().isoformat(), alert_id))
+
+    def get_open_alerts(self):
+        """Alertas tipadas aún abiertas: (id, node_id, alert_type)."""
+        self.cursor.execute("SELECT id, node_id, alert_type FROM alerts WHERE state = 'open'")
+        return self.cursor.fetchall()
 
     def get_alerts(self, limit=200):
         self.cursor.execute("SELECT a.timestamp, n.alias, a.message, a.severity, a.is_read FROM alerts a LEFT JOIN nodes n ON a.node_id = n.node_id ORDER BY a.timestamp DESC LIMIT ?", (limit,))
         return self.cursor.fetchall()
         
+    def get_alerts_page(self, severity=None, node_id=None, before=None, after_id=None, limit=100, conn=None):
+        """Página de alertas filtrada en la BD, de la más reciente a la más antigua.
+
+        before=(timestamp, id) pagina hacia atrás; after_id devuelve solo las
+        alertas insertadas después de ese id. Columnas: id, timestamp, alias,
+        message, severity, is_read.
+        """
+        clauses, params = [], []
+        if severity:
+            clauses.append("a.severity = ?")
+            params.append(severity)
+        if node_id:
+            clauses.append("a.node_id = ?")
+            params.append(node_id)
+        if before:
+            clauses.append("(a.timestamp, a.id) < (?, ?)")
+            params += list(before)
+        if after_id is not None:
+            clauses.append("a.id > ?")
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = conn.cursor() if conn else self.cursor
+        cursor.execute(f"""
+            SELECT a.id, a.timestamp, n.alias, a.message, a.severity, a.is_read
+            FROM alerts a LEFT JOIN nodes n ON a.node_id = n.node_id
+            {where} ORDER BY a.timestamp DESC, a.id DESC LIMIT ?""", params + [limit])
+        return cursor.fetchall()
+
+    def count_alerts(self, conn=None):
+        cursor = (conn or self.conn).cursor()
+        cursor.execute("SELECT COUNT(*) FROM alerts")
+        return cursor.fetchone()[0]
+
+    def iter_alerts(self, conn, chunk_size=5000):
+        """Recorre todas las alertas (mismas columnas que get_alerts) en bloques de chunk_size filas."""
+        cursor = conn.cursor()
+        cursor.execute("SELECT a.timestamp, n.alias, a.message, a.severity, a.is_read FROM alerts a LEFT JOIN nodes n ON a.node_id = n.node_id ORDER BY a.timestamp DESC")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows: break
+            yield rows
+
     def get_unread_alert_count(self):
         self.cursor.execute("SELECT COUNT(*) FROM alerts WHERE is_read = 0")
         return self.cursor.fetchone()[0]
@@ -167,12 +387,73 @@ class DatabaseManager:
         with self.conn:
             self.cursor.execute("UPDATE alerts SET is_read = 1 WHERE is_read = 0")
 
-    def get_last_alert_for_node(self, node_id):
-        self.cursor.execute("SELECT message, timestamp FROM alerts WHERE node_id = ? ORDER BY timestamp DESC LIMIT 1", (node_id,))
-        return self.cursor.fetchone()
+    @staticmethod
+    def _fts_query(text):
+        """Convierte el texto del usuario en una consulta FTS5 segura (cada palabra como prefijo)."""
+        words = [w.replace('"', '') for w in text.split()]
+        return " ".join(f'"{w}"*' for w in words if w)
+
+    def search(self, text, scope="all", node_id=None, channel=None, start_date=None, end_date=None, limit=100):
+        """Busca en mensajes y/o alertas. Devuelve filas ordenadas por relevancia:
+        (tipo, id, timestamp, node_id, alias, fragmento, canal_o_severidad, rango).
+        """
+        query = self._fts_query(text)
+        if not query: return []
+        results = []
+
+        if scope in ("all", "messages"):
+            clauses, params = [], []
+            if node_id:
+                clauses.append("(m.from_id = ? OR m.to_id = ?)")
+                params += [node_id, node_id]
+            if channel is not None:
+                clauses.append("m.channel = ?")
+                params.append(channel)
+            results += self._search_table(
+                "messages", query, clauses, params, start_date, end_date, limit,
+                select="'mensaje', m.id, m.timestamp, m.from_id, n.alias, {snippet}, m.channel",
+                alias="m", node_column="from_id", text_column="text")
+
+        # Las alertas no tienen canal: si se filtra por canal solo hay mensajes
+        if scope in ("all", "alerts") and channel is None:
+            clauses, params = [], []
+            if node_id:
+                clauses.append("a.node_id = ?")
+                params.append(node_id)
+            results += self._search_table(
+                "alerts", query, clauses, params, start_date, end_date, limit,
+                select="'alerta', a.id, a.timestamp, a.node_id, n.alias, {snippet}, a.severity",
+                alias="a", node_column="node_id", text_column="message")
+
+        results.sort(key=lambda row: row[7])
+        return results[:limit]
+
+    def _search_table(self, table, query, clauses, params, start_date, end_date, limit, select, alias, node_column, text_column):
+        clauses, params = list(clauses), list(params)
+        if start_date:
+            clauses.append(f"{alias}.timestamp >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append(f"{alias}.timestamp <= ?")
+            params.append(end_date)
+
+        nodes_join = f"LEFT JOIN nodes n ON n.node_id = {alias}.{node_column}"
+        if self.fts_available:
+            where = " AND ".join([f"{table}_fts MATCH ?"] + clauses)
+            snippet = f"snippet({table}_fts, 0, '[', ']', '...', 12)"
+            sql = f"SELECT {select.format(snippet=snippet)}, bm25({table}_fts) AS rank FROM {table}_fts f JOIN {table} {alias} ON {alias}.id = f.rowid {nodes_join} WHERE {where} ORDER BY rank LIMIT ?"
+            self.cursor.execute(sql, [query] + params + [limit])
+        else:
+            # Sin FTS5: búsqueda lineal con LIKE, sin ordenar por relevancia
+            words = [w.strip('"*') for w in query.split()]
+            where = " AND ".join([f"{alias}.{text_column} LIKE ?" for _ in words] + clauses)
+            snippet = f"{alias}.{text_column}"
+            sql = f"SELECT {select.format(snippet=snippet)}, 0 AS rank FROM {table} {alias} {nodes_join} WHERE {where} ORDER BY {alias}.timestamp DESC LIMIT ?"
+            self.cursor.execute(sql, [f"%{w}%" for w in words] + params + [limit])
+        return self.cursor.fetchall()
 
     def update_link(self, source, target, snr):
-        with self.conn:
+        with self._write("update_link"):
             self.cursor.execute("""
                 INSERT OR REPLACE INTO network_links (source_node_id, target_node_id, last_snr, last_seen)
                 VALUES (?, ?, ?, ?)
@@ -182,6 +463,26 @@ class DatabaseManager:
         self.cursor.execute("SELECT source_node_id, target_node_id, last_snr FROM network_links")
         return self.cursor.fetchall()
 
+    def add_scheduled_command(self, due_at, node_id, command, channel_index, priority, want_ack, interval_s, label, conn=None):
+        conn = conn or self.conn
+        with conn:
+            cursor = conn.execute("""
+                INSERT INTO scheduled_commands (due_at, node_id, command, channel_index, priority, want_ack, interval_s, label, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (due_at, node_id, command, channel_index, priority, 1 if want_ack else 0, interval_s, label, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+    def update_scheduled_command(self, job_id, due_at=None, state=None, conn=None):
+        conn = conn or self.conn
+        with conn:
+            conn.execute("UPDATE scheduled_commands SET due_at = COALESCE(?, due_at), state = COALESCE(?, state) WHERE id = ?", (due_at, state, job_id))
+
+    def get_pending_commands(self, conn=None):
+        """Comandos programados pendientes o en curso: (id, due_at, node_id, command, channel_index, priority, want_ack, interval_s, label)."""
+        cursor = (conn or self.conn).cursor()
+        cursor.execute("SELECT id, due_at, node_id, command, channel_index, priority, want_ack, interval_s, label FROM scheduled_commands WHERE state IN ('pending', 'dispatched') ORDER BY due_at")
+        return cursor.fetchall()
+
     def add_bot_rule(self, alias, conditions_list, action_dict):
         with self.conn:
             self.cursor.execute("""
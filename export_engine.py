@@ -0,0 +1,126 @@
+# =============================================================================
+# ### ARCHIVO: export_engine.py ###
+# =============================================================================
+# Exportación en segundo plano directamente desde SQLite. Las filas se leen
+# por bloques y se escriben a medida que llegan, de modo que la memoria usada
+# no depende del tamaño de la exportación y la GUI no se congela.
+#
+# Formatos: CSV (.csv), CSV comprimido (.csv.gz) y Parquet (.parquet, requiere
+# la librería opcional 'pyarrow').
+import csv
+import gzip
+import os
+import threading
+
+FORMAT_CSV = "csv"
+FORMAT_CSV_GZ = "csv.gz"
+FORMAT_PARQUET = "parquet"
+
+FILE_TYPES = [
+    ("Archivos CSV", "*.csv"),
+    ("CSV comprimido (gzip)", "*.csv.gz"),
+    ("Apache Parquet", "*.parquet"),
+    ("Todos los archivos", "*.*"),
+]
+
+def detect_format(file_path):
+    lower = file_path.lower()
+    if lower.endswith(".gz"): return FORMAT_CSV_GZ
+    if lower.endswith(".parquet"): return FORMAT_PARQUET
+    return FORMAT_CSV
+
+
+class ExportJob:
+    """Exporta filas obtenidas de la BD en un hilo de trabajo.
+
+    row_source(conn) debe devolver un iterador de bloques (listas de filas) y
+    count_source(conn) el número total de filas, usado para el progreso.
+    El hilo de la GUI consulta rows_written, total_rows y status.
+    """
+    def __init__(self, db_manager, columns, row_source, count_source, file_path):
+        self.db = db_manager
+        self.columns = columns
+        self.row_source = row_source
+        self.count_source = count_source
+        self.file_path = file_path
+        self.format = detect_format(file_path)
+        self.rows_written = 0
+        self.total_rows = None
+        self.status = "pending"  # pending, running, done, cancelled, error
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.status = "running"
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def progress(self):
+        if not self.total_rows: return 1.0 if self.status == "done" else 0.0
+        return min(1.0, self.rows_written / self.total_rows)
+
+    def _run(self):
+        # Se escribe a un archivo temporal para no dejar exportaciones a medias
+        tmp_path = f"{self.file_path}.part"
+        conn = self.db.create_reader()
+        try:
+            self.total_rows = self.count_source(conn)
+            chunks = self.row_source(conn)
+            if self.format == FORMAT_PARQUET:
+                self._write_parquet(tmp_path, chunks)
+            else:
+                self._write_csv(tmp_path, chunks)
+
+            if self.cancel_event.is_set():
+                self.status = "cancelled"
+            else:
+                os.replace(tmp_path, self.file_path)
+                self.status = "done"
+        except Exception as e:
+            self.error = e
+            self.status = "error"
+        finally:
+            conn.close()
+            if self.status != "done" and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _write_csv(self, path, chunks):
+        opener = gzip.open if self.format == FORMAT_CSV_GZ else open
+        with opener(path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for rows in chunks:
+                if self.cancel_event.is_set(): return
+                writer.writerows(rows)
+                self.rows_written += len(rows)
+
+    def _write_parquet(self, path, chunks):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("La exportación a Parquet requiere la librería 'pyarrow' (pip install pyarrow).")
+
+        writer = None
+        try:
+            for rows in chunks:
+                if self.cancel_event.is_set(): return
+                table = pa.Table.from_pydict({col: [row[i] for row in rows] for i, col in enumerate(self.columns)})
+                if writer is None:
+                    # Las columnas vacías en el primer bloque se guardan como texto
+                    schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])
+                    writer = pq.ParquetWriter(path, schema)
+                # Cada bloque se ajusta al esquema del primero
+                table = table.cast(writer.schema)
+                writer.write_table(table)
+                self.rows_written += len(rows)
+            if writer is None:
+                pq.write_table(pa.Table.from_pydict({col: [] for col in self.columns}), path)
+        finally:
+            if writer is not None:
+                writer.close()
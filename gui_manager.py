@@ -5,41 +5,54 @@ import customtkinter as ctk
 import queue
 import time
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime
 from tkinter import messagebox
-from PIL import Image
 import os
-import json
-
-try:
-    from plyer import notification
-    PLYER_AVAILABLE = True
-except ImportError:
-    PLYER_AVAILABLE = False
-    print("Advertencia: La librería 'plyer' no está instalada. Las notificaciones de escritorio no funcionarán.")
+import sys
 
 from serial_manager import SerialManager
+from ingest_client import IngestClient, RemoteCommandScheduler
+from shared_ring import KIND_READING, KIND_NODE, KIND_POSITION, KIND_MESSAGE, KIND_BINARY, KIND_ALERT
 from database_manager import DatabaseManager
 from data_processor import DataProcessor
+from state_snapshot import StateSnapshot
+from timeseries_store import TimeSeriesStore
+from api_server import ApiServer
+from latency_tracer import LatencyTracer, STAGE_PERSIST
+from packet_record import PacketRecord
+from metrics import REGISTRY, PACKETS_PROCESSED, PACKETS_DROPPED, PACKET_PROCESSING_SECONDS, WIDGET_UPDATE_SECONDS
+from heartbeat_monitor import HeartbeatMonitor
+from alert_manager import AlertManager, NotificationAggregator, ALERT_NODE_OFFLINE
+from tx_queue import PRIORITY_CONTROL
+from command_scheduler import CommandScheduler
+from poll_scheduler import PollScheduler, POLL_POSITION, POLL_TELEMETRY
 import config
-import utils
-
-from tabs.dashboard_tab import DashboardTab
-from tabs.node_detail_tab import NodeDetailTab
-from tabs.map_tab import MapTab
-from tabs.messaging_tab import MessagingTab
-from tabs.history_tab import HistoryTab
-from tabs.analysis_tab import AnalysisTab
-from tabs.serial_monitor_tab import SerialMonitorTab
-from tabs.settings_window import SettingsWindow
-# La importación de ToolTip ha sido eliminada
+import startup_profiler
+import loop_profiler
+
+# Las pestañas (matplotlib, tkcalendar, tkintermapview), PIL y plyer
+# se importan la primera vez que se necesitan para acelerar el arranque.
+_notification = None
+
+def get_notifier():
+    """Importa plyer bajo demanda. Devuelve None si no está instalado."""
+    global _notification
+    if _notification is None:
+        try:
+            from plyer import notification
+            _notification = notification
+        except ImportError:
+            _notification = False
+            print("Advertencia: La librería 'plyer' no está instalada. Las notificaciones de escritorio no funcionarán.")
+    return _notification or None
 
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, defer_init=False):
         super().__init__()
         
-        self.db_manager = DatabaseManager(config.DB_NAME)
-        self.load_user_preferences()
+        with startup_profiler.phase("Base de datos y preferencias"):
+            self.db_manager = DatabaseManager(config.DB_NAME)
+            self.load_user_preferences()
 
         if os.path.exists("ecolora_logo.ico"):
             self.iconbitmap("ecolora_logo.ico")
@@ -51,24 +64,96 @@ class App(ctk.CTk):
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         self.is_connected = False
+        # Recepción, reglas y BD en un proceso aparte (service.py); la GUI solo muestra y envía
+        self.ingest_process = config.INGEST_PROCESS or "--ingest-process" in sys.argv
         self.selected_node_id = None
         self.local_node_id = None
         self.settings_window = None
+        self.search_window = None
+        self.known_node_ids = set()     # Nodos ya vistos en el búfer del proceso de ingesta
+        self.diagnostics_window = None
         self.original_status_text = "Desconectado"
         self.tabs = {}
         self.full_packet_queue = queue.Queue()
         self.log_queue = queue.Queue()
         self.error_queue = queue.Queue()
         self.alert_queue = queue.Queue()
-
-        self.data_processor = DataProcessor(self.db_manager, self.log_queue)
-        self.serial_manager = SerialManager(self.full_packet_queue, self.update_status_bar, self.log_queue, self.error_queue)
-
-        self.create_widgets()
-        self.load_initial_data() 
+        self.initialized = False
+
+        # Con defer_init=True el llamador (p. ej. el splash) decide cuándo construir la interfaz
+        if not defer_init:
+            self.initialize()
+
+    def initialize(self):
+        """Construye los gestores y la interfaz. Devuelve cuando la app está lista."""
+        if self.initialized: return
+        with startup_profiler.phase("Instantánea de estado"):
+            self.state_snapshot = StateSnapshot(config.SNAPSHOT_FILE, config.SNAPSHOT_MAX_AGE_HOURS)
+            if self.state_snapshot.load():
+                self.log_queue.put(("INFO", "Estado anterior restaurado desde la instantánea."))
+
+        with startup_profiler.phase("Procesador de datos y gestor serial"):
+            self.alert_manager = AlertManager(self.db_manager)
+            self.notification_aggregator = NotificationAggregator(config.ALERT_AGGREGATION_WINDOW_S, config.ALERT_NOTIFY_RATE_WINDOW_S, config.ALERT_NOTIFY_MAX_PER_WINDOW)
+            self.data_processor = DataProcessor(self.db_manager, self.log_queue, self.alert_manager)
+            self.data_processor.import_state(self.state_snapshot.section('data_processor'))
+            self.timeseries_store = TimeSeriesStore(config.GRAPH_MAX_POINTS, config.TIMESERIES_MAX_NODES, loader=self.db_manager.get_recent_series)
+            self.timeseries_store.import_state(self.state_snapshot.section('timeseries'))
+            if self.ingest_process:
+                self.serial_manager = IngestClient(self.update_status_bar, self.log_queue)
+            else:
+                self.serial_manager = SerialManager(self.full_packet_queue, self.update_status_bar, self.log_queue, self.error_queue)
+            node_timeouts = {node_id: minutes * 60 for node_id, minutes in config.NODE_HEARTBEAT_TIMEOUTS.items()}
+            self.heartbeat_monitor = HeartbeatMonitor(config.HEARTBEAT_TIMEOUT_MINUTES * 60, node_timeouts)
+            self.heartbeat_after_id = None
+            self.heartbeat_due = None
+            if self.ingest_process:
+                # Los comandos programados los ejecuta el proceso de ingesta, que sobrevive a la GUI
+                self.command_scheduler = RemoteCommandScheduler(self.serial_manager)
+            else:
+                self.command_scheduler = CommandScheduler(self.db_manager, self.dispatch_scheduled_command, self.log_queue,
+                                                          config.COMMAND_SCHEDULER_TICK_S, config.COMMAND_SCHEDULER_WHEEL_SIZE, config.COMMAND_RETRY_S)
+            self.command_scheduler.start()
+            self.poll_scheduler = PollScheduler(self.send_poll_request, config.POLL_WINDOW_S, config.POLL_MIN_SPACING_S,
+                                                config.POLL_FRESHNESS_S, config.POLL_TARGET_CHANNEL_UTIL)
+            # Con proceso de ingesta, la API la sirve ese proceso
+            self.api_server = None if self.ingest_process else self.start_api_server()
+            self.latency_tracer = LatencyTracer(config.READING_VISIBLE_SLA_S)
+            REGISTRY.gauge("ecolora_queue_depth", "Elementos en espera en cada cola interna", self.queue_depths)
+
+        with startup_profiler.phase("Creación de widgets"):
+            self.create_widgets()
+        with startup_profiler.phase("Carga de datos iniciales"):
+            self.load_initial_data() 
         
+        if self.ingest_process:
+            self.serial_manager.attach()
         self.after(100, self.process_queues)
-        self.after(300000, self.check_node_heartbeats)
+        self.after(config.SNAPSHOT_INTERVAL_MS, self.periodic_state_snapshot)
+        self.initialized = True
+
+        report = startup_profiler.finish()
+        if report:
+            self.log_queue.put(("PROFILE", report))
+
+    def start_api_server(self):
+        if not config.API_ENABLED: return None
+        try:
+            api_server = ApiServer(self.db_manager, self.timeseries_store, config.API_HOST, config.API_PORT, self.log_queue, config.API_STREAM_QUEUE_SIZE)
+        except OSError as e:
+            self.log_queue.put(("ERROR", f"No se pudo iniciar la API local en el puerto {config.API_PORT}: {e}"))
+            return None
+        api_server.start()
+        return api_server
+
+    def queue_depths(self):
+        return {
+            (("queue", "paquetes"),): self.full_packet_queue.qsize(),
+            (("queue", "log"),): self.log_queue.qsize(),
+            (("queue", "alertas"),): self.alert_queue.qsize(),
+            (("queue", "transmision"),): self.serial_manager.tx.depth() if self.serial_manager.tx else 0,
+            (("queue", "sondeo"),): self.poll_scheduler.pending(),
+        }
 
     def load_user_preferences(self):
         appearance_mode = self.db_manager.get_setting("appearance_mode", "dark")
@@ -76,25 +161,50 @@ class App(ctk.CTk):
         ctk.set_appearance_mode(appearance_mode)
         ctk.set_default_color_theme(color_theme)
 
-    def check_node_heartbeats(self):
-        self.log_queue.put(("HEARTBEAT", "Verificando estado de los nodos..."))
-        nodes = self.db_manager.get_nodes()
-        now = datetime.now()
+    def save_state_snapshot(self):
+        sections = {
+            'data_processor': self.data_processor.export_state(),
+            'timeseries': self.timeseries_store.export_state(),
+        }
+        if self.state_snapshot.save(sections):
+            self.log_queue.put(("DEBUG", "Instantánea de estado guardada."))
+
+    def periodic_state_snapshot(self):
+        self.save_state_snapshot()
+        self.after(config.SNAPSHOT_INTERVAL_MS, self.periodic_state_snapshot)
+
+    def watch_node(self, node_id, seen_at=None):
+        """Renueva el plazo de desconexión del nodo y adelanta la revisión si ahora es el más próximo."""
+        deadline = self.heartbeat_monitor.touch(node_id, seen_at)
+        if self.heartbeat_due is None or deadline < self.heartbeat_due:
+            self.schedule_heartbeat_check()
+        if seen_at is None and self.alert_manager.resolve(node_id, ALERT_NODE_OFFLINE):
+            self.log_queue.put(("HEARTBEAT", f"Nodo {node_id[-4:]} reconectado."))
+
+    def schedule_heartbeat_check(self):
+        # Una sola revisión pendiente, programada para el plazo más próximo
+        if self.heartbeat_after_id is not None:
+            self.after_cancel(self.heartbeat_after_id)
+            self.heartbeat_after_id = None
+        self.heartbeat_due = self.heartbeat_monitor.next_deadline()
+        if self.heartbeat_due is None: return
+        delay_ms = max(0, int((self.heartbeat_due - time.time()) * 1000))
+        self.heartbeat_after_id = self.after(delay_ms, self.check_node_heartbeats)
 
-        for node in nodes:
-            node_id, alias, last_seen_str, _, _, _, _, _, _, _ = node
+    def check_node_heartbeats(self):
+        self.heartbeat_after_id = None
+        for node_id, deadline in self.heartbeat_monitor.pop_expired():
             if node_id == self.local_node_id: continue
+            timeout_s = self.heartbeat_monitor.get_timeout(node_id)
+            message = f"El nodo no ha reportado datos en más de {timeout_s // 60} minutos."
+            # Si ya hay una alerta abierta (p. ej. de antes de un reinicio) no se repite
+            if self.alert_manager.raise_alert(node_id, ALERT_NODE_OFFLINE, message, "CRITICAL") is None: continue
 
-            if last_seen_str:
-                last_seen_dt = datetime.fromisoformat(last_seen_str)
-                if (now - last_seen_dt) > timedelta(minutes=30):
-                    last_alert = self.db_manager.get_last_alert_for_node(node_id)
-                    if not last_alert or "Desconectado" not in last_alert[0]:
-                        message = "El nodo no ha reportado datos en más de 30 minutos."
-                        self.db_manager.insert_alert(node_id, message, "CRITICAL")
-                        self.alert_queue.put((f"Alerta de Conexión: {alias or node_id[-4:]}", message))
-
-        self.after(300000, self.check_node_heartbeats)
+            alias = self.db_manager.get_node_alias(node_id)
+            last_seen = datetime.fromtimestamp(deadline - timeout_s).strftime('%Y-%m-%d %H:%M:%S')
+            self.log_queue.put(("HEARTBEAT", f"Nodo {alias or node_id[-4:]} sin datos desde {last_seen}."))
+            self.alert_queue.put((ALERT_NODE_OFFLINE, alias or node_id[-4:], message))
+        self.schedule_heartbeat_check()
 
     def create_widgets(self):
         self.grid_columnconfigure(1, weight=1)
@@ -112,6 +222,7 @@ class App(ctk.CTk):
         logo_frame = ctk.CTkFrame(self.left_frame, fg_color="transparent")
         logo_frame.grid(row=0, column=0, padx=20, pady=20)
         if os.path.exists("ecolora_logo.png"):
+            from PIL import Image
             self.logo_image = ctk.CTkImage(Image.open("ecolora_logo.png"), size=(70, 70)) 
             ctk.CTkLabel(logo_frame, image=self.logo_image, text="").pack(side="left", padx=(0, 10))
         ctk.CTkLabel(logo_frame, text="ECOLORA", font=ctk.CTkFont(size=20, weight="bold")).pack(side="left")
@@ -163,9 +274,14 @@ class App(ctk.CTk):
         header_frame.grid_columnconfigure(0, weight=1)
 
         if os.path.exists("settings_icon.png"):
+            from PIL import Image
             self.settings_image = ctk.CTkImage(Image.open("settings_icon.png"), size=(24, 24))
             self.settings_button = ctk.CTkButton(header_frame, image=self.settings_image, text="", width=30, command=self.open_settings)
             self.settings_button.pack(side="right")
+        self.search_button = ctk.CTkButton(header_frame, text="Buscar", width=80, command=self.open_search)
+        self.search_button.pack(side="right", padx=(0, 10))
+        self.diagnostics_button = ctk.CTkButton(header_frame, text="Diagnóstico", width=90, command=self.open_diagnostics)
+        self.diagnostics_button.pack(side="right", padx=(0, 10))
         
         self.tab_view = ctk.CTkTabview(self.main_frame, anchor="w", command=self.on_tab_change)
         self.tab_view.grid(row=1, column=0, sticky="nsew")
@@ -178,24 +294,40 @@ class App(ctk.CTk):
         self.tab_view.add("Análisis y Alertas")
         self.tab_view.add("Monitor Serial")
 
-        self.tabs['dashboard'] = DashboardTab(self.tab_view.tab("Dashboard"), self)
-        self.tabs['dashboard'].pack(fill="both", expand=True)
-        self.tabs['detail'] = NodeDetailTab(self.tab_view.tab("Detalle de Nodo"), self) 
-        self.tabs['detail'].pack(fill="both", expand=True)
-        self.tabs['map'] = MapTab(self.tab_view.tab("Mapa de Nodos"), self)
-        self.tabs['map'].pack(fill="both", expand=True)
-        self.tabs['msg'] = MessagingTab(self.tab_view.tab("Mensajes"), self)
-        self.tabs['msg'].pack(fill="both", expand=True)
-        self.tabs['history'] = HistoryTab(self.tab_view.tab("Historial"), self)
-        self.tabs['history'].pack(fill="both", expand=True)
-        self.tabs['analysis'] = AnalysisTab(self.tab_view.tab("Análisis y Alertas"), self)
-        self.tabs['analysis'].pack(fill="both", expand=True)
-        self.tabs['serial'] = SerialMonitorTab(self.tab_view.tab("Monitor Serial"), self)
-        self.tabs['serial'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Dashboard"):
+            from tabs.dashboard_tab import DashboardTab
+            self.tabs['dashboard'] = DashboardTab(self.tab_view.tab("Dashboard"), self)
+            self.tabs['dashboard'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Detalle de Nodo"):
+            from tabs.node_detail_tab import NodeDetailTab
+            self.tabs['detail'] = NodeDetailTab(self.tab_view.tab("Detalle de Nodo"), self) 
+            self.tabs['detail'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Mapa"):
+            from tabs.map_tab import MapTab
+            self.tabs['map'] = MapTab(self.tab_view.tab("Mapa de Nodos"), self)
+            self.tabs['map'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Mensajes"):
+            from tabs.messaging_tab import MessagingTab
+            self.tabs['msg'] = MessagingTab(self.tab_view.tab("Mensajes"), self)
+            self.tabs['msg'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Historial"):
+            from tabs.history_tab import HistoryTab
+            self.tabs['history'] = HistoryTab(self.tab_view.tab("Historial"), self)
+            self.tabs['history'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Análisis"):
+            from tabs.analysis_tab import AnalysisTab
+            self.tabs['analysis'] = AnalysisTab(self.tab_view.tab("Análisis y Alertas"), self)
+            self.tabs['analysis'].pack(fill="both", expand=True)
+        with startup_profiler.phase("Pestaña Monitor Serial"):
+            from tabs.serial_monitor_tab import SerialMonitorTab
+            self.tabs['serial'] = SerialMonitorTab(self.tab_view.tab("Monitor Serial"), self)
+            self.tabs['serial'].pack(fill="both", expand=True)
         
     def create_status_bar(self):
         self.status_label = ctk.CTkLabel(self, text="Desconectado", anchor="w", height=20)
         self.status_label.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="ew")
+        self.tx_status_label = ctk.CTkLabel(self, text="", anchor="e", height=20)
+        self.tx_status_label.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="e")
 
     def create_loading_overlay(self):
         self.overlay_frame = ctk.CTkFrame(self.main_frame, corner_radius=10)
@@ -209,51 +341,114 @@ class App(ctk.CTk):
         self.tabs['msg'].load_message_history()
         nodes = self.db_manager.get_nodes()
         for node_data in nodes:
-            node_id, _, _, _, _, _, _, lat, lon, _ = node_data
+            node_id, _, last_seen, _, _, _, _, lat, lon, _ = node_data
             if lat is not None and lon is not None:
                 self.tabs['map'].update_map_marker(node_id, lat, lon)
+            if last_seen and not self.ingest_process:
+                self.heartbeat_monitor.touch(node_id, datetime.fromisoformat(last_seen).timestamp())
+        # Con proceso de ingesta, la detección de nodos desconectados y sus alertas son cosa de ese proceso
+        if not self.ingest_process:
+            self.schedule_heartbeat_check()
 
     def process_queues(self):
-        self.process_full_packet_queue()
+        if self.ingest_process: self.process_ingest_records()
+        else: self.process_full_packet_queue()
         self.tabs['serial'].process_log_queue()
         self.process_error_queue()
         self.process_alert_queue()
+        self.poll_scheduler.tick()
+        self.update_tx_status()
         self.after(config.UPDATE_INTERVAL_MS, self.process_queues)
 
+    def update_tx_status(self):
+        if self.serial_manager.tx is None: return
+        pending = self.serial_manager.tx.pending()
+        awaiting = self.serial_manager.tx.depth() - len(pending)
+        if not pending and not awaiting:
+            self.tx_status_label.configure(text="")
+            return
+        text = f"TX: {len(pending)} en cola"
+        if pending:
+            text += f", siguiente en {pending[0][1]:.0f}s, último en {pending[-1][1]:.0f}s"
+        if awaiting:
+            text += f", {awaiting} esperando ACK"
+        self.tx_status_label.configure(text=text)
+
     def process_full_packet_queue(self):
         try:
             while not self.full_packet_queue.empty():
-                packet = self.full_packet_queue.get_nowait()
-                
-                try:
-                    packet_str = json.dumps(packet, indent=2)
-                    self.log_queue.put(("DEBUG", f"Paquete JSON recibido:\n{packet_str}"))
-                except Exception:
-                    self.log_queue.put(("DEBUG", f"Paquete no-JSON recibido: {packet}"))
-
-                node_id = packet.get('fromId')
-                if not node_id: continue
-                if not self.db_manager.get_node(node_id):
-                    alias = config.NODE_ALIASES.get(node_id, f"Nodo {node_id[-4:]}")
-                    self.db_manager.register_node(node_id, alias)
-                    self.update_node_selectors()
-                bat = packet['decoded'].get('telemetry', {}).get('deviceMetrics', {}).get('batteryLevel')
-                snr = packet.get('snr')
-                rssi = packet.get('rssi')
-                hops = packet.get('hopLimit')
-                self.db_manager.update_node_stats(node_id, bat, snr, rssi, hops)
-                
-                if self.local_node_id and snr is not None:
-                    self.db_manager.update_link(node_id, self.local_node_id, snr)
-
-                portnum = packet['decoded'].get('portnum')
-                if portnum == 'TEXT_MESSAGE_APP': self.tabs['msg'].handle_text_message(packet)
-                elif portnum == 'TELEMETRY_APP': self.handle_telemetry(packet)
-                elif portnum == 'POSITION_APP': self.handle_position(packet)
-                elif portnum == 'OPAQUE_APP': self.tabs['detail'].handle_binary_sensor(packet)
+                record = self.full_packet_queue.get_nowait()
+                if not isinstance(record, PacketRecord): continue   # Estados de conexión y líneas del puerto genérico
+                with PACKET_PROCESSING_SECONDS.time(portnum=record.portnum or 'N/A'):
+                    self.process_packet(record)
+                PACKETS_PROCESSED.inc()
         except queue.Empty:
             pass
 
+    def process_packet(self, record):
+        self.log_queue.put(("DEBUG", f"Paquete recibido: {record!r}"))
+
+        node_id = record.node_id
+        self.latency_tracer.begin(node_id, record.received_at)
+        if self.db_manager.record_packet(record, self.local_node_id):
+            self.update_node_selectors()
+        self.watch_node(node_id)
+
+        portnum = record.portnum
+        if portnum == 'TELEMETRY_APP':
+            self.poll_scheduler.on_data(node_id, POLL_TELEMETRY)
+            if node_id == self.local_node_id and record.channel_utilization is not None:
+                self.poll_scheduler.on_channel_utilization(record.channel_utilization)
+        elif portnum == 'POSITION_APP':
+            self.poll_scheduler.on_data(node_id, POLL_POSITION)
+
+        if portnum == 'TEXT_MESSAGE_APP':
+            with WIDGET_UPDATE_SECONDS.time(tab="msg"):
+                self.tabs['msg'].handle_text_message(record)
+        elif portnum == 'TELEMETRY_APP': self.handle_telemetry(record)
+        elif portnum == 'POSITION_APP': self.handle_position(record)
+        elif portnum == 'OPAQUE_APP': self.tabs['detail'].handle_binary_sensor(record)
+
+    def process_ingest_records(self):
+        """Muestra lo publicado por el proceso de ingesta, que ya lo guardó en la BD."""
+        if self.is_connected and not self.serial_manager.is_connected():
+            self.update_status_bar("El proceso de ingesta se detuvo", "red", False)
+            return
+        for record in self.serial_manager.poll():
+            node_id = record.node_id
+            timestamp = datetime.fromtimestamp(record.timestamp)
+            if record.kind == KIND_NODE:
+                if node_id not in self.known_node_ids:
+                    self.known_node_ids.add(node_id)
+                    self.update_node_selectors()
+            elif record.kind == KIND_READING:
+                self.poll_scheduler.on_data(node_id, POLL_TELEMETRY)
+                data = record.reading()
+                data['alias'] = self.db_manager.get_node_alias(node_id)
+                with WIDGET_UPDATE_SECONDS.time(tab="analysis"):
+                    self.tabs['analysis'].update_log(self.data_processor.get_bot_analysis_message(data))
+                self.show_reading(node_id, data, timestamp)
+            elif record.kind == KIND_POSITION:
+                self.poll_scheduler.on_data(node_id, POLL_POSITION)
+                lat, lon = record.values[:2]
+                with WIDGET_UPDATE_SECONDS.time(tab="map"):
+                    self.tabs['map'].update_map_marker(node_id, lat, lon)
+            elif record.kind == KIND_MESSAGE:
+                channel, is_direct = record.values[:2]
+                with WIDGET_UPDATE_SECONDS.time(tab="msg"):
+                    self.tabs['msg'].display_message(node_id, record.peer_id, record.text, timestamp, bool(is_direct),
+                                                     None if channel is None else int(channel))
+            elif record.kind == KIND_BINARY:
+                state = record.values[0]
+                self.tabs['detail'].show_binary_state(node_id, None if state is None else int(state))
+            elif record.kind == KIND_ALERT:
+                # La alerta ya está en la BD: solo falta notificarla y refrescar la lista
+                alias = self.db_manager.get_node_alias(node_id)
+                self.alert_queue.put((record.peer_id, alias or node_id[-4:], record.text))
+        if self.serial_manager.reader is not None and self.serial_manager.reader.lost:
+            PACKETS_DROPPED.inc(self.serial_manager.reader.lost, reason="bufer_compartido")
+            self.serial_manager.reader.lost = 0
+
     def process_error_queue(self):
         try:
             while not self.error_queue.empty():
@@ -263,59 +458,66 @@ class App(ctk.CTk):
             pass
             
     def process_alert_queue(self):
+        # La cola recibe (tipo, asunto, mensaje); las notificaciones se agrupan por tipo
+        received = 0
         try:
             while not self.alert_queue.empty():
-                title, message = self.alert_queue.get_nowait()
-                if PLYER_AVAILABLE:
-                    notification.notify(title=title, message=message, app_name="ECOLORA", timeout=10)
-                else:
-                    self.log_queue.put(("WARNING", "Notificación de escritorio omitida (plyer no disponible)."))
-                self.tabs['analysis'].load_alerts()
+                alert_type, subject, message = self.alert_queue.get_nowait()
+                self.notification_aggregator.add(alert_type, subject, message)
+                received += 1
         except queue.Empty:
             pass
+        # La lista de alertas se actualiza una sola vez por lote
+        if received:
+            self.tabs['analysis'].add_new_alerts()
+
+        notifications, suppressed = self.notification_aggregator.flush()
+        if suppressed:
+            self.log_queue.put(("WARNING", f"{suppressed} notificación(es) de alerta omitidas por el límite de frecuencia."))
+        if not notifications: return
+        notification = get_notifier()
+        if not notification:
+            self.log_queue.put(("WARNING", "Notificación de escritorio omitida (plyer no disponible)."))
+            return
+        for title, message in notifications:
+            notification.notify(title=title, message=message, app_name="ECOLORA", timeout=10)
             
-    def handle_telemetry(self, packet):
-        node_id = packet['fromId']
+    def handle_telemetry(self, record):
+        node_id = record.node_id
         self.log_queue.put(("INFO", f"Procesando telemetría del nodo {node_id[-4:]}"))
-        telemetry = packet['decoded'].get('telemetry', {})
-        processed_data = {'node_id': node_id}
+        processed_data = record.reading()
         node_info = self.db_manager.get_node(node_id)
         if node_info: processed_data['alias'] = node_info[1]
-        
-        if 'environmentMetrics' in telemetry:
-            em = telemetry['environmentMetrics']
-            if 'temperature' in em: processed_data['temperature'] = round(em['temperature'], 2)
-            if 'relativeHumidity' in em: processed_data['humidity'] = round(em['relativeHumidity'], 2)
-            if 'barometricPressure' in em: processed_data['pressure'] = round(em['barometricPressure'], 2)
-            if 'gasResistance' in em: processed_data['iaq'] = round(em['gasResistance'], 2)
-        
-        if 'deviceMetrics' in telemetry:
-            dm = telemetry['deviceMetrics']
-            if 'batteryLevel' in dm: processed_data['battery'] = min(100, dm['batteryLevel'])
 
         self.data_processor.evaluate_rules(processed_data, self.serial_manager)
 
         analysis_message = self.data_processor.get_bot_analysis_message(processed_data)
-        self.tabs['analysis'].update_log(analysis_message)
+        with WIDGET_UPDATE_SECONDS.time(tab="analysis"):
+            self.tabs['analysis'].update_log(analysis_message)
 
         if len(processed_data) > 1:
             smoothed_data = self.data_processor.smooth_data(processed_data)
             if smoothed_data:
                 self.db_manager.insert_reading(smoothed_data)
+                self.latency_tracer.mark(node_id, STAGE_PERSIST)
                 self.log_queue.put(("DEBUG", f"Nueva lectura guardada en BD para {node_id[-4:]}"))
-                self.tabs['dashboard'].update_data(node_id, smoothed_data)
-                if self.selected_node_id == node_id:
-                    self.tabs['detail'].update_ui(smoothed_data)
+                self.show_reading(node_id, smoothed_data)
+
+    def show_reading(self, node_id, data, timestamp=None):
+        self.timeseries_store.append(node_id, data, timestamp)
+        if self.api_server: self.api_server.publish(node_id, data, timestamp)
+        with WIDGET_UPDATE_SECONDS.time(tab="dashboard"):
+            self.tabs['dashboard'].update_data(node_id, data)
+        if self.selected_node_id == node_id:
+            with WIDGET_UPDATE_SECONDS.time(tab="detail"):
+                self.tabs['detail'].update_ui(data)
     
-    def handle_position(self, packet):
-        node_id = packet['fromId']
-        pos = packet['decoded'].get('position', {})
-        if 'latitudeI' in pos and 'longitudeI' in pos:
-            lat = pos['latitudeI'] / 1e7
-            lon = pos['longitudeI'] / 1e7
-            if lat != 0 and lon != 0:
-                self.db_manager.update_node_position(node_id, lat, lon)
-                self.tabs['map'].update_map_marker(node_id, lat, lon)
+    def handle_position(self, record):
+        # normalize_packet solo rellena la posición si ambas coordenadas son distintas de 0
+        if record.latitude is not None and record.longitude is not None:
+            self.db_manager.update_node_position(record.node_id, record.latitude, record.longitude)
+            with WIDGET_UPDATE_SECONDS.time(tab="map"):
+                self.tabs['map'].update_map_marker(record.node_id, record.latitude, record.longitude)
 
     def check_local_node_position(self, retries=5):
         if not self.is_connected or retries <= 0:
@@ -387,6 +589,8 @@ class App(ctk.CTk):
         node_list_display = [f"{n[1] or 'Sin Alias'} ({n[0][-4:]})" for n in nodes]
         self.tabs['detail'].update_node_selector(node_list_display)
         self.tabs['history'].update_node_selector(node_list_display)
+        self.tabs['analysis'].update_node_selector(node_list_display)
+        self.tabs['msg'].update_node_selector(node_list_display)
         if self.settings_window and self.settings_window.winfo_exists():
             self.settings_window.update_rules_list_view()
             self.settings_window.update_node_list_view()
@@ -410,11 +614,26 @@ class App(ctk.CTk):
             channel_names = ["Primary"] + [ch.settings.name for ch in self.serial_manager.get_channels() if hasattr(ch, 'settings') and ch.settings.name]
             node_list = self.db_manager.get_nodes()
             node_display_list = [f"{n[1] or 'Sin Alias'} ({n[0][-4:]})" for n in node_list if n[0] != self.local_node_id]
+            from tabs.settings_window import SettingsWindow
             self.settings_window = SettingsWindow(self, self, channel_names=channel_names, node_list=node_display_list)
             self.settings_window.grab_set()
         else:
             self.settings_window.focus()
 
+    def open_search(self):
+        if self.search_window is None or not self.search_window.winfo_exists():
+            from tabs.search_window import SearchWindow
+            self.search_window = SearchWindow(self, self)
+        else:
+            self.search_window.focus()
+
+    def open_diagnostics(self):
+        if self.diagnostics_window is None or not self.diagnostics_window.winfo_exists():
+            from tabs.diagnostics_window import DiagnosticsWindow
+            self.diagnostics_window = DiagnosticsWindow(self, self)
+        else:
+            self.diagnostics_window.focus()
+
     def show_loading_overlay(self, show=True):
         if show:
             self.overlay_frame.place(relx=0.5, rely=0.5, anchor="center")
@@ -430,49 +649,57 @@ class App(ctk.CTk):
         if not self.is_connected:
             self.log_queue.put(("ERROR", "Debes estar conectado para solicitar posiciones."))
             return
-        self.serial_manager.request_all_positions()
-        self.log_queue.put(("INFO", "Solicitando posiciones a todos los nodos..."))
+        node_ids = [n[0] for n in self.db_manager.get_nodes() if n[0] != self.local_node_id]
+        added = self.poll_scheduler.request(node_ids, POLL_POSITION)
+        self.log_queue.put(("INFO", f"Solicitando posiciones a {added} nodo(s), repartidas en {config.POLL_WINDOW_S}s ({len(node_ids) - added} con datos recientes)."))
+
+    def send_poll_request(self, node_id, kind):
+        if kind == POLL_POSITION:
+            return self.serial_manager.request_position(node_id) is not None
+        return self.serial_manager.request_telemetry(node_id) is not None
 
     def on_actuator_button_press(self):
-        threading.Thread(target=self._send_actuator_sequence, daemon=True).start()
-    
-    def _send_actuator_sequence(self):
-        self.after(0, self._set_actuator_buttons_state, "disabled", "Enviando...")
-        self.after(0, self.status_label.configure, {"text": "Enviando comando al actuador..."})
+        node_display = self.db_manager.get_setting("actuator_node_display")
+        node_id = self.get_full_node_id_from_display(node_display) if node_display else None
+        start_cmd = self.db_manager.get_setting("actuator_start_cmd")
+        stop_cmd = self.db_manager.get_setting("actuator_stop_cmd")
+        duration_str = self.db_manager.get_setting("actuator_duration", "0")
+
+        if not node_id or not start_cmd:
+            self.error_queue.put(("No Configurado", "La acción del actuador no está configurada."))
+            return
 
-        try:
-            node_display = self.db_manager.get_setting("actuator_node_display")
-            node_id = self.get_full_node_id_from_display(node_display) if node_display else None
-            start_cmd = self.db_manager.get_setting("actuator_start_cmd")
-            stop_cmd = self.db_manager.get_setting("actuator_stop_cmd")
-            duration_str = self.db_manager.get_setting("actuator_duration", "0")
-            
-            if not node_id or not start_cmd:
-                self.error_queue.put(("No Configurado", "La acción del actuador no está configurada."))
-                return
+        if not self.serial_manager.is_node_known(node_id):
+            self.error_queue.put(("Error de Envío", f"No se pudo enviar el comando.\nEl nodo objetivo ({node_id[-4:]}) no está en la red."))
+            self.log_queue.put(("ERROR", f"Intento de activar acción en nodo desconocido: {node_id}"))
+            return
 
-            if not self.serial_manager.is_node_known(node_id):
-                self.error_queue.put(("Error de Envío", f"No se pudo enviar el comando.\nEl nodo objetivo ({node_id[-4:]}) no está en la red."))
-                self.log_queue.put(("ERROR", f"Intento de activar acción en nodo desconocido: {node_id}"))
-                return
+        duration = int(duration_str) if duration_str.isdigit() else 0
 
-            duration = int(duration_str) if duration_str.isdigit() else 0
-            
-            self.log_queue.put(("CONTROL", f"Enviando '{start_cmd}' al nodo {node_id}"))
-            success = self.serial_manager.send_text_message(start_cmd, destination_id=node_id, want_ack=True)
-            
+        def on_start_result(message, success):
+            # Llamado desde el hilo de transmisión: solo colas y after()
             if not success:
                 self.error_queue.put(("Fallo de Envío", f"El nodo actuador ({node_id[-4:]}) no respondió.\nPuede estar fuera de rango o apagado."))
-                return
+            else:
+                self.log_queue.put(("INFO", f"Comando '{start_cmd}' confirmado por el nodo {node_id[-4:]}."))
+            self.after(0, self._restore_actuator_buttons)
 
-            self.log_queue.put(("INFO", f"Comando '{start_cmd}' confirmado por el nodo {node_id[-4:]}."))
+        self.log_queue.put(("CONTROL", f"Enviando '{start_cmd}' al nodo {node_id}"))
+        if self.serial_manager.send_text_message(start_cmd, destination_id=node_id, want_ack=True, priority=PRIORITY_CONTROL, on_result=on_start_result):
             if duration > 0 and stop_cmd:
-                self.log_queue.put(("CONTROL", f"Esperando {duration} segundos..."))
-                time.sleep(duration)
-                self.log_queue.put(("CONTROL", f"Enviando comando de fin '{stop_cmd}' al nodo {node_id}"))
-                self.serial_manager.send_text_message(stop_cmd, destination_id=node_id, want_ack=False)
-        finally:
-            self.after(0, self._restore_actuator_buttons)
+                # El fin se programa en la BD antes de saber si llegó el inicio: un reinicio
+                # o un ACK perdido nunca deben dejar el actuador encendido
+                self.command_scheduler.schedule(stop_cmd, node_id=node_id, delay_s=duration, priority=PRIORITY_CONTROL, want_ack=True, label="actuator_stop")
+                self.log_queue.put(("CONTROL", f"Comando de fin '{stop_cmd}' programado en {duration} segundos."))
+            self._set_actuator_buttons_state("disabled", "Enviando...")
+            self.status_label.configure(text="Enviando comando al actuador...")
+
+    def dispatch_scheduled_command(self, job, on_result):
+        """Pasa un comando programado a la cola de transmisión (desde el hilo del programador)."""
+        self.log_queue.put(("CONTROL", f"Comando programado #{job.job_id}: '{job.command}' al nodo {job.node_id or '^all'}"))
+        return self.serial_manager.send_text_message(job.command, destination_id=job.node_id, channel_index=job.channel_index,
+                                                     want_ack=job.want_ack, priority=job.priority,
+                                                     on_result=lambda message, success: on_result(success)) is not None
 
     def _set_actuator_buttons_state(self, state, text):
         self.tabs['detail'].actuator_button.configure(state=state, text=text)
@@ -497,7 +724,17 @@ class App(ctk.CTk):
         self.status_label.configure(text=self.original_status_text)
 
     def on_closing(self):
-        if self.is_connected:
+        if self.ingest_process and self.initialized:
+            # El proceso de ingesta sigue recibiendo y guardando; solo "Desconectar" lo detiene
+            self.serial_manager.stop()
+        elif self.is_connected:
             self.serial_manager.disconnect()
+        if self.initialized:
+            self.command_scheduler.stop()
+            if self.api_server: self.api_server.stop()
+            self.save_state_snapshot()
+            self.tabs['serial'].log_store.close()
+            self.tabs['detail'].history_pager.close()
+        loop_profiler.disable()
         self.db_manager.close()
         self.destroy()
\ No newline at end of file
@@ -0,0 +1,58 @@
+# =============================================================================
+# ### ARCHIVO: heartbeat_monitor.py ###
+# =============================================================================
+# Detección de nodos desconectados con un montículo (heap) de plazos. Cada
+# paquete recibido actualiza el plazo del nodo en O(log n) y solo hace falta
+# revisar el plazo más próximo, sin recorrer todos los nodos.
+import heapq
+import itertools
+import time
+
+class HeartbeatMonitor:
+    def __init__(self, default_timeout_s, node_timeouts_s=None):
+        self.default_timeout_s = default_timeout_s
+        self.node_timeouts_s = dict(node_timeouts_s or {})
+        self.deadlines = {}     # node_id -> plazo vigente (epoch)
+        self.heap = []          # (plazo, secuencia, node_id); las entradas obsoletas se descartan al salir
+        self.sequence = itertools.count()
+
+    def get_timeout(self, node_id):
+        return self.node_timeouts_s.get(node_id, self.default_timeout_s)
+
+    def touch(self, node_id, seen_at=None):
+        """Registra actividad del nodo. Devuelve su nuevo plazo."""
+        seen_at = time.time() if seen_at is None else seen_at
+        deadline = seen_at + self.get_timeout(node_id)
+        self.deadlines[node_id] = deadline
+        heapq.heappush(self.heap, (deadline, next(self.sequence), node_id))
+        # Cada paquete deja una entrada obsoleta; se compacta si se acumulan demasiadas
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self._compact()
+        return deadline
+
+    def _compact(self):
+        self.heap = [(deadline, next(self.sequence), node_id) for node_id, deadline in self.deadlines.items()]
+        heapq.heapify(self.heap)
+
+    def next_deadline(self):
+        """Plazo vigente más próximo, o None si no hay nodos vigilados."""
+        while self.heap:
+            deadline, _, node_id = self.heap[0]
+            if self.deadlines.get(node_id) == deadline:
+                return deadline
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_expired(self, now=None):
+        """Devuelve [(node_id, plazo)] de los nodos cuyo plazo ya venció.
+
+        Cada nodo se devuelve una sola vez: deja de vigilarse hasta que vuelva a llegar un paquete suyo.
+        """
+        now = time.time() if now is None else now
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, node_id = heapq.heappop(self.heap)
+            if self.deadlines.get(node_id) == deadline:
+                del self.deadlines[node_id]
+                expired.append((node_id, deadline))
+        return expired
@@ -0,0 +1,121 @@
+# =============================================================================
+# ### ARCHIVO: history_pager.py ###
+# =============================================================================
+# Carga en segundo plano ventanas del historial de lecturas para la gráfica
+# del detalle de nodo. Cada ventana se reduce con min/max por columna de
+# píxeles y las ventanas vistas recientemente se guardan en una caché LRU.
+import collections
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+def decimate_minmax(rows, n_buckets, metrics=('temperature', 'humidity')):
+    """Reduce filas (timestamp, valor_1, ..., valor_n) a como mucho ~2*n_buckets*n puntos.
+
+    Las filas se reparten por tiempo en n_buckets intervalos y de cada uno se
+    conservan las filas con el mínimo y el máximo de cada métrica, de modo que
+    los picos siguen siendo visibles. Devuelve {'timestamps': [...], metric: [...]}.
+    """
+    series = {'timestamps': []}
+    for metric in metrics: series[metric] = []
+    if not rows: return series
+
+    if n_buckets <= 0 or len(rows) <= 2 * n_buckets:
+        keep = range(len(rows))
+    else:
+        t0 = rows[0][0].timestamp()
+        span = (rows[-1][0].timestamp() - t0) or 1.0
+        extremes = {}  # bucket -> [(min_val, idx), (max_val, idx)] por métrica
+        for idx, row in enumerate(rows):
+            bucket = min(n_buckets - 1, int((row[0].timestamp() - t0) / span * n_buckets))
+            current = extremes.get(bucket)
+            if current is None:
+                extremes[bucket] = [[(v, idx), (v, idx)] for v in row[1:]]
+                continue
+            for m, value in enumerate(row[1:]):
+                if value < current[m][0][0]: current[m][0] = (value, idx)
+                if value > current[m][1][0]: current[m][1] = (value, idx)
+        keep = sorted({idx for per_metric in extremes.values() for low_high in per_metric for _, idx in low_high})
+
+    for idx in keep:
+        row = rows[idx]
+        series['timestamps'].append(row[0])
+        for metric, value in zip(metrics, row[1:]):
+            series[metric].append(value)
+    return series
+
+
+class HistoryPager:
+    def __init__(self, db_manager, cache_size=32):
+        self.db = db_manager
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def get_cached(self, key):
+        with self.cache_lock:
+            data = self.cache.get(key)
+            if data is not None:
+                self.cache.move_to_end(key)
+            return data
+
+    def _store(self, key, data):
+        with self.cache_lock:
+            self.cache[key] = data
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def request(self, node_id, start, end, n_buckets):
+        """Pide una ventana [start, end]. Si está en caché la devuelve; si no, la encola y devuelve None.
+
+        El resultado llega por self.results como (clave, datos); datos es None si falló la consulta.
+        """
+        key = (node_id, start, end, n_buckets)
+        data = self.get_cached(key)
+        if data is None:
+            self.requests.put(key)
+        return data
+
+    def close(self):
+        """Detiene el hilo de carga y cierra su conexión (al salir de la aplicación)."""
+        self.requests.put(None)
+        self.thread.join(timeout=2)
+
+    def _worker(self):
+        # Conexión propia: el cursor del DatabaseManager pertenece al hilo de la GUI
+        conn = self.db.create_reader()
+        try:
+            self._serve(conn)
+        finally:
+            conn.close()
+
+    def _serve(self, conn):
+        while True:
+            keys = [self.requests.get()]
+            # Si el usuario sigue desplazándose, solo interesa la última ventana pedida
+            try:
+                while True: keys.append(self.requests.get_nowait())
+            except queue.Empty:
+                pass
+            if None in keys: return
+            key = keys[-1]
+
+            data = self.get_cached(key)
+            if data is None:
+                node_id, start, end, n_buckets = key
+                try:
+                    rows = [(datetime.fromisoformat(ts), temp, hum) for ts, temp, hum in
+                            self.db.get_readings_between(node_id, start.isoformat(), end.isoformat(), conn=conn)]
+                except (sqlite3.Error, ValueError) as e:
+                    print(f"Error al cargar el historial de {node_id}: {e}")
+                    self.results.put((key, None))
+                    continue
+                data = decimate_minmax(rows, n_buckets)
+                self._store(key, data)
+            self.results.put((key, data))
@@ -0,0 +1,179 @@
+# =============================================================================
+# ### ARCHIVO: ingest_client.py ###
+# =============================================================================
+# Lado GUI de la arquitectura de dos procesos. La recepción, las reglas del bot
+# y la escritura en la BD corren en un proceso aparte (service.py), así que un
+# redibujado pesado de matplotlib ya no retrasa on_receive ni la evaluación de
+# reglas, y un cierre inesperado de la GUI no pierde datos. Ambos procesos se
+# comunican por dos búferes compartidos (shared_ring.py): el de ingesta
+# publica lecturas, nodos, posiciones y mensajes; la GUI publica los envíos.
+#
+# Ofrece a la GUI la misma interfaz que SerialManager para conectar,
+# desconectar y enviar mensajes, y la de CommandScheduler para programar
+# comandos: los ejecuta el proceso de ingesta, así que el "stop" de un
+# actuador se envía aunque la GUI se cierre o falle.
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import config
+from shared_ring import (RingReader, RingWriter, MAX_TEXT_BYTES, KIND_SEND_TEXT, KIND_REQUEST_POSITION, KIND_REQUEST_TELEMETRY,
+                         KIND_SCHEDULE, KIND_CANCEL_SCHEDULE)
+from tx_queue import PRIORITY_USER, PRIORITY_POLL
+
+SERVICE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "service.py")
+
+class IngestClient:
+    def __init__(self, status_callback, log_queue):
+        self.status_callback = status_callback
+        self.log_queue = log_queue
+        self.process = None
+        self.reader = None
+        self.commands = None
+        self.interface = None       # La interfaz Meshtastic vive en el proceso de ingesta
+        self.tx = None              # La cola de transmisión también
+        self.known_nodes = set()
+
+    def get_available_ports(self):
+        import serial.tools.list_ports
+        return [port.device for port in serial.tools.list_ports.comports()]
+
+    def get_channels(self):
+        return []
+
+    def attach(self):
+        """Se engancha a un proceso de ingesta ya en marcha (p. ej. tras reiniciar la GUI). Devuelve True si lo hay."""
+        if not os.path.exists(config.INGEST_RING_FILE): return False
+        try:
+            reader = RingReader(config.INGEST_RING_FILE)
+        except (OSError, ValueError):
+            return False
+        if not reader.writer_alive(config.INGEST_HEARTBEAT_TIMEOUT_S):
+            reader.close()
+            return False
+        self.reader = reader
+        self.commands = RingWriter(config.INGEST_COMMAND_RING_FILE, config.INGEST_RING_CAPACITY)
+        self.log_queue.put(("INFO", f"Conectado al proceso de ingesta existente (PID {reader.writer_pid()})."))
+        self.status_callback("Conectado al proceso de ingesta", "green", True)
+        return True
+
+    def connect(self, port):
+        """Arranca el proceso de ingesta en el puerto indicado y espera su primer latido."""
+        self.log_queue.put(("INFO", f"Iniciando el proceso de ingesta en el puerto {port}..."))
+        # El búfer de envíos se crea antes para que el servicio lo encuentre al arrancar
+        self.commands = self.commands or RingWriter(config.INGEST_COMMAND_RING_FILE, config.INGEST_RING_CAPACITY)
+        # Empaquetado con PyInstaller, el propio ejecutable hace de servicio (main.py --service)
+        entry = ["--service"] if getattr(sys, "frozen", False) else [SERVICE_SCRIPT]
+        command = [sys.executable, *entry, "--port", port, "--db", config.DB_NAME,
+                   "--ring", config.INGEST_RING_FILE, "--commands", config.INGEST_COMMAND_RING_FILE]
+        try:
+            self.process = subprocess.Popen(command)
+        except OSError as e:
+            self.log_queue.put(("ERROR", f"No se pudo iniciar el proceso de ingesta: {e}"))
+            self.status_callback("Error de conexión", "red", False)
+            return
+
+        deadline = time.time() + config.INGEST_START_TIMEOUT_S
+        while time.time() < deadline and self.process.poll() is None:
+            try:
+                reader = RingReader(config.INGEST_RING_FILE)
+                if reader.writer_pid() == self.process.pid and reader.writer_alive(config.INGEST_HEARTBEAT_TIMEOUT_S):
+                    self.reader = reader
+                    self.status_callback(f"Conectado a {port} (proceso de ingesta)", "green", True)
+                    return
+                reader.close()
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.2)
+
+        self.log_queue.put(("ERROR", "El proceso de ingesta no respondió a tiempo."))
+        self.disconnect()
+
+    def disconnect(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()    # SIGTERM: el servicio se detiene limpiamente
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        elif self.process is None and self.reader is not None:
+            # Proceso heredado de una sesión anterior de la GUI
+            try:
+                os.kill(self.reader.writer_pid(), signal.SIGTERM)
+            except OSError:
+                pass
+        self.process = None
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        self.status_callback("Desconectado", "gray", False)
+
+    def stop(self):
+        """Al cerrar la GUI el proceso de ingesta sigue funcionando; solo se sueltan los búferes."""
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        if self.commands is not None:
+            self.commands.close()
+            self.commands = None
+
+    def is_connected(self):
+        return self.reader is not None and self.reader.writer_alive(config.INGEST_HEARTBEAT_TIMEOUT_S)
+
+    def poll(self):
+        """Registros publicados por el proceso de ingesta desde la última llamada."""
+        if self.reader is None: return []
+        records = self.reader.read()
+        for record in records:
+            if record.node_id: self.known_nodes.add(record.node_id)
+        return records
+
+    def is_node_known(self, node_id):
+        return node_id in self.known_nodes
+
+    def _send(self, kind, node_id=None, text="", values=(), peer_id=None):
+        if not self.is_connected():
+            self.log_queue.put(("ERROR", "No hay proceso de ingesta conectado para enviar."))
+            return None
+        if len(text.encode("utf-8")) > MAX_TEXT_BYTES:
+            # No se recorta: el mensaje saldría distinto de lo que escribió el usuario
+            self.log_queue.put(("ERROR", f"El mensaje supera los {MAX_TEXT_BYTES} bytes que admite un paquete Meshtastic; no se envió."))
+            return None
+        self.commands.write(kind, node_id=node_id, peer_id=peer_id, values=values, text=text)
+        return True
+
+    def send_text_message(self, text, destination_id=None, channel_index=0, want_ack=False, priority=PRIORITY_USER, on_result=None, delay_s=0):
+        """Pasa el envío al proceso de ingesta. on_result indica solo que lo recibió, no el ACK de la malla."""
+        queued = self._send(KIND_SEND_TEXT, destination_id, text, (channel_index, 1 if want_ack else 0, priority, delay_s))
+        if on_result: on_result(None, queued is not None)
+        return queued
+
+    def send_command(self, command):
+        return self.send_text_message(command)
+
+    def request_position(self, node_id):
+        return self._send(KIND_REQUEST_POSITION, node_id, values=(0, 0, PRIORITY_POLL))
+
+    def request_telemetry(self, node_id):
+        return self._send(KIND_REQUEST_TELEMETRY, node_id, values=(0, 0, PRIORITY_POLL))
+
+
+class RemoteCommandScheduler:
+    """Sustituye a CommandScheduler en la GUI: pasa las programaciones al proceso de ingesta."""
+    def __init__(self, client):
+        self.client = client
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def schedule(self, command, node_id=None, delay_s=0, interval_s=None, channel_index=0, priority=0, want_ack=False, label=None):
+        """Devuelve True si la programación llegó al proceso de ingesta (el id del trabajo lo asigna ese proceso)."""
+        return self.client._send(KIND_SCHEDULE, node_id, command, (delay_s, interval_s, channel_index, priority, 1 if want_ack else 0), peer_id=label)
+
+    def cancel(self, job_id):
+        return self.client._send(KIND_CANCEL_SCHEDULE, values=(job_id,))
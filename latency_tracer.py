@@ -0,0 +1,49 @@
+# =============================================================================
+# ### ARCHIVO: latency_tracer.py ###
+# =============================================================================
+# Trazado de latencia por paquete, desde la recepción por radio hasta que la
+# lectura se dibuja en el Dashboard. El PacketRecord creado en
+# SerialManager.on_receive lleva el instante de llegada (received_at) y las
+# etapas siguientes se miden al desencolarlo, al guardarlo (insert_reading) y al dibujarlo
+# (DashboardTab.update_widget). Cada etapa alimenta un histograma y el total
+# se compara con el SLA ("lectura visible en menos de 2 s").
+import time
+
+from metrics import PACKET_LATENCY_SECONDS, READING_SLA
+
+STAGE_QUEUE = "cola"            # on_receive -> desencolado
+STAGE_PERSIST = "guardado"      # desencolado -> insert_reading
+STAGE_RENDER = "dibujado"       # insert_reading -> update_widget
+STAGE_TOTAL = "total"           # on_receive -> update_widget
+
+class LatencyTracer:
+    def __init__(self, sla_s):
+        self.sla_s = sla_s
+        self.pending = {}   # node_id -> [recibido, última marca] de la lectura en curso del nodo
+
+    def begin(self, node_id, received_at, now=None):
+        """Empieza la traza de un paquete recién desencolado; received_at es su llegada (time.monotonic())."""
+        if received_at is None: return
+        now = time.monotonic() if now is None else now
+        PACKET_LATENCY_SECONDS.observe(now - received_at, stage=STAGE_QUEUE)
+        # Si la lectura anterior del nodo no llegó a dibujarse, se abandona su traza
+        self.pending[node_id] = [received_at, now]
+
+    def mark(self, node_id, stage, now=None):
+        trace = self.pending.get(node_id)
+        if trace is None: return
+        now = time.monotonic() if now is None else now
+        PACKET_LATENCY_SECONDS.observe(now - trace[1], stage=stage)
+        trace[1] = now
+
+    def finish(self, node_id, now=None):
+        """La lectura ya está en pantalla: cierra la traza y la compara con el SLA."""
+        trace = self.pending.get(node_id)
+        if trace is None: return None
+        now = time.monotonic() if now is None else now
+        self.mark(node_id, STAGE_RENDER, now)
+        del self.pending[node_id]
+        total = now - trace[0]
+        PACKET_LATENCY_SECONDS.observe(total, stage=STAGE_TOTAL)
+        READING_SLA.inc(result="cumplido" if total <= self.sla_s else "incumplido")
+        return total
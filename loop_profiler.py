@@ -0,0 +1,185 @@
+# =============================================================================
+# ### ARCHIVO: loop_profiler.py ###
+# =============================================================================
+# Perfilador del bucle de eventos de Tk para diagnosticar bloqueos de la
+# interfaz en campo. Mientras está activo, cada callback programado con
+# after()/after_idle() (process_queues, check_node_heartbeats, refrescos de las
+# pestañas...) se cronometra. Los que superan el umbral se escriben en un
+# archivo junto con las pilas muestreadas durante su ejecución y las
+# asignaciones de memoria (tracemalloc) desde el informe anterior.
+#
+# Se activa y desactiva en caliente desde la ventana de Diagnóstico, o al
+# arrancar con "--profile-loop", ECOLORA_PROFILE_LOOP=1 o config.LOOP_PROFILE.
+import collections
+import os
+import sys
+import threading
+import time
+import tkinter
+import traceback
+import tracemalloc
+from datetime import datetime
+
+import config
+from metrics import TK_CALLBACK_SECONDS
+
+_original_after = tkinter.Misc.after
+_original_after_idle = tkinter.Misc.after_idle
+_enabled = False
+_started_tracemalloc = False
+_output = None
+_baseline = None
+_main_thread_id = threading.main_thread().ident
+_stats = {}                 # callback -> [llamadas, tiempo total, tiempo máximo, lentas]
+_running = []               # Callbacks en curso (pueden anidarse si uno llama a update())
+_samples = []               # Pilas muestreadas del callback más interno en curso
+_samples_lock = threading.Lock()
+_sampler_stop = threading.Event()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_if_requested():
+    requested = (
+        "--profile-loop" in sys.argv
+        or os.environ.get("ECOLORA_PROFILE_LOOP") == "1"
+        or getattr(config, "LOOP_PROFILE", False)
+    )
+    if requested:
+        enable()
+    return requested
+
+
+def enable(path=None):
+    """Empieza a cronometrar los callbacks. Devuelve la ruta del archivo de salida."""
+    global _enabled, _output, _baseline, _started_tracemalloc
+    if _enabled: return _output.name
+    path = path or config.LOOP_PROFILE_FILE
+    _output = open(path, "a", encoding="utf-8")
+    _output.write(f"=== Perfil del bucle de eventos iniciado {datetime.now().isoformat(timespec='seconds')} "
+                  f"(umbral {config.LOOP_PROFILE_SLOW_MS} ms) ===\n\n")
+    _output.flush()
+    _stats.clear()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(config.LOOP_PROFILE_TRACEMALLOC_FRAMES)
+        _started_tracemalloc = True
+    _baseline = tracemalloc.take_snapshot()
+    tkinter.Misc.after = _profiled_after
+    tkinter.Misc.after_idle = _profiled_after_idle
+    _sampler_stop.clear()
+    threading.Thread(target=_sampler, daemon=True).start()
+    _enabled = True
+    return path
+
+
+def disable():
+    """Deja de cronometrar, escribe el resumen por callback y cierra el archivo."""
+    global _enabled, _output, _baseline, _started_tracemalloc
+    if not _enabled: return None
+    _enabled = False
+    _sampler_stop.set()
+    tkinter.Misc.after = _original_after
+    tkinter.Misc.after_idle = _original_after_idle
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _baseline = None
+
+    lines = ["--- Resumen por callback (llamadas / total / media / máximo / lentas) ---"]
+    for name, (calls, total, worst, slow) in sorted(_stats.items(), key=lambda item: item[1][1], reverse=True):
+        lines.append(f"{calls:8d} {total * 1000:10.1f} ms {total / calls * 1000:8.2f} ms {worst * 1000:8.1f} ms {slow:6d}  {name}")
+    _output.write("\n".join(lines) + "\n\n")
+    path = _output.name
+    _output.close()
+    _output = None
+    return path
+
+
+def _callback_name(func):
+    target = getattr(func, "func", func)    # functools.partial
+    owner = getattr(target, "__self__", None)
+    if owner is not None and not isinstance(owner, type(sys)):
+        return f"{type(owner).__name__}.{target.__name__}"
+    name = getattr(target, "__qualname__", repr(target))
+    code = getattr(target, "__code__", None)
+    if code is not None and "<lambda>" in name:
+        name += f" ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+def _wrap(func):
+    name = _callback_name(func)
+
+    def profiled(*args):
+        # Los callbacks ya envueltos siguen funcionando tras desactivar el perfilador
+        if not _enabled: return func(*args)
+        _begin(name)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            _end(name, time.perf_counter() - start)
+    return profiled
+
+
+def _profiled_after(self, ms, func=None, *args):
+    if func is None: return _original_after(self, ms)
+    return _original_after(self, ms, _wrap(func), *args)
+
+
+def _profiled_after_idle(self, func, *args):
+    return _original_after_idle(self, _wrap(func), *args)
+
+
+def _begin(name):
+    with _samples_lock:
+        _running.append((name, list(_samples)))
+        _samples.clear()
+
+
+def _end(name, elapsed):
+    with _samples_lock:
+        samples = list(_samples)
+        _samples[:] = _running.pop()[1]
+    if not _enabled: return     # Se desactivó durante el callback
+    TK_CALLBACK_SECONDS.observe(elapsed, callback=name)
+    stats = _stats.setdefault(name, [0, 0.0, 0.0, 0])
+    stats[0] += 1
+    stats[1] += elapsed
+    stats[2] = max(stats[2], elapsed)
+    if elapsed * 1000 >= config.LOOP_PROFILE_SLOW_MS:
+        stats[3] += 1
+        _report_slow(name, elapsed, samples)
+
+
+def _sampler():
+    # Solo muestrea la pila del hilo principal mientras hay un callback en curso
+    interval = config.LOOP_PROFILE_SAMPLE_MS / 1000
+    while not _sampler_stop.wait(interval):
+        with _samples_lock:
+            if not _running: continue
+            frame = sys._current_frames().get(_main_thread_id)
+            if frame is None: continue
+            stack = traceback.extract_stack(frame)[-config.LOOP_PROFILE_STACK_DEPTH:]
+            _samples.append(tuple(f"{os.path.basename(f.filename)}:{f.lineno} {f.name}" for f in stack))
+
+
+def _report_slow(name, elapsed, samples):
+    global _baseline
+    lines = [f"[{datetime.now().isoformat(timespec='milliseconds')}] {name}: {elapsed * 1000:.1f} ms"]
+    if samples:
+        lines.append(f"  Pilas muestreadas ({len(samples)} muestras cada {config.LOOP_PROFILE_SAMPLE_MS} ms):")
+        for stack, count in collections.Counter(samples).most_common(3):
+            lines.append(f"    {count} x")
+            lines.extend(f"      {frame}" for frame in stack)
+    # La instantánea se toma fuera del tiempo medido del callback
+    snapshot = tracemalloc.take_snapshot()
+    differences = snapshot.compare_to(_baseline, "lineno")[:config.LOOP_PROFILE_TRACEMALLOC_TOP]
+    _baseline = snapshot
+    if differences:
+        lines.append("  Memoria desde el informe anterior:")
+        lines.extend(f"    {stat}" for stat in differences)
+    _output.write("\n".join(lines) + "\n\n")
+    _output.flush()
@@ -1,9 +1,22 @@
 # =============================================================================
 # ### ARCHIVO: main.py ###
 # =============================================================================
+import sys
+
+# En el ejecutable empaquetado no hay service.py suelto: la GUI lanza el proceso
+# de ingesta como "main.exe --service ..." y se atiende aquí, sin cargar la interfaz
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "--service":
+    import service
+    sys.exit(service.main(sys.argv[2:]))
+
+# El perfilador debe activarse antes de importar cualquier otra librería
+import startup_profiler
+startup_profiler.enable_if_requested()
+
 import customtkinter as ctk
 from PIL import Image
 from gui_manager import App
+import loop_profiler
 import os
 
 class SplashScreen(ctk.CTkToplevel):
@@ -17,9 +30,9 @@ class SplashScreen(ctk.CTkToplevel):
             max_size = (400, 400)
             pil_image.thumbnail(max_size, Image.Resampling.LANCZOS)
             ctk_image = ctk.CTkImage(pil_image, size=pil_image.size)
-            
+
             self.geometry(f"{pil_image.width}x{pil_image.height}")
-            
+
             screen_width = self.winfo_screenwidth()
             screen_height = self.winfo_screenheight()
             x = (screen_width / 2) - (pil_image.width / 2)
@@ -28,24 +41,33 @@ class SplashScreen(ctk.CTkToplevel):
 
             label = ctk.CTkLabel(self, text="", image=ctk_image)
             label.pack(expand=True, fill="both")
-        
-        # Después de 2.5 segundos, llama a la función para cerrar el splash
-        self.after(2500, self.close_splash)
+
+    def run_initialization(self):
+        """Inicializa la app principal y cierra el splash en cuanto termina."""
+        try:
+            self.master.initialize()
+        finally:
+            self.close_splash()
 
     def close_splash(self):
         self.master.deiconify() # Muestra la ventana principal que estaba oculta
         self.destroy()         # Destruye la ventana del splash
 
 if __name__ == "__main__":
-    # 1. Crear la instancia de la aplicación principal
-    app = App()
-    
+    # 1. Crear la ventana principal sin construir todavía la interfaz
+    with startup_profiler.phase("Ventana principal"):
+        app = App(defer_init=True)
+
     # 2. Ocultarla temporalmente
     app.withdraw()
-    
+
     # 3. Crear y mostrar el splash screen, pasándole la app principal como master
-    splash = SplashScreen(app)
-    
-    # 4. Iniciar el ÚNICO bucle de eventos principal.
-    #    Este bucle manejará el splash y, cuando se cierre, continuará con la app.
-    app.mainloop()
\ No newline at end of file
+    with startup_profiler.phase("Splash"):
+        splash = SplashScreen(app)
+        splash.update()
+
+    # 4. La inicialización pesada arranca con el bucle de eventos; el splash
+    #    se cierra en cuanto termina, sin esperas fijas.
+    loop_profiler.enable_if_requested()
+    app.after(0, splash.run_initialization)
+    app.mainloop()
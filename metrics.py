@@ -0,0 +1,181 @@
+# =============================================================================
+# ### ARCHIVO: metrics.py ###
+# =============================================================================
+# Registro de métricas internas (contadores, histogramas y medidores) de la
+# ruta de ingesta: paquetes por nodo, profundidad de colas, tiempo de las
+# reglas, latencia de escritura en la BD y de actualización de las pestañas.
+# Se exporta en formato de texto de Prometheus (GET /metrics en la API local)
+# y se muestra en la ventana de diagnóstico.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites de los histogramas de tiempos (segundos)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Latencias de extremo a extremo, con límites alrededor del SLA de 2 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs: return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return sorted(self.values.items())
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self.samples()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}    # etiquetas -> [conteos por cubeta (no acumulados), suma, total]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        """[(etiquetas, conteos, suma, total)] con copias de los conteos."""
+        with self.lock:
+            return sorted((key, list(counts), total_sum, count) for key, (counts, total_sum, count) in self.series.items())
+
+    def quantile(self, counts, q):
+        """Cuantil aproximado a partir de los conteos por cubeta (límite superior de la cubeta)."""
+        total = sum(counts)
+        if not total: return None
+        target, accumulated = q * total, 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            accumulated += bucket_count
+            if accumulated >= target: return bound
+        return float('inf')
+
+    def render(self):
+        lines = []
+        for key, counts, total_sum, count in self.samples():
+            accumulated = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                accumulated += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {accumulated}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Medidor que se lee al exportar: read() devuelve un número o {(('etiqueta', valor),): número}."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        if value is None: return []
+        if isinstance(value, dict): return sorted(value.items())
+        return [((), value)]
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self.samples()]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Gauge): return existing
+            self.metrics[metric.name] = metric     # Un medidor nuevo sustituye al anterior (p. ej. al reiniciar la GUI)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def gauge(self, name, help_text, read):
+        return self._register(Gauge(name, help_text, read))
+
+    def all(self):
+        with self.lock:
+            return sorted(self.metrics.values(), key=lambda metric: metric.name)
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self.all():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro único del proceso, igual que config: cada módulo declara aquí sus métricas
+REGISTRY = MetricsRegistry()
+
+PACKETS_RECEIVED = REGISTRY.counter("ecolora_packets_received_total", "Paquetes recibidos de la malla por nodo y tipo")
+PACKETS_PROCESSED = REGISTRY.counter("ecolora_packets_processed_total", "Paquetes procesados por la GUI o el servicio")
+PACKETS_DROPPED = REGISTRY.counter("ecolora_packets_dropped_total", "Paquetes o eventos descartados, por motivo")
+PACKET_PROCESSING_SECONDS = REGISTRY.histogram("ecolora_packet_processing_seconds", "Tiempo de procesado de cada paquete en la cola principal")
+RULE_EVALUATION_SECONDS = REGISTRY.histogram("ecolora_rule_evaluation_seconds", "Tiempo de evaluación de las reglas del bot por lectura")
+RULE_ACTIONS = REGISTRY.counter("ecolora_rule_actions_total", "Acciones de reglas disparadas o suprimidas")
+DB_WRITE_SECONDS = REGISTRY.histogram("ecolora_db_write_seconds", "Latencia de las escrituras (con commit) en la BD")
+WIDGET_UPDATE_SECONDS = REGISTRY.histogram("ecolora_widget_update_seconds", "Tiempo de actualización de las pestañas")
+TX_MESSAGES = REGISTRY.counter("ecolora_tx_messages_total", "Mensajes de la cola de transmisión por resultado")
+TK_CALLBACK_SECONDS = REGISTRY.histogram("ecolora_tk_callback_seconds", "Duración de los callbacks del bucle de Tk (solo con el perfilador activo)")
+PACKET_LATENCY_SECONDS = REGISTRY.histogram("ecolora_packet_latency_seconds", "Latencia de cada etapa desde la recepción por radio hasta el dibujado", LATENCY_BUCKETS)
+READING_SLA = REGISTRY.counter("ecolora_reading_sla_total", "Lecturas dibujadas dentro o fuera del SLA de visibilidad")
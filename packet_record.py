@@ -0,0 +1,105 @@
+# =============================================================================
+# ### ARCHIVO: packet_record.py ###
+# =============================================================================
+# Etapa única de normalización de los paquetes de Meshtastic. En cuanto llega
+# un paquete (SerialManager.on_receive) se convierte en un PacketRecord con
+# campos tipados y __slots__, y el diccionario anidado original (con su
+# protobuf "raw") se descarta. Así el resto de la aplicación no recorre
+# packet['decoded'].get('telemetry', {})... una y otra vez, y las colas con
+# paquetes atrasados ocupan una fracción de la memoria.
+import json
+import time
+
+# Métricas de una lectura, en el orden en que las usan la BD y las gráficas
+READING_METRICS = ('temperature', 'humidity', 'pressure', 'iaq', 'battery')
+
+class PacketRecord:
+    __slots__ = ('node_id', 'to_id', 'portnum', 'channel', 'is_direct', 'snr', 'rssi', 'hops', 'received_at',
+                 'temperature', 'humidity', 'pressure', 'iaq', 'battery', 'channel_utilization',
+                 'latitude', 'longitude', 'text', 'payload')
+
+    def __init__(self, node_id, portnum, received_at=None):
+        self.node_id = node_id
+        self.portnum = portnum
+        self.received_at = time.monotonic() if received_at is None else received_at
+        self.to_id = None
+        self.channel = None
+        self.is_direct = False
+        self.snr = None
+        self.rssi = None
+        self.hops = None
+        self.temperature = None
+        self.humidity = None
+        self.pressure = None
+        self.iaq = None
+        self.battery = None
+        self.channel_utilization = None
+        self.latitude = None
+        self.longitude = None
+        self.text = None
+        self.payload = None
+
+    def has_metrics(self):
+        return any(getattr(self, metric) is not None for metric in READING_METRICS)
+
+    def reading(self):
+        """Lectura para las reglas, el suavizado y la BD: {'node_id', métrica: valor}, solo con las métricas presentes."""
+        data = {'node_id': self.node_id}
+        for metric in READING_METRICS:
+            value = getattr(self, metric)
+            if value is not None: data[metric] = value
+        return data
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__ if getattr(self, name) not in (None, False))
+        return f"PacketRecord({fields})"
+
+
+def normalize_packet(packet, received_at=None):
+    """Convierte un paquete de Meshtastic en PacketRecord. Devuelve None si no trae origen o no está descifrado."""
+    node_id = packet.get('fromId')
+    decoded = packet.get('decoded')
+    if not node_id or not decoded: return None
+
+    record = PacketRecord(node_id, decoded.get('portnum'), received_at)
+    to = packet.get('to')
+    record.to_id = f"!{to:x}" if isinstance(to, int) else to
+    record.channel = packet.get('channel')
+    record.is_direct = bool(packet.get('isDirect', False))
+    record.snr = packet.get('snr')
+    record.rssi = packet.get('rssi')
+    record.hops = packet.get('hopLimit')
+
+    telemetry = decoded.get('telemetry')
+    if telemetry:
+        em = telemetry.get('environmentMetrics')
+        if em:
+            if 'temperature' in em: record.temperature = round(em['temperature'], 2)
+            if 'relativeHumidity' in em: record.humidity = round(em['relativeHumidity'], 2)
+            if 'barometricPressure' in em: record.pressure = round(em['barometricPressure'], 2)
+            if 'gasResistance' in em: record.iaq = round(em['gasResistance'], 2)
+        dm = telemetry.get('deviceMetrics')
+        if dm:
+            if 'batteryLevel' in dm: record.battery = min(100, dm['batteryLevel'])
+            record.channel_utilization = dm.get('channelUtilization')
+
+    position = decoded.get('position')
+    if position and position.get('latitudeI') and position.get('longitudeI'):
+        record.latitude = position['latitudeI'] / 1e7
+        record.longitude = position['longitudeI'] / 1e7
+
+    if record.portnum == 'TEXT_MESSAGE_APP':
+        record.text = decoded.get('payload', b'').decode('utf-8', 'ignore')
+    elif record.portnum == 'OPAQUE_APP':
+        record.payload = decoded.get('payload', b'')
+    return record
+
+
+def parse_binary_sensor(payload):
+    """Decodifica el JSON {"sensor", "state"} de un paquete OPAQUE_APP. Devuelve (sensor, estado) o None si está malformado."""
+    try:
+        data = json.loads((payload or b'').decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict) or 'sensor' not in data or 'state' not in data: return None
+    return data['sensor'], data['state']
@@ -0,0 +1,108 @@
+# =============================================================================
+# ### ARCHIVO: poll_scheduler.py ###
+# =============================================================================
+# Reparte en el tiempo las solicitudes de posición y telemetría a la flota
+# para evitar colisiones en el aire y ráfagas de respuestas. La separación
+# entre solicitudes se adapta a la latencia observada de las respuestas y a la
+# utilización del canal; los nodos con datos recientes se omiten.
+import collections
+import time
+
+POLL_POSITION = "position"
+POLL_TELEMETRY = "telemetry"
+
+class PollScheduler:
+    def __init__(self, send_request, window_s, min_spacing_s, freshness_s, target_channel_util, reply_timeout_s=120):
+        self.send_request = send_request    # send_request(node_id, tipo) -> True si se encoló
+        self.window_s = window_s
+        self.min_spacing_s = min_spacing_s
+        self.freshness_s = freshness_s
+        self.target_channel_util = target_channel_util
+        self.reply_timeout_s = reply_timeout_s
+
+        self.queue = collections.deque()    # (node_id, tipo) pendientes de la ronda actual
+        self.queued = set()
+        self.forced = set()                 # Pedidas a mano: van al principio y se envían aunque haya datos recientes
+        self.base_spacing_s = min_spacing_s
+        self.next_release = 0.0
+        self.last_release = 0.0
+        self.last_data = {}                 # (node_id, tipo) -> epoch del último dato recibido
+        self.in_flight = {}                 # (node_id, tipo) -> epoch de la solicitud
+        self.latency_ewma = None
+        self.channel_util = None
+
+    def is_fresh(self, node_id, kind, now=None):
+        now = time.time() if now is None else now
+        return now - self.last_data.get((node_id, kind), float('-inf')) < self.freshness_s
+
+    def request(self, node_ids, kind, force=False):
+        """Añade nodos a la ronda. Devuelve cuántos se encolaron (los recientes se omiten salvo con force).
+
+        Con force (petición manual) los nodos pasan al principio de la cola en lugar de esperar a la ronda.
+        """
+        now = time.time()
+        added = 0
+        for node_id in node_ids:
+            key = (node_id, kind)
+            if force:
+                if key in self.queued: self.queue.remove(key)
+                # Detrás de las otras peticiones manuales pendientes, delante de la ronda
+                position = next((i for i, queued_key in enumerate(self.queue) if queued_key not in self.forced), len(self.queue))
+                self.queue.insert(position, key)
+                self.forced.add(key)
+            elif key in self.queued or self.is_fresh(node_id, kind, now):
+                continue
+            else:
+                self.queue.append(key)
+            self.queued.add(key)
+            added += 1
+        if added:
+            # La ronda completa se reparte en la ventana configurada
+            self.base_spacing_s = max(self.min_spacing_s, self.window_s / len(self.queue))
+        return added
+
+    def spacing(self):
+        spacing = self.base_spacing_s
+        # No pedir más rápido de lo que tardan en llegar las respuestas
+        if self.latency_ewma is not None:
+            spacing = max(spacing, self.latency_ewma)
+        # Con el canal más ocupado de lo deseado, se estira proporcionalmente
+        if self.channel_util is not None and self.channel_util > self.target_channel_util:
+            spacing *= self.channel_util / self.target_channel_util
+        return spacing
+
+    def tick(self, now=None):
+        """Llamar periódicamente: envía la siguiente solicitud si ya toca."""
+        now = time.time() if now is None else now
+        for key, sent_at in list(self.in_flight.items()):
+            if now - sent_at > self.reply_timeout_s:
+                del self.in_flight[key]
+        # Una petición manual solo respeta la separación mínima, no la de la ronda
+        while self.queue and (now >= self.next_release or (self.queue[0] in self.forced and now >= self.last_release + self.min_spacing_s)):
+            node_id, kind = key = self.queue.popleft()
+            self.queued.discard(key)
+            forced = key in self.forced
+            self.forced.discard(key)
+            # Puede haber llegado un dato mientras esperaba en la cola
+            if not forced and self.is_fresh(node_id, kind, now): continue
+            if self.send_request(node_id, kind):
+                self.in_flight[key] = now
+            self.last_release = now
+            self.next_release = now + self.spacing()
+            return key
+        return None
+
+    def on_data(self, node_id, kind, now=None):
+        """Registra un dato recibido; si respondía a una solicitud, actualiza la latencia media."""
+        now = time.time() if now is None else now
+        self.last_data[(node_id, kind)] = now
+        sent_at = self.in_flight.pop((node_id, kind), None)
+        if sent_at is not None:
+            latency = now - sent_at
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def on_channel_utilization(self, percent):
+        self.channel_util = percent
+
+    def pending(self):
+        return len(self.queue)
@@ -0,0 +1,71 @@
+# =============================================================================
+# ### ARCHIVO: rule_throttle.py ###
+# =============================================================================
+# Limita los disparos de las reglas del bot para no saturar el canal LoRa.
+# Por cada (regla, nodo) la regla se dispara una vez al cumplirse y queda
+# desarmada hasta que la condición se despeje con margen de histéresis; además
+# hay un enfriamiento mínimo por regla y un máximo global de acciones por minuto.
+import collections
+import time
+
+def condition_cleared(operator, current_value, value, hysteresis):
+    """Indica si una condición dejó de cumplirse con el margen de histéresis."""
+    if operator == '>': return current_value <= value - hysteresis
+    if operator == '<': return current_value >= value + hysteresis
+    if operator == '==': return current_value != value
+    if operator == '!=': return current_value == value
+    return True
+
+class RuleThrottle:
+    def __init__(self, default_cooldown_s, max_actions_per_minute):
+        self.default_cooldown_s = default_cooldown_s
+        self.max_actions_per_minute = max_actions_per_minute
+        self.disarmed = set()       # (rule_id, node_id) disparadas que esperan a despejarse
+        self.last_fired = {}        # (rule_id, node_id) -> epoch del último disparo
+        self.action_times = collections.deque()
+        self.stats = collections.defaultdict(lambda: {'fired': 0, 'hysteresis': 0, 'cooldown': 0, 'rate': 0})
+
+    def clear(self, rule_id, node_id):
+        """La condición se despejó: la regla vuelve a armarse para ese nodo."""
+        self.disarmed.discard((rule_id, node_id))
+
+    def should_fire(self, rule_id, node_id, cooldown_s=None, now=None):
+        """Decide si una regla cumplida ejecuta su acción. Devuelve (bool, motivo de supresión o None)."""
+        now = time.time() if now is None else now
+        key = (rule_id, node_id)
+        stats = self.stats[rule_id]
+        if key in self.disarmed:
+            stats['hysteresis'] += 1
+            return False, 'hysteresis'
+
+        cooldown_s = self.default_cooldown_s if cooldown_s is None else cooldown_s
+        if now - self.last_fired.get(key, float('-inf')) < cooldown_s:
+            stats['cooldown'] += 1
+            return False, 'cooldown'
+
+        while self.action_times and now - self.action_times[0] >= 60:
+            self.action_times.popleft()
+        if len(self.action_times) >= self.max_actions_per_minute:
+            stats['rate'] += 1
+            return False, 'rate'
+
+        self.action_times.append(now)
+        self.last_fired[key] = now
+        self.disarmed.add(key)
+        stats['fired'] += 1
+        return True, None
+
+    def get_stats(self, rule_id):
+        stats = self.stats.get(rule_id)
+        return dict(stats) if stats else {'fired': 0, 'hysteresis': 0, 'cooldown': 0, 'rate': 0}
+
+    def export_state(self):
+        return {
+            'disarmed': [list(key) for key in self.disarmed],
+            'last_fired': [[rule_id, node_id, fired_at] for (rule_id, node_id), fired_at in self.last_fired.items()],
+        }
+
+    def import_state(self, state):
+        self.disarmed.update((rule_id, node_id) for rule_id, node_id in state.get('disarmed', []))
+        for rule_id, node_id, fired_at in state.get('last_fired', []):
+            self.last_fired[(rule_id, node_id)] = fired_at
@@ -0,0 +1,83 @@
+# =============================================================================
+# ### ARCHIVO: serial_log.py ###
+# =============================================================================
+# Registro persistente del monitor serial. Cada mensaje se guarda como una
+# línea JSON para poder releer hacia atrás lo que ya no cabe en el widget.
+# Al superar max_bytes el archivo se rota a "<archivo>.1" (una sola copia).
+import json
+import os
+
+READ_BLOCK_SIZE = 64 * 1024
+
+class SerialLogStore:
+    def __init__(self, file_path, max_bytes):
+        self.file_path = file_path
+        self.backup_path = f"{file_path}.1"
+        self.max_bytes = max_bytes
+        self.generation = 0     # Se incrementa en cada rotación
+        self.file = open(file_path, "ab")
+
+    def append(self, entries):
+        """Escribe un lote de entradas (timestamp, nivel, texto). Devuelve la posición (generación, offset) de cada una."""
+        positions = []
+        for timestamp, level, text in entries:
+            offset = self.file.tell()
+            if offset >= self.max_bytes:
+                self._rotate()
+                offset = 0
+            line = json.dumps([timestamp, level, text], ensure_ascii=False).encode("utf-8") + b"\n"
+            self.file.write(line)
+            positions.append((self.generation, offset))
+        self.file.flush()
+        return positions
+
+    def _rotate(self):
+        self.file.close()
+        os.replace(self.file_path, self.backup_path)
+        self.file = open(self.file_path, "ab")
+        self.generation += 1
+
+    def read_before(self, position, count):
+        """Lee hasta count entradas anteriores a position. Devuelve [((generación, offset), (timestamp, nivel, texto))]."""
+        generation, offset = position
+        if generation == self.generation:
+            entries = self._read_file_before(self.file_path, generation, offset, count)
+            if len(entries) < count and os.path.exists(self.backup_path):
+                size = os.path.getsize(self.backup_path)
+                entries = self._read_file_before(self.backup_path, generation - 1, size, count - len(entries)) + entries
+            return entries
+        if generation == self.generation - 1 and os.path.exists(self.backup_path):
+            return self._read_file_before(self.backup_path, generation, offset, count)
+        return []
+
+    def _read_file_before(self, path, generation, offset, count):
+        if count <= 0 or offset <= 0: return []
+        with open(path, "rb") as f:
+            pos, data = offset, b""
+            while pos > 0 and data.count(b"\n") <= count:
+                step = min(READ_BLOCK_SIZE, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+
+        start = pos
+        if pos > 0:
+            # Se descarta la primera línea, que puede estar incompleta
+            cut = data.index(b"\n") + 1
+            data, start = data[cut:], pos + cut
+
+        entries, line_offset = [], start
+        for raw in data.split(b"\n")[:-1]:
+            entries.append((line_offset, raw))
+            line_offset += len(raw) + 1
+
+        result = []
+        for line_offset, raw in entries[-count:]:
+            try:
+                result.append(((generation, line_offset), tuple(json.loads(raw))))
+            except ValueError:
+                continue
+        return result
+
+    def close(self):
+        self.file.close()
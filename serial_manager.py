@@ -6,9 +6,12 @@ import serial.tools.list_ports
 import threading
 import time
 import json
-import meshtastic
-import meshtastic.serial_interface
-from pubsub import pub
+import config
+from tx_queue import TxScheduler, PRIORITY_CONTROL, PRIORITY_USER, PRIORITY_BOT, PRIORITY_POLL, KIND_POSITION_REQUEST
+from metrics import PACKETS_RECEIVED, PACKETS_DROPPED
+from packet_record import normalize_packet
+# meshtastic (y pubsub) se importan al conectar: su carga es lenta y no se
+# necesitan para listar puertos.
 
 class SerialManager:
     def __init__(self, gui_queue, log_queue):
@@ -20,6 +23,9 @@ class SerialManager:
         self.thread = None
         self.is_meshtastic_device = False
         self.callbacks_registered = False
+        # Todo lo que se transmite pasa por esta cola (prioridades, duty cycle y ACKs)
+        self.tx = TxScheduler(self._transmit, log_queue, config.LORA_DUTY_CYCLE, config.LORA_BITRATE_BPS,
+                              config.TX_ACK_TIMEOUT_S, config.TX_MAX_RETRIES)
 
     def get_available_ports(self):
         ports = serial.tools.list_ports.comports()
@@ -27,6 +33,9 @@ class SerialManager:
 
     def connect(self, port):
         self.log_queue.put(('INFO', f"Iniciando proceso de conexión en el puerto {port}..."))
+        import meshtastic
+        import meshtastic.serial_interface
+        from pubsub import pub
         try:
             # Primero, intenta conectar como un dispositivo Meshtastic
             self.log_queue.put(('INFO', "Intentando conectar con la librería Meshtastic..."))
@@ -108,9 +117,19 @@ class SerialManager:
     def on_receive(self, packet, interface):
         """Callback para cuando se recibe un paquete de Meshtastic."""
         self.log_queue.put(('RECV', f"Recibido paquete de {packet.get('fromId', 'N/A')}"))
+        decoded = packet.get('decoded', {})
+        PACKETS_RECEIVED.inc(node=packet.get('fromId', 'N/A'), portnum=decoded.get('portnum', 'N/A'))
+        if decoded.get('portnum') == 'ROUTING_APP' and decoded.get('requestId'):
+            # ACK/NAK de un paquete propio enviado con want_ack
+            error = decoded.get('routing', {}).get('errorReason', 'NONE')
+            self.tx.on_ack(decoded['requestId'], error == 'NONE')
         try:
-            # Enviar el paquete completo a la GUI para ser procesado
-            self.gui_queue.put(packet)
+            # A la GUI solo llega el registro normalizado; el diccionario anidado se descarta aquí
+            record = normalize_packet(packet)
+            if record is None:
+                PACKETS_DROPPED.inc(reason="sin_origen")
+                return
+            self.gui_queue.put(record)
         except Exception as e:
             self.log_queue.put(('ERROR', f"Error al procesar paquete en on_receive: {e}"))
 
@@ -118,43 +137,67 @@ class SerialManager:
         """Callback para cambios en el estado de la conexión."""
         self.log_queue.put(('INFO', f"Estado de conexión Meshtastic: {status}"))
     
+    def is_connected(self):
+        return bool((self.is_meshtastic_device and self.interface) or (self.serial_port and self.serial_port.is_open))
+
+    def _transmit(self, message):
+        """Envía un mensaje de la cola. Se ejecuta en el hilo de transmisión; devuelve el id del paquete."""
+        destination = message.destination_id or '^all'
+        if message.kind == KIND_POSITION_REQUEST:
+            if not (self.is_meshtastic_device and self.interface):
+                raise ConnectionError("Solo un dispositivo Meshtastic puede solicitar posiciones.")
+            packet = self.interface.sendPosition(destinationId=destination, wantResponse=True, channelIndex=message.channel_index)
+            self.log_queue.put(('SENT', f"Solicitud de posición a {destination}"))
+            return getattr(packet, 'id', None)
+        if self.is_meshtastic_device and self.interface:
+            packet = self.interface.sendText(message.text, destinationId=destination, wantAck=message.want_ack, channelIndex=message.channel_index)
+            self.log_queue.put(('SENT', f"Enviando '{message.text}' a {destination} (canal {message.channel_index})"))
+            return getattr(packet, 'id', None)
+        if self.serial_port and self.serial_port.is_open:
+            # El puerto genérico no confirma la recepción
+            self.serial_port.write(message.text.encode('utf-8'))
+            self.log_queue.put(('SENT', f"Enviando '{message.text}' a {self.serial_port.port}"))
+            return None
+        raise ConnectionError("No hay conexión para enviar el mensaje.")
+
+    def send_text_message(self, text, destination_id=None, channel_index=0, want_ack=False, priority=PRIORITY_USER, on_result=None, delay_s=0):
+        """Encola un mensaje de texto. Devuelve el mensaje encolado (con su id) o None si no hay conexión."""
+        if not self.is_connected():
+            self.log_queue.put(('ERROR', "No hay conexión para enviar el mensaje."))
+            return None
+        return self.tx.enqueue(text, destination_id, channel_index, want_ack, priority, on_result, delay_s)
+
     def send_command(self, command):
         """Envía un comando al dispositivo."""
-        if self.is_meshtastic_device and self.interface:
-            try:
-                self.interface.sendText(command)
-                self.log_queue.put(('SENT', f"Enviando '{command}' a ^all"))
-            except Exception as e:
-                 self.log_queue.put(('ERROR', f"Error al enviar por Meshtastic: {e}"))
-        elif self.serial_port and self.serial_port.is_open:
-            try:
-                self.serial_port.write(command.encode('utf-8'))
-                self.log_queue.put(('SENT', f"Enviando '{command}' a {self.serial_port.port}"))
-            except Exception as e:
-                 self.log_queue.put(('ERROR', f"Error al enviar por serial: {e}"))
-        else:
-            self.log_queue.put(('ERROR', "No hay conexión para enviar el comando."))
+        return self.send_text_message(command, priority=PRIORITY_CONTROL)
 
     def send_message_to_channel_by_name(self, channel_name, message):
         if not self.is_meshtastic_device or not self.interface:
             self.log_queue.put(("ERROR", "No se puede enviar mensaje, no es un dispositivo Meshtastic válido."))
             return
         
-        try:
-            channel_index = -1
-            for ch in self.interface.channels:
-                if ch.settings.name == channel_name:
-                    channel_index = ch.index
-                    break
-
-            if channel_index != -1:
-                self.interface.sendText(message, channelIndex=channel_index)
-                self.log_queue.put(("SENT", f"Alerta enviada al canal '{channel_name}': {message}"))
-            else:
-                self.log_queue.put(("ERROR", f"No se encontró el canal '{channel_name}' para enviar el mensaje."))
+        channel_index = -1
+        for ch in self.interface.channels:
+            if ch.settings.name == channel_name:
+                channel_index = ch.index
+                break
 
-        except Exception as e:
-            self.log_queue.put(("ERROR", f"Error enviando mensaje al canal: {e}"))
+        if channel_index != -1:
+            self.tx.enqueue(message, channel_index=channel_index, priority=PRIORITY_BOT)
+            self.log_queue.put(("INFO", f"Alerta para el canal '{channel_name}' en cola: {message}"))
+        else:
+            self.log_queue.put(("ERROR", f"No se encontró el canal '{channel_name}' para enviar el mensaje."))
+
+    def request_position(self, node_id):
+        if not self.is_connected(): return None
+        return self.tx.enqueue("", node_id, priority=PRIORITY_POLL, kind=KIND_POSITION_REQUEST)
+
+    def request_telemetry(self, node_id):
+        return self.send_text_message("!request_telemetry", destination_id=node_id, priority=PRIORITY_POLL)
+
+    def is_node_known(self, node_id):
+        if not self.is_meshtastic_device or not self.interface: return False
+        return node_id in (self.interface.nodes or {})
     
     def stop(self):
         """Detiene el hilo de lectura y cierra el puerto serial."""
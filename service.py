@@ -0,0 +1,292 @@
+# =============================================================================
+# ### ARCHIVO: service.py ###
+# =============================================================================
+# Modo servicio sin interfaz gráfica para gateways desatendidos (p. ej. una
+# Raspberry Pi). Recibe paquetes, evalúa las reglas del bot, detecta nodos
+# desconectados y guarda todo en la BD, sin importar tkinter, matplotlib ni PIL.
+#
+# Uso: python service.py --port /dev/ttyUSB0 --db /var/lib/ecolora/ecolora_data.db
+#
+# Con --ring hace además de proceso de ingesta para la GUI (ver ingest_client.py):
+# publica cada lectura en un búfer compartido y atiende los envíos y los
+# comandos programados que la GUI deja en --commands.
+import argparse
+import os
+import queue
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import config
+from database_manager import DatabaseManager
+from data_processor import DataProcessor
+from serial_manager import SerialManager
+from alert_manager import AlertManager, ALERT_NODE_OFFLINE
+from heartbeat_monitor import HeartbeatMonitor
+from command_scheduler import CommandScheduler
+from state_snapshot import StateSnapshot
+from timeseries_store import TimeSeriesStore
+from api_server import ApiServer
+from metrics import REGISTRY, PACKETS_PROCESSED, PACKETS_DROPPED, PACKET_PROCESSING_SECONDS
+from latency_tracer import LatencyTracer, STAGE_PERSIST
+from packet_record import PacketRecord, parse_binary_sensor
+from shared_ring import (RingReader, RingWriter, KIND_READING, KIND_NODE, KIND_POSITION, KIND_MESSAGE, KIND_BINARY, KIND_ALERT,
+                         KIND_SEND_TEXT, KIND_REQUEST_POSITION, KIND_REQUEST_TELEMETRY, KIND_SCHEDULE, KIND_CANCEL_SCHEDULE,
+                         READING_FIELDS)
+
+LOG_LEVEL_ORDER = {"DEBUG": 0, "INFO": 1, "WARNING": 2, "ERROR": 3}
+
+class HeadlessService:
+    def __init__(self, port, db_name, log_level="INFO", ring_path=None, command_ring_path=None):
+        self.port = port
+        self.ring_path = ring_path
+        self.command_ring_path = command_ring_path
+        self.ring = None
+        self.command_ring = None
+        self.log_level = LOG_LEVEL_ORDER.get(log_level, 1)
+        self.stop_event = threading.Event()
+        self.packet_queue = queue.Queue()
+        self.log_queue = queue.Queue()
+
+        self.db_manager = DatabaseManager(db_name)
+        self.state_snapshot = StateSnapshot(config.SNAPSHOT_FILE, config.SNAPSHOT_MAX_AGE_HOURS)
+        self.state_snapshot.load()
+        # Las alertas nuevas (desconexión, descarga de batería) también se publican para la GUI
+        self.alert_manager = AlertManager(self.db_manager, on_raise=self.publish_alert)
+        self.data_processor = DataProcessor(self.db_manager, self.log_queue, self.alert_manager)
+        self.data_processor.import_state(self.state_snapshot.section('data_processor'))
+        self.serial_manager = SerialManager(self.packet_queue, self.log_queue)
+        self.command_scheduler = CommandScheduler(self.db_manager, self.dispatch_scheduled_command, self.log_queue,
+                                                  config.COMMAND_SCHEDULER_TICK_S, config.COMMAND_SCHEDULER_WHEEL_SIZE, config.COMMAND_RETRY_S)
+        node_timeouts = {node_id: minutes * 60 for node_id, minutes in config.NODE_HEARTBEAT_TIMEOUTS.items()}
+        self.heartbeat_monitor = HeartbeatMonitor(config.HEARTBEAT_TIMEOUT_MINUTES * 60, node_timeouts)
+        for node_id, _, last_seen, *_ in self.db_manager.get_nodes():
+            if last_seen:
+                self.heartbeat_monitor.touch(node_id, datetime.fromisoformat(last_seen).timestamp())
+        self.timeseries_store = TimeSeriesStore(config.GRAPH_MAX_POINTS, config.TIMESERIES_MAX_NODES, loader=self.db_manager.get_recent_series)
+        self.timeseries_store.import_state(self.state_snapshot.section('timeseries'))
+        self.api_server = None
+        self.latency_tracer = LatencyTracer(config.READING_VISIBLE_SLA_S)    # Sin interfaz solo se miden cola y guardado
+        REGISTRY.gauge("ecolora_queue_depth", "Elementos en espera en cada cola interna",
+                       lambda: {(("queue", "paquetes"),): self.packet_queue.qsize(), (("queue", "transmision"),): self.serial_manager.tx.depth()})
+        self.local_node_id = None
+
+    def log(self, level, message):
+        if LOG_LEVEL_ORDER.get(level, 1) < self.log_level: return
+        print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} [{level}] {message}", flush=True)
+
+    def request_stop(self, signum=None, frame=None):
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        if not self.serial_manager.connect(self.port):
+            self.drain_logs()
+            return 1
+        if self.serial_manager.interface:
+            self.local_node_id = self.serial_manager.interface.getMyNodeInfo().get('user', {}).get('id')
+        self.command_scheduler.start()
+        # El búfer de envíos se abre antes del primer latido: la GUI solo escribe en él
+        # cuando ve el latido, así que no se pierde ningún envío
+        if self.command_ring_path: self.open_command_ring()
+        if self.ring_path:
+            self.ring = RingWriter(self.ring_path, config.INGEST_RING_CAPACITY)
+            self.log("INFO", f"Publicando lecturas en {self.ring_path}")
+        if config.API_ENABLED:
+            try:
+                self.api_server = ApiServer(self.db_manager, self.timeseries_store, config.API_HOST, config.API_PORT, self.log_queue, config.API_STREAM_QUEUE_SIZE)
+                self.api_server.start()
+            except OSError as e:
+                self.log("ERROR", f"No se pudo iniciar la API local en el puerto {config.API_PORT}: {e}")
+        next_snapshot = time.time() + config.SNAPSHOT_INTERVAL_MS / 1000
+
+        # Con envíos de la GUI pendientes de atender, el bucle gira más rápido
+        wait_s = 0.1 if self.command_ring_path else 0.5
+        while not self.stop_event.is_set():
+            try:
+                packet = self.packet_queue.get(timeout=wait_s)
+                portnum = (packet.portnum or 'N/A') if isinstance(packet, PacketRecord) else 'N/A'
+                with PACKET_PROCESSING_SECONDS.time(portnum=portnum):
+                    self.process_packet(packet)
+                PACKETS_PROCESSED.inc()
+            except queue.Empty:
+                pass
+            except sqlite3.Error as e:
+                # Un error de la BD (p. ej. bloqueada por otro proceso) cuesta el paquete, no el servicio
+                self.log("ERROR", f"Error de base de datos al procesar un paquete: {e}")
+                PACKETS_DROPPED.inc(reason="error_bd")
+            if self.ring: self.ring.heartbeat()
+            if self.command_ring_path: self.process_gui_commands()
+            self.check_node_heartbeats()
+            if time.time() >= next_snapshot:
+                self.save_state_snapshot()
+                next_snapshot = time.time() + config.SNAPSHOT_INTERVAL_MS / 1000
+            self.drain_logs()
+
+        self.shutdown()
+        return 0
+
+    def shutdown(self):
+        self.log("INFO", "Deteniendo el servicio...")
+        self.command_scheduler.stop()
+        if self.api_server: self.api_server.stop()
+        self.serial_manager.stop()
+        if self.ring: self.ring.close()
+        if self.command_ring: self.command_ring.close()
+        self.save_state_snapshot()
+        self.drain_logs()
+        self.db_manager.close()
+
+    def save_state_snapshot(self):
+        self.state_snapshot.save({'data_processor': self.data_processor.export_state(),
+                                  'timeseries': self.timeseries_store.export_state()})
+
+    def drain_logs(self):
+        try:
+            while True:
+                message = self.log_queue.get_nowait()
+                if isinstance(message, tuple) and len(message) == 2: self.log(str(message[0]), message[1])
+                else: self.log("INFO", message)
+        except queue.Empty:
+            pass
+
+    def publish(self, kind, node_id, values=(), text="", peer_id=None):
+        if self.ring: self.ring.write(kind, node_id=node_id, peer_id=peer_id, values=values, text=text)
+
+    def publish_alert(self, node_id, alert_type, message, severity):
+        self.publish(KIND_ALERT, node_id, text=message, peer_id=alert_type)
+
+    def open_command_ring(self):
+        try:
+            self.command_ring = RingReader(self.command_ring_path)
+        except (OSError, ValueError):
+            return False
+        # Se reanuda tras el último envío atendido, también los escritos mientras el proceso se reiniciaba
+        try:
+            with open(self.command_ring_path + ".pos") as f:
+                last_done = int(f.read())
+        except (OSError, ValueError):
+            return True
+        # Una posición más allá del último registro indica que el búfer se creó de nuevo
+        self.command_ring.next_seq = last_done + 1 if last_done <= self.command_ring.write_seq() else 1
+        return True
+
+    def save_command_position(self):
+        path = self.command_ring_path + ".pos"
+        with open(path + ".tmp", "w") as f:
+            f.write(str(self.command_ring.next_seq - 1))
+        os.replace(path + ".tmp", path)
+
+    def process_gui_commands(self):
+        # La GUI crea el búfer de envíos; puede aparecer después de arrancar
+        if self.command_ring is None and not self.open_command_ring(): return
+        records = self.command_ring.read()
+        for record in records:
+            if record.kind == KIND_SEND_TEXT:
+                channel_index, want_ack, priority, delay_s = record.values[:4]
+                self.serial_manager.send_text_message(record.text, destination_id=record.node_id, channel_index=int(channel_index or 0),
+                                                      want_ack=bool(want_ack), priority=int(priority or 0), delay_s=delay_s or 0)
+            elif record.kind == KIND_REQUEST_POSITION:
+                self.serial_manager.request_position(record.node_id)
+            elif record.kind == KIND_REQUEST_TELEMETRY:
+                self.serial_manager.request_telemetry(record.node_id)
+            elif record.kind == KIND_SCHEDULE:
+                delay_s, interval_s, channel_index, priority, want_ack = record.values[:5]
+                # El retraso cuenta desde que la GUI lo pidió, no desde que se lee aquí
+                delay_s = max(0.0, record.timestamp + (delay_s or 0) - time.time())
+                job_id = self.command_scheduler.schedule(record.text, node_id=record.node_id, delay_s=delay_s, interval_s=interval_s,
+                                                         channel_index=int(channel_index or 0), priority=int(priority or 0),
+                                                         want_ack=bool(want_ack), label=record.peer_id)
+                self.log("INFO", f"Comando '{record.text}' programado por la GUI (#{job_id}).")
+            elif record.kind == KIND_CANCEL_SCHEDULE:
+                if record.values[0] is not None: self.command_scheduler.cancel(int(record.values[0]))
+        if records: self.save_command_position()
+
+    def dispatch_scheduled_command(self, job, on_result):
+        return self.serial_manager.send_text_message(job.command, destination_id=job.node_id, channel_index=job.channel_index,
+                                                     want_ack=job.want_ack, priority=job.priority,
+                                                     on_result=lambda message, success: on_result(success)) is not None
+
+    def process_packet(self, packet):
+        # SerialManager también publica estados de conexión y líneas del puerto genérico
+        if not isinstance(packet, PacketRecord):
+            if isinstance(packet, tuple) and packet and packet[0] == 'serial_disconnected':
+                self.log("ERROR", "Dispositivo desconectado.")
+                self.stop_event.set()
+            return
+
+        record = packet
+        node_id = record.node_id
+        self.latency_tracer.begin(node_id, record.received_at)
+        self.db_manager.record_packet(record, self.local_node_id)
+        self.publish(KIND_NODE, node_id, (record.battery, record.snr, record.rssi, record.hops))
+        self.heartbeat_monitor.touch(node_id)
+        if self.alert_manager.resolve(node_id, ALERT_NODE_OFFLINE):
+            self.log("INFO", f"Nodo {node_id[-4:]} reconectado.")
+
+        portnum = record.portnum
+        if portnum == 'TELEMETRY_APP':
+            data = record.reading()
+            data['alias'] = self.db_manager.get_node_alias(node_id)
+            self.data_processor.evaluate_rules(data, self.serial_manager)
+            if len(data) > 2:
+                smoothed_data = self.data_processor.smooth_data(data)
+                if smoothed_data:
+                    self.db_manager.insert_reading(smoothed_data)
+                    self.latency_tracer.mark(node_id, STAGE_PERSIST)
+                    self.timeseries_store.append(node_id, smoothed_data)
+                    if self.api_server: self.api_server.publish(node_id, smoothed_data)
+                    self.publish(KIND_READING, node_id, [smoothed_data.get(field) for field in READING_FIELDS])
+        elif portnum == 'POSITION_APP':
+            if record.latitude is not None and record.longitude is not None:
+                self.db_manager.update_node_position(node_id, record.latitude, record.longitude)
+                self.publish(KIND_POSITION, node_id, (record.latitude, record.longitude))
+        elif portnum == 'TEXT_MESSAGE_APP':
+            self.db_manager.save_message(node_id, record.to_id, record.channel, record.text, record.is_direct)
+            self.publish(KIND_MESSAGE, node_id, (record.channel, 1 if record.is_direct else 0), record.text, peer_id=record.to_id)
+        elif portnum == 'OPAQUE_APP':
+            reading = parse_binary_sensor(record.payload)
+            if reading is None:
+                self.log("WARNING", f"Paquete binario malformado recibido de {node_id}")
+                return
+            sensor, state = reading
+            self.db_manager.insert_binary_reading(node_id, sensor, state)
+            self.publish(KIND_BINARY, node_id, (state if isinstance(state, (int, float)) else None,), str(sensor))
+
+    def check_node_heartbeats(self):
+        for node_id, deadline in self.heartbeat_monitor.pop_expired():
+            if node_id == self.local_node_id: continue
+            timeout_s = self.heartbeat_monitor.get_timeout(node_id)
+            message = f"El nodo no ha reportado datos en más de {timeout_s // 60} minutos."
+            if self.alert_manager.raise_alert(node_id, ALERT_NODE_OFFLINE, message, "CRITICAL") is not None:
+                self.log("WARNING", f"Nodo {node_id[-4:]} desconectado: {message}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio ECOLORA sin interfaz gráfica.")
+    parser.add_argument("--port", help="Puerto serie del nodo Meshtastic (por defecto, el primero disponible)")
+    parser.add_argument("--db", default=config.DB_NAME, help=f"Archivo de la base de datos (por defecto {config.DB_NAME})")
+    parser.add_argument("--log-level", default="INFO", choices=list(LOG_LEVEL_ORDER), help="Nivel mínimo de los mensajes")
+    parser.add_argument("--ring", help="Búfer compartido donde publicar las lecturas para la GUI")
+    parser.add_argument("--commands", help="Búfer compartido del que leer los envíos de la GUI")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    port = args.port
+    if not port:
+        import serial.tools.list_ports
+        ports = [p.device for p in serial.tools.list_ports.comports()]
+        if not ports:
+            print("No se encontró ningún puerto serie. Indique uno con --port.", file=sys.stderr)
+            return 1
+        port = ports[0]
+    return HeadlessService(port, args.db, args.log_level, args.ring, args.commands).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
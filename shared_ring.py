@@ -0,0 +1,167 @@
+# =============================================================================
+# ### ARCHIVO: shared_ring.py ###
+# =============================================================================
+# Búfer circular en un archivo mapeado en memoria (mmap) para pasar registros
+# de tamaño fijo entre procesos sin bloqueos: un único escritor y cualquier
+# número de lectores. El escritor nunca espera a los lectores; un lector que
+# se queda atrás más de una vuelta pierde los registros sobrescritos.
+#
+# Cada ranura lleva su número de secuencia, escrito el último: el lector lo
+# comprueba antes y después de copiar la ranura para descartar lecturas a
+# medio escribir. La cabecera guarda además el PID del escritor y un latido
+# para que los lectores sepan si sigue vivo.
+import math
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"ECORING1"
+HEADER = struct.Struct("<8sIIQqd")              # magic, capacidad, tamaño de ranura, última secuencia, pid, latido
+HEADER_SIZE = 64
+RECORD = struct.Struct("<QBd16s16s7dH233s")      # secuencia, tipo, instante, nodo, nodo par, 7 valores, longitud, texto
+RECORD_SIZE = 384
+SEQ = struct.Struct("<Q")
+WRITE_SEQ_OFFSET = 16
+HEARTBEAT_OFFSET = 32
+VALUE_COUNT = 7
+MAX_TEXT_BYTES = 233    # Carga útil máxima de un paquete Meshtastic (DATA_PAYLOAD_LEN)
+
+# Tipos de registro del proceso de ingesta hacia la GUI
+KIND_READING = 1        # valores: temperature, humidity, pressure, iaq, battery
+KIND_NODE = 2           # paquete recibido de un nodo; valores: battery, snr, rssi, hops
+KIND_POSITION = 3       # valores: latitude, longitude
+KIND_MESSAGE = 4        # texto; peer = destino; valores: channel, is_direct
+KIND_BINARY = 5         # texto = nombre del sensor; valores: state (None si no es numérico)
+KIND_ALERT = 6          # alerta nueva; texto = mensaje; peer = tipo de alerta (alert_manager.ALERT_*)
+# Tipos de registro de la GUI hacia el proceso de ingesta
+KIND_SEND_TEXT = 10     # texto; node = destino; valores: channel_index, want_ack, priority, delay_s
+KIND_REQUEST_POSITION = 11
+KIND_REQUEST_TELEMETRY = 12
+KIND_SCHEDULE = 13      # texto = comando; node = destino; peer = etiqueta; valores: delay_s, interval_s, channel_index, priority, want_ack
+KIND_CANCEL_SCHEDULE = 14   # valores: id del trabajo
+
+READING_FIELDS = ('temperature', 'humidity', 'pressure', 'iaq', 'battery')
+
+class RingRecord:
+    def __init__(self, seq, kind, timestamp, node_id, peer_id, values, text):
+        self.seq = seq
+        self.kind = kind
+        self.timestamp = timestamp      # epoch
+        self.node_id = node_id
+        self.peer_id = peer_id
+        self.values = values            # tupla de 7 valores, None si no se informó
+        self.text = text
+
+    def reading(self):
+        """Valores de un KIND_READING como diccionario de lectura ({'node_id', 'temperature', ...})."""
+        data = {'node_id': self.node_id}
+        for field, value in zip(READING_FIELDS, self.values):
+            if value is not None: data[field] = value
+        return data
+
+
+def _pack_id(node_id):
+    return (node_id or "").encode("ascii", "ignore")[:16]
+
+def _unpack_id(raw):
+    return raw.rstrip(b"\0").decode("ascii", "ignore") or None
+
+
+class _Ring:
+    def _map(self, path):
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.capacity, record_size, _, _, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{path} no es un búfer compartido de ECOLORA compatible")
+
+    def write_seq(self):
+        return SEQ.unpack_from(self.map, WRITE_SEQ_OFFSET)[0]
+
+    def writer_pid(self):
+        return HEADER.unpack_from(self.map, 0)[4]
+
+    def heartbeat_age(self):
+        return time.time() - HEADER.unpack_from(self.map, 0)[5]
+
+    def close(self):
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+class RingWriter(_Ring):
+    def __init__(self, path, capacity):
+        # Se reutiliza el archivo existente si tiene la misma geometría: un lector
+        # que lo tenga mapeado nunca ve el archivo truncado
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+        reuse = False
+        if os.path.exists(path) and os.path.getsize(path) == size:
+            with open(path, "rb") as f:
+                magic, existing_capacity, record_size, *_ = HEADER.unpack(f.read(HEADER.size))
+            reuse = magic == MAGIC and existing_capacity == capacity and record_size == RECORD_SIZE
+        if not reuse:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, capacity, RECORD_SIZE, 0, 0, 0.0).ljust(HEADER_SIZE, b"\0"))
+                f.truncate(size)
+        self._map(path)
+        self.seq = self.write_seq()
+        HEADER.pack_into(self.map, 0, MAGIC, capacity, RECORD_SIZE, self.seq, os.getpid(), time.time())
+
+    def heartbeat(self):
+        struct.pack_into("<d", self.map, HEARTBEAT_OFFSET, time.time())
+
+    def write(self, kind, node_id=None, peer_id=None, values=(), text="", timestamp=None):
+        encoded = (text or "").encode("utf-8")
+        if len(encoded) > MAX_TEXT_BYTES:
+            raise ValueError(f"texto de {len(encoded)} bytes; el máximo es {MAX_TEXT_BYTES}")
+        self.seq += 1
+        offset = HEADER_SIZE + (self.seq % self.capacity) * RECORD_SIZE
+        values = [math.nan if value is None else float(value) for value in values][:VALUE_COUNT]
+        values += [math.nan] * (VALUE_COUNT - len(values))
+        # Secuencia 0 durante la escritura: los lectores descartan la ranura
+        SEQ.pack_into(self.map, offset, 0)
+        RECORD.pack_into(self.map, offset, 0, kind, timestamp or time.time(), _pack_id(node_id), _pack_id(peer_id), *values, len(encoded), encoded)
+        SEQ.pack_into(self.map, offset, self.seq)
+        SEQ.pack_into(self.map, WRITE_SEQ_OFFSET, self.seq)
+        return self.seq
+
+
+class RingReader(_Ring):
+    def __init__(self, path, from_start=False):
+        self._map(path)
+        # Por defecto solo se leen los registros escritos a partir de ahora
+        self.next_seq = 1 if from_start else self.write_seq() + 1
+        self.lost = 0
+
+    def writer_alive(self, timeout_s):
+        return self.heartbeat_age() <= timeout_s
+
+    def read(self, max_records=1000):
+        """Registros nuevos desde la última llamada (como mucho max_records)."""
+        last = self.write_seq()
+        if last < self.next_seq - 1:
+            self.next_seq = last + 1    # El escritor empezó de cero
+        if last - self.next_seq + 1 > self.capacity:
+            # El lector se quedó atrás más de una vuelta
+            skipped = last - self.capacity + 1 - self.next_seq
+            self.lost += skipped
+            self.next_seq += skipped
+        records = []
+        while self.next_seq <= last and len(records) < max_records:
+            offset = HEADER_SIZE + (self.next_seq % self.capacity) * RECORD_SIZE
+            raw = self.map[offset:offset + RECORD.size]
+            seq_after = SEQ.unpack_from(self.map, offset)[0]
+            seq, kind, timestamp, node, peer, *rest = RECORD.unpack(raw)
+            if seq != self.next_seq or seq_after != seq:
+                # Sobrescrita o a medio escribir: se da por perdida
+                self.lost += 1
+            else:
+                values = tuple(None if math.isnan(v) else v for v in rest[:VALUE_COUNT])
+                text_length, text = rest[VALUE_COUNT], rest[VALUE_COUNT + 1]
+                records.append(RingRecord(seq, kind, timestamp, _unpack_id(node), _unpack_id(peer), values, text[:text_length].decode("utf-8", "ignore")))
+            self.next_seq += 1
+        return records
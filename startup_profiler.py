@@ -0,0 +1,106 @@
+# =============================================================================
+# ### ARCHIVO: startup_profiler.py ###
+# =============================================================================
+# Perfilador de arranque: mide el tiempo de importación de cada módulo y el
+# tiempo de cada fase de inicialización de la aplicación.
+#
+# Se activa con la opción "--profile-startup", con la variable de entorno
+# ECOLORA_PROFILE_STARTUP=1 o con config.STARTUP_PROFILE = True. Debe
+# importarse antes que cualquier librería pesada para que las mediciones
+# de importación sean completas.
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import config
+
+_original_import = builtins.__import__
+_enabled = False
+_t0 = time.perf_counter()
+_import_stack = []
+_import_times = {}   # módulo -> (tiempo acumulado, tiempo propio)
+_phase_times = []    # [(fase, segundos)]
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_if_requested():
+    """Activa el perfilador si se solicitó por argumento, entorno o config."""
+    requested = (
+        "--profile-startup" in sys.argv
+        or os.environ.get("ECOLORA_PROFILE_STARTUP") == "1"
+        or getattr(config, "STARTUP_PROFILE", False)
+    )
+    if requested:
+        enable()
+    return requested
+
+
+def enable():
+    global _enabled, _t0
+    if _enabled: return
+    _enabled = True
+    _t0 = time.perf_counter()
+    builtins.__import__ = _timed_import
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Solo se miden las importaciones absolutas de módulos aún no cargados
+    if level != 0 or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    _import_stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = _import_stack.pop()
+        if _import_stack:
+            _import_stack[-1] += elapsed
+        if name not in _import_times:
+            _import_times[name] = (elapsed, elapsed - children)
+
+
+@contextmanager
+def phase(name):
+    """Mide el tiempo de una fase de inicialización."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phase_times.append((name, time.perf_counter() - start))
+
+
+def finish():
+    """Detiene la medición, escribe el informe y lo devuelve como texto."""
+    global _enabled
+    if not _enabled: return None
+    builtins.__import__ = _original_import
+    _enabled = False
+
+    total = time.perf_counter() - _t0
+    lines = [f"=== Perfil de arranque ECOLORA ({total * 1000:.0f} ms en total) ===", "", "--- Fases de inicialización ---"]
+    for name, seconds in _phase_times:
+        lines.append(f"{seconds * 1000:9.1f} ms  {name}")
+
+    lines += ["", "--- Importaciones (acumulado / propio) ---"]
+    ranked = sorted(_import_times.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (cumulative, own) in ranked[:config.STARTUP_PROFILE_TOP_IMPORTS]:
+        lines.append(f"{cumulative * 1000:9.1f} ms  {own * 1000:9.1f} ms  {name}")
+
+    report = "\n".join(lines)
+    try:
+        with open(config.STARTUP_PROFILE_FILE, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    except OSError as e:
+        print(f"No se pudo guardar el perfil de arranque: {e}")
+    print(report)
+    return report
@@ -0,0 +1,56 @@
+# =============================================================================
+# ### ARCHIVO: state_snapshot.py ###
+# =============================================================================
+# Instantánea del estado en memoria (ventanas de suavizado, control de
+# descarga de batería, buffers de las gráficas) para que un reinicio no deje
+# huecos en los análisis. Se guarda como JSON comprimido con gzip.
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+SNAPSHOT_VERSION = 1
+
+class StateSnapshot:
+    def __init__(self, file_path, max_age_hours=24):
+        self.file_path = file_path
+        self.max_age = timedelta(hours=max_age_hours)
+        self.sections = {}
+
+    def load(self):
+        """Lee la instantánea del disco. Devuelve True si se pudo restaurar."""
+        self.sections = {}
+        if not os.path.exists(self.file_path):
+            return False
+        try:
+            with gzip.open(self.file_path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != SNAPSHOT_VERSION:
+                return False
+            saved_at = datetime.fromisoformat(payload["saved_at"])
+            if datetime.now() - saved_at > self.max_age:
+                print("Instantánea de estado demasiado antigua, se ignora.")
+                return False
+            self.sections = payload.get("sections", {})
+            return True
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            print(f"No se pudo leer la instantánea de estado: {e}")
+            return False
+
+    def section(self, name):
+        return self.sections.get(name, {})
+
+    def save(self, sections):
+        """Escribe la instantánea de forma atómica (archivo temporal + reemplazo)."""
+        self.sections = sections
+        payload = {"version": SNAPSHOT_VERSION, "saved_at": datetime.now().isoformat(), "sections": sections}
+        tmp_path = f"{self.file_path}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self.file_path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            print(f"No se pudo guardar la instantánea de estado: {e}")
+            return False
+
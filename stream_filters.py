@@ -0,0 +1,175 @@
+# =============================================================================
+# ### ARCHIVO: stream_filters.py ###
+# =============================================================================
+# Filtros de suavizado en flujo para las lecturas de los nodos. Cada filtro
+# recibe un valor por lectura y devuelve el valor filtrado con coste constante
+# (la ventana es fija y pequeña): media móvil con suma acumulada, media móvil
+# exponencial (EWMA), mediana de N y el filtro de Hampel, que sustituye por la
+# mediana los valores atípicos respecto a la desviación absoluta mediana.
+#
+# Un filtro se describe con una tupla (tipo, parámetros...):
+#   ("sma", 5)          media de las últimas 5 lecturas
+#   ("ewma", 0.3)       y = 0.3 * x + 0.7 * y_anterior
+#   ("median", 5)       mediana de las últimas 5 lecturas
+#   ("hampel", 7, 3.0)  valores a más de 3 desviaciones (MAD) de la mediana de 7 se sustituyen por ella
+#
+# filter_batch() aplica el mismo filtro a una serie completa con NumPy (datos
+# importados o recuperados), con el mismo resultado que lectura a lectura.
+import bisect
+import collections
+import math
+
+DEFAULT_SPEC = ("sma", 5)
+MAD_SCALE = 1.4826      # MAD -> desviación típica para datos normales
+
+class SmaFilter:
+    def __init__(self, window):
+        self.window = int(window)
+        self.values = collections.deque(maxlen=self.window)
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self.updates += 1
+        if self.updates % self.window == 0:
+            # Se recalcula la suma una vez por vuelta para que no acumule error de redondeo
+            self.total = math.fsum(self.values)
+        return self.total / len(self.values)
+
+    def state(self):
+        return list(self.values)
+
+    def load(self, values):
+        self.values = collections.deque(values, maxlen=self.window)
+        self.total = math.fsum(self.values)
+
+
+class EwmaFilter:
+    def __init__(self, alpha):
+        self.alpha = float(alpha)
+        if not 0 < self.alpha <= 1: raise ValueError(f"alpha debe estar en (0, 1]: {alpha}")
+        self.value = None
+
+    def update(self, value):
+        self.value = value if self.value is None else self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+    def state(self):
+        return [] if self.value is None else [self.value]
+
+    def load(self, values):
+        # Una ventana guardada por otro filtro se reanuda desde su último valor
+        self.value = values[-1] if values else None
+
+
+class MedianFilter:
+    def __init__(self, window):
+        self.window = int(window)
+        self.values = collections.deque()     # Orden de llegada
+        self.sorted = []                      # Los mismos valores ordenados
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            del self.sorted[bisect.bisect_left(self.sorted, self.values.popleft())]
+        self.values.append(value)
+        bisect.insort(self.sorted, value)
+
+    def median(self):
+        n = len(self.sorted)
+        middle = n // 2
+        return self.sorted[middle] if n % 2 else (self.sorted[middle - 1] + self.sorted[middle]) / 2
+
+    def update(self, value):
+        self.push(value)
+        return self.median()
+
+    def state(self):
+        return list(self.values)
+
+    def load(self, values):
+        self.values.clear()
+        self.sorted = []
+        for value in list(values)[-self.window:]:
+            self.push(value)
+
+
+class HampelFilter(MedianFilter):
+    def __init__(self, window, n_sigmas=3.0):
+        super().__init__(window)
+        self.n_sigmas = float(n_sigmas)
+
+    def update(self, value):
+        # La ventana guarda los valores originales: un atípico sustituido no desplaza la mediana
+        self.push(value)
+        median = self.median()
+        deviations = sorted(abs(v - median) for v in self.sorted)
+        n = len(deviations)
+        mad = deviations[n // 2] if n % 2 else (deviations[n // 2 - 1] + deviations[n // 2]) / 2
+        return median if abs(value - median) > self.n_sigmas * MAD_SCALE * mad else value
+
+
+FILTERS = {"sma": SmaFilter, "ewma": EwmaFilter, "median": MedianFilter, "hampel": HampelFilter}
+
+def create_filter(spec):
+    """Crea un filtro a partir de su tupla de configuración. ValueError si no es válida."""
+    if not spec or spec[0] not in FILTERS:
+        raise ValueError(f"tipo de filtro desconocido: {spec!r}")
+    try:
+        new_filter = FILTERS[spec[0]](*spec[1:])
+    except TypeError:
+        raise ValueError(f"parámetros no válidos para el filtro {spec[0]}: {spec[1:]!r}")
+    if getattr(new_filter, 'window', 1) < 1:
+        raise ValueError(f"la ventana del filtro {spec[0]} debe ser al menos 1")
+    return new_filter
+
+
+def filter_batch(spec, values):
+    """Aplica un filtro a una serie completa (sin huecos) con NumPy. Devuelve un array de float."""
+    import numpy as np
+
+    stream = create_filter(spec)
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    if n == 0: return x
+    if isinstance(stream, SmaFilter):
+        sums = np.cumsum(x)
+        sums[stream.window:] = sums[stream.window:] - sums[:-stream.window]
+        return sums / np.minimum(np.arange(1, n + 1), stream.window)
+    if isinstance(stream, EwmaFilter):
+        return _ewma_batch(np, x, stream.alpha)
+
+    # Mediana y Hampel: las primeras lecturas, con la ventana aún incompleta, se filtran de una en una
+    head = min(stream.window - 1, n)
+    out = np.empty(n)
+    out[:head] = [stream.update(v) for v in x[:head]]
+    if n > head:
+        windows = np.lib.stride_tricks.sliding_window_view(x, stream.window)
+        medians = np.median(windows, axis=1)
+        if isinstance(stream, HampelFilter):
+            mad = np.median(np.abs(windows - medians[:, None]), axis=1)
+            current = x[head:]
+            outliers = np.abs(current - medians) > stream.n_sigmas * MAD_SCALE * mad
+            out[head:] = np.where(outliers, medians, current)
+        else:
+            out[head:] = medians
+    return out
+
+
+def _ewma_batch(np, x, alpha):
+    # y_k = d^(k+1) * y_prev + alpha * d^k * sum_{j<=k}(x_j * d^-j), con d = 1 - alpha, por bloques
+    # cortos para que d^-j no desborde
+    decay = 1 - alpha
+    if decay == 0: return x.copy()
+    block = max(1, int(150 * math.log(10) / -math.log(decay)))
+    out = np.empty(len(x))
+    previous = x[0]
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        powers = decay ** np.arange(len(chunk))
+        out[start:start + len(chunk)] = decay * powers * previous + alpha * powers * np.cumsum(chunk / powers)
+        previous = out[start + len(chunk) - 1]
+    return out
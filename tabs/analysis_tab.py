@@ -4,7 +4,9 @@
 import customtkinter as ctk
 from datetime import datetime
 from tkinter import messagebox
-import csv
+import config
+import export_engine
+from tabs.custom_dialogs import ExportProgressDialog
 
 class AnalysisTab(ctk.CTkFrame):
     def __init__(self, master, app_instance):
@@ -22,15 +24,50 @@ class AnalysisTab(ctk.CTkFrame):
         alerts_frame.grid_rowconfigure(1, weight=1)
         alerts_frame.grid_columnconfigure(0, weight=1)
 
-        # --- NUEVO: Botón de Exportar ---
+        # --- NUEVO: Botón de Exportar y filtros ---
         alerts_controls = ctk.CTkFrame(alerts_frame)
         alerts_controls.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        ctk.CTkLabel(alerts_controls, text="Severidad:").pack(side="left", padx=(10, 5))
+        self.severity_filter = ctk.CTkComboBox(alerts_controls, values=["Todas", "INFO", "WARNING", "CRITICAL"], width=120, command=lambda _: self.load_alerts())
+        self.severity_filter.set("Todas")
+        self.severity_filter.pack(side="left", padx=5)
+        ctk.CTkLabel(alerts_controls, text="Nodo:").pack(side="left", padx=(15, 5))
+        self.node_filter = ctk.CTkComboBox(alerts_controls, values=["Todos"], command=lambda _: self.load_alerts())
+        self.node_filter.set("Todos")
+        self.node_filter.pack(side="left", padx=5)
         self.export_button = ctk.CTkButton(alerts_controls, text="Exportar Alertas a CSV", command=self.export_alerts_to_csv)
         self.export_button.pack(side="right")
 
-        self.alerts_list_frame = ctk.CTkScrollableFrame(alerts_frame, label_text="Historial de Alertas")
+        # --- Lista virtualizada: un número fijo de filas que se reutilizan ---
+        self.alerts = []            # Alertas cargadas (más reciente primero): (id, timestamp, texto, color)
+        self.first_visible = 0      # Índice de self.alerts que se muestra en la primera fila
+        self.has_more_alerts = False
+        self.alert_filter = {}
+
+        list_container = ctk.CTkFrame(alerts_frame)
+        list_container.grid(row=1, column=0, sticky="nsew")
+        list_container.grid_columnconfigure(0, weight=1)
+        list_container.grid_rowconfigure(1, weight=1)
+        ctk.CTkLabel(list_container, text="Historial de Alertas").grid(row=0, column=0, columnspan=2, pady=(5, 0))
+
+        self.alerts_list_frame = ctk.CTkFrame(list_container, fg_color="transparent")
         self.alerts_list_frame.grid(row=1, column=0, sticky="nsew")
         self.alerts_list_frame.grid_columnconfigure(0, weight=1)
+        self.alerts_scrollbar = ctk.CTkScrollbar(list_container, command=self.on_scrollbar)
+        self.alerts_scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.alert_rows = []
+        for i in range(config.ALERTS_VISIBLE_ROWS):
+            row_frame = ctk.CTkFrame(self.alerts_list_frame, border_width=1, border_color="gray25")
+            label = ctk.CTkLabel(row_frame, text="", anchor="w", justify="left")
+            label.pack(side="left", padx=10, pady=5, fill="x", expand=True)
+            self.alert_rows.append((row_frame, label))
+        self.empty_label = ctk.CTkLabel(self.alerts_list_frame, text="No hay alertas registradas.", text_color="gray")
+
+        for widget in [self.alerts_list_frame] + [w for row in self.alert_rows for w in row]:
+            widget.bind("<MouseWheel>", self.on_mouse_wheel)
+            widget.bind("<Button-4>", lambda e: self.scroll_alerts(-3))
+            widget.bind("<Button-5>", lambda e: self.scroll_alerts(3))
 
         # --- Frame Inferior: Log del Bot ---
         self.bot_log_textbox = ctk.CTkTextbox(self, state="disabled", font=ctk.CTkFont(size=14), height=200)
@@ -39,53 +76,126 @@ class AnalysisTab(ctk.CTkFrame):
         self.load_alerts()
 
     def export_alerts_to_csv(self):
-        alerts = self.db.get_alerts()
-        if not alerts:
+        if not self.db.count_alerts():
             messagebox.showinfo("Sin Datos", "No hay alertas para exportar.")
             return
 
         file_path = ctk.filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("Archivos CSV", "*.csv"), ("Todos los archivos", "*.*")],
+            filetypes=export_engine.FILE_TYPES,
             title="Guardar alertas como...",
             initialfile="ecolora_alerts_export.csv"
         )
         if not file_path: return
 
-        try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['timestamp', 'node_alias', 'message', 'severity', 'is_read'])
-                writer.writerows(alerts)
-            messagebox.showinfo("Éxito", f"Alertas exportadas correctamente a:\n{file_path}")
-        except Exception as e:
-            messagebox.showerror("Error de Exportación", f"No se pudo guardar el archivo.\n\nError: {e}")
+        # Se exportan todas las alertas (no solo las mostradas) en segundo plano
+        job = export_engine.ExportJob(
+            self.db, ['timestamp', 'node_alias', 'message', 'severity', 'is_read'],
+            row_source=lambda conn: self.db.iter_alerts(conn, chunk_size=config.EXPORT_CHUNK_SIZE),
+            count_source=lambda conn: self.db.count_alerts(conn=conn),
+            file_path=file_path)
+        job.start()
+        ExportProgressDialog(self, job, title="Exportando alertas")
 
-    def load_alerts(self):
-        for widget in self.alerts_list_frame.winfo_children():
-            widget.destroy()
-            
-        alerts = self.db.get_alerts()
+    def update_node_selector(self, node_list):
+        current = self.node_filter.get()
+        self.node_filter.configure(values=["Todos"] + node_list)
+        if current not in node_list: self.node_filter.set("Todos")
+
+    @staticmethod
+    def format_alert(alert):
+        """Prepara el texto y color de una alerta una sola vez, al cargarla."""
+        alert_id, timestamp, alias, message, severity, is_read = alert
+        time_str = timestamp[:19].replace('T', ' ')
         
-        if not alerts:
-            ctk.CTkLabel(self.alerts_list_frame, text="No hay alertas registradas.", text_color="gray").pack(pady=20)
+        color, icon = ("white", "ℹ️")
+        if severity == 'WARNING': color, icon = ("#FFA500", "⚠️")
+        elif severity == 'CRITICAL': color, icon = ("#d62728", "🚨")
+        return (alert_id, timestamp, f"{icon} [{time_str}] [{alias}] - {message}", color)
+
+    def load_alerts(self):
+        """Recarga la lista desde el principio aplicando los filtros de severidad y nodo."""
+        severity = self.severity_filter.get()
+        node_display = self.node_filter.get()
+        self.alert_filter = {
+            "severity": None if severity == "Todas" else severity,
+            "node_id": None if node_display == "Todos" else self.app.get_full_node_id_from_display(node_display),
+        }
+        rows = self.db.get_alerts_page(limit=config.ALERTS_PAGE_SIZE, **self.alert_filter)
+        self.alerts = [self.format_alert(row) for row in rows]
+        self.has_more_alerts = len(rows) == config.ALERTS_PAGE_SIZE
+        self.first_visible = 0
+        self.render_alerts()
+
+    def add_new_alerts(self):
+        """Antepone solo las alertas insertadas desde la última carga, sin reconstruir la lista."""
+        last_id = max((a[0] for a in self.alerts[:1]), default=None)
+        if last_id is None:
+            self.load_alerts()
+            return
+        rows = self.db.get_alerts_page(after_id=last_id, limit=config.ALERTS_PAGE_SIZE, **self.alert_filter)
+        if not rows: return
+        if len(rows) == config.ALERTS_PAGE_SIZE:
+            # Demasiadas alertas nuevas de golpe: más barato empezar de nuevo
+            self.load_alerts()
             return
+        self.alerts[:0] = [self.format_alert(row) for row in rows]
+        # Si el usuario está mirando alertas antiguas, su vista no se mueve
+        if self.first_visible > 0:
+            self.first_visible += len(rows)
+        self.render_alerts()
 
-        for alert in alerts:
-            timestamp, alias, message, severity, is_read = alert
-            dt_obj = datetime.fromisoformat(timestamp)
-            time_str = dt_obj.strftime('%Y-%m-%d %H:%M:%S')
-            
-            color, icon = ("white", "ℹ️")
-            if severity == 'WARNING': color, icon = ("#FFA500", "⚠️")
-            elif severity == 'CRITICAL': color, icon = ("#d62728", "🚨")
+    def load_older_alerts(self):
+        if not self.has_more_alerts or not self.alerts: return
+        _, timestamp, _, _ = self.alerts[-1]
+        rows = self.db.get_alerts_page(before=(timestamp, self.alerts[-1][0]), limit=config.ALERTS_PAGE_SIZE, **self.alert_filter)
+        self.alerts.extend(self.format_alert(row) for row in rows)
+        self.has_more_alerts = len(rows) == config.ALERTS_PAGE_SIZE
 
-            alert_frame = ctk.CTkFrame(self.alerts_list_frame, border_width=1, border_color="gray25")
-            alert_frame.pack(fill="x", pady=3, padx=5)
+    def render_alerts(self):
+        """Vuelca la ventana visible en las filas reutilizables."""
+        if not self.alerts:
+            for row_frame, _ in self.alert_rows: row_frame.pack_forget()
+            self.empty_label.pack(pady=20)
+            self.alerts_scrollbar.set(0, 1)
+            return
+        self.empty_label.pack_forget()
 
-            full_message = f"{icon} [{time_str}] [{alias}] - {message}"
-            label = ctk.CTkLabel(alert_frame, text=full_message, text_color=color, anchor="w", justify="left")
-            label.pack(side="left", padx=10, pady=5, fill="x", expand=True)
+        visible = self.alerts[self.first_visible:self.first_visible + len(self.alert_rows)]
+        for i, (row_frame, label) in enumerate(self.alert_rows):
+            if i < len(visible):
+                _, _, text, color = visible[i]
+                label.configure(text=text, text_color=color)
+                if not row_frame.winfo_manager():
+                    row_frame.pack(fill="x", pady=3, padx=5)
+            elif row_frame.winfo_manager():
+                row_frame.pack_forget()
+
+        total = len(self.alerts) + (config.ALERTS_PAGE_SIZE if self.has_more_alerts else 0)
+        self.alerts_scrollbar.set(self.first_visible / total, min(1.0, (self.first_visible + len(self.alert_rows)) / total))
+
+    def scroll_alerts(self, delta):
+        max_first = max(0, len(self.alerts) - len(self.alert_rows))
+        new_first = max(0, self.first_visible + delta)
+        # Al acercarse al final de lo cargado se pide la siguiente página a la BD
+        if new_first >= max_first - config.ALERTS_VISIBLE_ROWS and self.has_more_alerts:
+            self.load_older_alerts()
+            max_first = max(0, len(self.alerts) - len(self.alert_rows))
+        new_first = min(new_first, max_first)
+        if new_first != self.first_visible:
+            self.first_visible = new_first
+            self.render_alerts()
+
+    def on_mouse_wheel(self, event):
+        self.scroll_alerts(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            total = len(self.alerts) + (config.ALERTS_PAGE_SIZE if self.has_more_alerts else 0)
+            self.scroll_alerts(int(float(args[1]) * total) - self.first_visible)
+        elif args[0] == "scroll":
+            step = len(self.alert_rows) if args[2] == "pages" else 1
+            self.scroll_alerts(int(args[1]) * step)
 
     def update_log(self, message):
         if not message: return
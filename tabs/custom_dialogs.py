@@ -2,6 +2,7 @@
 # ### ARCHIVO: tabs/custom_dialogs.py ###
 # =============================================================================
 import customtkinter as ctk
+from tkinter import messagebox
 
 class CustomDialog(ctk.CTkToplevel):
     """Clase base para centrar y hacer modales los diálogos."""
@@ -86,4 +87,52 @@ class SelectNodeMetricDialog(CustomDialog):
             "metric": self.metric_combo.get() if hasattr(self, 'metric_combo') else None
         }
         self.grab_release()
-        self.destroy()
\ No newline at end of file
+        self.destroy()
+
+class ExportProgressDialog(CustomDialog):
+    """Diálogo con el progreso de una exportación en segundo plano y opción de cancelarla."""
+    def __init__(self, master, job, title="Exportando..."):
+        super().__init__(master, title, width=380, height=170)
+        self.job = job
+
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(expand=True, fill="both", padx=20, pady=20)
+
+        self.status_label = ctk.CTkLabel(main_frame, text="Preparando exportación...")
+        self.status_label.pack(pady=(0, 10))
+        self.progress_bar = ctk.CTkProgressBar(main_frame, width=300)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(pady=5)
+        self.cancel_button = ctk.CTkButton(main_frame, text="Cancelar", fg_color="gray50", hover_color="gray40", command=self._on_cancel)
+        self.cancel_button.pack(pady=(10, 0))
+
+        self.after(100, self._poll)
+
+    def _on_cancel(self):
+        self.job.cancel()
+        self.status_label.configure(text="Cancelando...")
+        self.cancel_button.configure(state="disabled")
+
+    def _on_closing(self):
+        # Cerrar la ventana equivale a cancelar
+        self.job.cancel()
+        super()._on_closing()
+
+    def _poll(self):
+        if not self.winfo_exists(): return
+        job = self.job
+        if job.status == "running":
+            total = f"{job.total_rows:,}" if job.total_rows is not None else "?"
+            self.status_label.configure(text=f"{job.rows_written:,} de {total} filas")
+            self.progress_bar.set(job.progress)
+            self.after(100, self._poll)
+            return
+
+        self.result = job.status
+        self.grab_release()
+        self.destroy()
+        if job.status == "done":
+            messagebox.showinfo("Éxito", f"Datos exportados correctamente ({job.rows_written:,} filas) a:\n{job.file_path}")
+        elif job.status == "error":
+            messagebox.showerror("Error de Exportación", f"No se pudo guardar el archivo.\n\nError: {job.error}")
+
@@ -7,8 +7,6 @@ import json
 import uuid
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from datetime import datetime
-import config
 import utils
 from tabs.custom_dialogs import AddWidgetDialog, SelectNodeMetricDialog
 
@@ -18,7 +16,7 @@ class DashboardTab(ctk.CTkFrame):
         self.app = app_instance
         self.db = app_instance.db_manager
         self.widgets = {}
-        self.node_graph_data = {}
+        self.store = app_instance.timeseries_store
         self.is_edit_mode = False
 
         self.grid_columnconfigure(0, weight=1)
@@ -153,17 +151,6 @@ class DashboardTab(ctk.CTkFrame):
             canvas = FigureCanvasTkAgg(fig, master=inner_frame)
             canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
             self.widgets[cell_key]["elements"] = {"fig": fig, "ax_temp": ax_temp, "ax_hum": ax_hum, "canvas": canvas}
-            
-            node_id = widget_info["node_id"]
-            if node_id not in self.node_graph_data:
-                self.node_graph_data[node_id] = {'timestamps': [], 'temperature': [], 'humidity': []}
-                recent_data = self.db.get_recent_readings(node_id, config.GRAPH_MAX_POINTS)
-                for row in recent_data:
-                    timestamp, temp, hum = row
-                    self.node_graph_data[node_id]['timestamps'].append(datetime.fromisoformat(timestamp))
-                    self.node_graph_data[node_id]['temperature'].append(temp)
-                    self.node_graph_data[node_id]['humidity'].append(hum)
-            
             self.update_widget(cell_key)
 
     def on_cell_click(self, cell_key):
@@ -172,16 +159,7 @@ class DashboardTab(ctk.CTkFrame):
             self.app.select_node_and_switch_tab(node_id)
 
     def update_data(self, node_id, data):
-        if node_id not in self.node_graph_data:
-            self.node_graph_data[node_id] = {'timestamps': [], 'temperature': [], 'humidity': []}
-        d = self.node_graph_data[node_id]
-        if data.get('temperature') is not None and data.get('humidity') is not None:
-            d['timestamps'].append(datetime.now())
-            d['temperature'].append(data.get('temperature'))
-            d['humidity'].append(data.get('humidity'))
-            for key in d:
-                if len(d[key]) > config.GRAPH_MAX_POINTS: d[key].pop(0)
-
+        # Las series recientes ya las actualizó la ingesta en el almacén compartido
         for cell_key, widget_data in self.widgets.items():
             if widget_data.get("info", {}).get("node_id") == node_id:
                 self.update_widget(cell_key, data)
@@ -243,6 +221,10 @@ class DashboardTab(ctk.CTkFrame):
             elements["canvas"].draw()
 
         elif widget_info["type"] == "grafica":
-            graph_data = self.node_graph_data.get(node_id)
+            graph_data = self.store.get_graph_data(node_id)
             utils.draw_graph_widget(elements["ax_temp"], elements["ax_hum"], graph_data)
-            elements["canvas"].draw()
\ No newline at end of file
+            elements["canvas"].draw()
+
+        if data is not None:
+            # Lectura nueva ya dibujada: cierra su traza de latencia
+            self.app.latency_tracer.finish(node_id)
\ No newline at end of file
@@ -0,0 +1,107 @@
+# =============================================================================
+# ### ARCHIVO: tabs/diagnostics_window.py ###
+# =============================================================================
+import time
+import customtkinter as ctk
+from tkinter import ttk
+import config
+from metrics import REGISTRY, READING_SLA
+import loop_profiler
+
+class DiagnosticsWindow(ctk.CTkToplevel):
+    """Panel de diagnóstico con las métricas internas de la ruta de ingesta."""
+    def __init__(self, master, app_instance):
+        super().__init__(master)
+        self.app = app_instance
+        self.previous = {}          # (métrica, etiquetas) -> (instante, valor) para calcular tasas
+        self.refresh_after_id = None
+
+        self.title("Diagnóstico")
+        self.geometry("950x550")
+        self.transient(master)
+
+        header = ctk.CTkFrame(self)
+        header.pack(fill="x", padx=10, pady=(10, 5))
+        self.summary_label = ctk.CTkLabel(header, text="", anchor="w")
+        self.summary_label.pack(side="left", expand=True, fill="x", padx=10, pady=10)
+        self.profile_button = ctk.CTkButton(header, text="", width=170, command=self.toggle_loop_profile)
+        self.profile_button.pack(side="right", padx=10)
+        self.update_profile_button()
+        if self.app.api_server:
+            host, port = self.app.api_server.httpd.server_address[:2]
+            ctk.CTkLabel(header, text=f"Prometheus: http://{host}:{port}/metrics", text_color="gray").pack(side="right", padx=10)
+
+        table_frame = ctk.CTkFrame(self, fg_color="transparent")
+        table_frame.pack(expand=True, fill="both", padx=10, pady=(5, 10))
+        self.tree = ttk.Treeview(table_frame, columns=("Métrica", "Etiquetas", "Valor", "Tasa/s", "Media", "p95"), show="headings")
+        headers = {"Métrica": 250, "Etiquetas": 260, "Valor": 90, "Tasa/s": 80, "Media": 90, "p95": 90}
+        for col, width in headers.items():
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="w" if col in ("Métrica", "Etiquetas") else "center")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", expand=True, fill="both")
+        scrollbar.pack(side="right", fill="y")
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.refresh()
+
+    def update_profile_button(self):
+        if loop_profiler.is_enabled():
+            self.profile_button.configure(text="Detener perfil del bucle")
+        else:
+            self.profile_button.configure(text="Perfilar bucle de eventos")
+
+    def toggle_loop_profile(self):
+        if loop_profiler.is_enabled():
+            path = loop_profiler.disable()
+            self.app.log_queue.put(("INFO", f"Perfil del bucle de eventos guardado en {path}"))
+        else:
+            try:
+                path = loop_profiler.enable()
+            except OSError as e:
+                self.app.log_queue.put(("ERROR", f"No se pudo iniciar el perfil del bucle: {e}"))
+                return
+            self.app.log_queue.put(("INFO", f"Perfil del bucle de eventos activo; callbacks de más de {config.LOOP_PROFILE_SLOW_MS} ms se registran en {path}"))
+        self.update_profile_button()
+
+    def rate(self, key, value, now):
+        previous = self.previous.get(key)
+        self.previous[key] = (now, value)
+        if previous is None or now <= previous[0]: return ""
+        return f"{(value - previous[1]) / (now - previous[0]):.2f}"
+
+    def refresh(self):
+        now = time.monotonic()
+        rows = []
+        for metric in REGISTRY.all():
+            short_name = metric.name.replace("ecolora_", "", 1)
+            if metric.kind == "histogram":
+                for labels, counts, total_sum, count in metric.samples():
+                    label_text = ", ".join(f"{k}={v}" for k, v in labels)
+                    mean = f"{total_sum / count * 1000:.1f} ms" if count else ""
+                    p95 = metric.quantile(counts, 0.95)
+                    if p95 is None: p95_text = ""
+                    elif p95 == float('inf'): p95_text = f"> {metric.buckets[-1] * 1000:g} ms"
+                    else: p95_text = f"≤ {p95 * 1000:g} ms"
+                    rows.append((short_name, label_text, count, self.rate((metric.name, labels), count, now), mean, p95_text))
+            else:
+                for labels, value in metric.samples():
+                    label_text = ", ".join(f"{k}={v}" for k, v in labels)
+                    rate = self.rate((metric.name, labels), value, now) if metric.kind == "counter" else ""
+                    rows.append((short_name, label_text, f"{value:g}", rate, "", ""))
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert("", "end", values=row)
+        summary = f"{len(rows)} series · actualizado cada {config.DIAGNOSTICS_REFRESH_MS // 1000} s"
+        sla = {dict(labels).get("result"): value for labels, value in READING_SLA.samples()}
+        total = sum(sla.values())
+        if total:
+            summary += f" · SLA {config.READING_VISIBLE_SLA_S:g} s: {sla.get('cumplido', 0) / total * 100:.1f} % de {total} lecturas"
+        self.summary_label.configure(text=summary)
+        self.refresh_after_id = self.after(config.DIAGNOSTICS_REFRESH_MS, self.refresh)
+
+    def on_close(self):
+        if self.refresh_after_id: self.after_cancel(self.refresh_after_id)
+        self.destroy()
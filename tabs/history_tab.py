@@ -4,13 +4,25 @@
 import customtkinter as ctk
 from tkinter import ttk, filedialog
 from tkcalendar import DateEntry
-import pandas as pd
 from datetime import datetime
+import config
+import export_engine
+from tabs.custom_dialogs import ExportProgressDialog
 
 class HistoryTab(ctk.CTkFrame):
-    def __init__(self, parent, db_manager):
+    def __init__(self, parent, app_instance):
         super().__init__(parent)
-        self.db_manager = db_manager
+        self.app = app_instance
+        self.db_manager = app_instance.db_manager
+
+        # --- Estado de la tabla virtualizada ---
+        # La tabla solo contiene una ventana de filas; los extremos se recorren
+        # con paginación por clave (timestamp, id) a medida que el usuario se desplaza.
+        self.current_filter = {}
+        self.row_keys = {}          # iid -> (timestamp, id)
+        self.has_more_older = False
+        self.has_more_newer = False
+        self.is_loading = False
 
         # --- CONTENEDOR DE FILTROS ---
         filter_frame = ctk.CTkFrame(self)
@@ -37,7 +49,9 @@ class HistoryTab(ctk.CTkFrame):
 
 
         # --- TABLA DE DATOS ---
-        self.tree = ttk.Treeview(self, columns=("ID", "Timestamp", "Node ID", "Alias", "Temp", "Hum", "Pres", "Bat", "Lat", "Lon"), show="headings")
+        table_frame = ctk.CTkFrame(self, fg_color="transparent")
+        table_frame.pack(expand=True, fill="both", padx=10, pady=(0, 10))
+        self.tree = ttk.Treeview(table_frame, columns=("ID", "Timestamp", "Node ID", "Alias", "Temp", "Hum", "Pres", "Bat", "Lat", "Lon"), show="headings")
         
         # Definir encabezados y anchos
         headers = {"ID": 50, "Timestamp": 160, "Node ID": 100, "Alias": 100, "Temp": 80, "Hum": 80, "Pres": 80, "Bat": 80, "Lat": 120, "Lon": 120}
@@ -45,67 +59,124 @@ class HistoryTab(ctk.CTkFrame):
             self.tree.heading(col, text=col)
             self.tree.column(col, width=width, anchor="center")
 
-        self.tree.pack(expand=True, fill="both", padx=10, pady=(0, 10))
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", expand=True, fill="both")
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
         
         self.load_node_ids()
         self.filter_data()
 
     def load_node_ids(self):
         nodes = self.db_manager.get_all_nodes()
-        node_ids = ["Todos"] + [node[1][-4:] for node in nodes]
-        self.node_id_combobox.configure(values=list(set(node_ids))) # Usar set para evitar duplicados
+        node_ids = ["Todos"] + sorted({node[0][-4:] for node in nodes}) # Usar set para evitar duplicados
+        self.node_id_combobox.configure(values=node_ids)
+
+    def update_node_selector(self, node_list):
+        self.load_node_ids()
 
     def filter_data(self, event=None):
         node_id_suffix = self.node_id_combobox.get()
-        start_date = self.start_date_entry.get_date().strftime("%Y-%m-%d 00:00:00")
-        end_date = self.end_date_entry.get_date().strftime("%Y-%m-%d 23:59:59")
+        self.current_filter = {
+            "node_id_suffix": None if node_id_suffix == "Todos" else node_id_suffix,
+            "start_date": self.start_date_entry.get_date().strftime("%Y-%m-%dT00:00:00"),
+            "end_date": self.end_date_entry.get_date().strftime("%Y-%m-%dT23:59:59.999999"),
+        }
         
         # Limpiar la tabla antes de cargar nuevos datos
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        # Obtener y mostrar los datos
-        data = self.db_manager.get_telemetry_history(
-            node_id_suffix=None if node_id_suffix == "Todos" else node_id_suffix,
-            start_date=start_date,
-            end_date=end_date
-        )
-        
-        for row in data:
-            # Formatear el alias para que sea legible
-            node_alias = self.db_manager.get_node_alias(row[2]) or "N/A"
-            # Reemplazar None con "N/A" para una mejor visualización
+        self.tree.delete(*self.tree.get_children())
+        self.row_keys = {}
+        self.has_more_newer = False
+
+        # Solo se carga la primera página; el resto llega al desplazarse
+        rows = self.db_manager.get_telemetry_history(limit=config.HISTORY_PAGE_SIZE, **self.current_filter)
+        self.has_more_older = len(rows) == config.HISTORY_PAGE_SIZE
+        self.insert_rows(rows, "end")
+        self.tree.yview_moveto(0)
+
+    def insert_rows(self, rows, position):
+        # Al insertar al principio se recorre al revés para conservar el orden
+        for row in (rows if position == "end" else reversed(rows)):
+            # Reemplazar None con "N/A" para una mejor visualización (el alias ya viene de la consulta)
             display_row = [f"{v:.2f}" if isinstance(v, float) else ("N/A" if v is None else v) for v in row]
-            display_row[3] = node_alias # Insertar alias en la posición correcta
-            self.tree.insert("", "end", values=display_row)
+            iid = self.tree.insert("", position if position == "end" else 0, values=display_row)
+            self.row_keys[iid] = (row[1], row[0])
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.is_loading: return
+        first, last = float(first), float(last)
+        margin = config.HISTORY_PREFETCH_FRACTION
+        if last >= 1.0 - margin and self.has_more_older:
+            self.after_idle(self.load_older_page)
+        elif first <= margin and self.has_more_newer:
+            self.after_idle(self.load_newer_page)
+
+    def load_older_page(self):
+        children = self.tree.get_children()
+        if not children or not self.has_more_older or self.is_loading: return
+        self.is_loading = True
+        try:
+            rows = self.db_manager.get_telemetry_history(before=self.row_keys[children[-1]], limit=config.HISTORY_PAGE_SIZE, **self.current_filter)
+            self.has_more_older = len(rows) == config.HISTORY_PAGE_SIZE
+            self.insert_rows(rows, "end")
+            self.trim_rows(from_top=True)
+        finally:
+            self.is_loading = False
+
+    def load_newer_page(self):
+        children = self.tree.get_children()
+        if not children or not self.has_more_newer or self.is_loading: return
+        self.is_loading = True
+        try:
+            rows = self.db_manager.get_telemetry_history(after=self.row_keys[children[0]], limit=config.HISTORY_PAGE_SIZE, **self.current_filter)
+            self.has_more_newer = len(rows) == config.HISTORY_PAGE_SIZE
+            self.insert_rows(rows, 0)
+            # Mantener a la vista las mismas filas que antes de insertar arriba
+            self.tree.yview_scroll(len(rows), "units")
+            self.trim_rows(from_top=False)
+        finally:
+            self.is_loading = False
+
+    def trim_rows(self, from_top):
+        """Descarta filas del extremo opuesto para que la tabla no supere HISTORY_TABLE_MAX_ROWS."""
+        children = self.tree.get_children()
+        excess = len(children) - config.HISTORY_TABLE_MAX_ROWS
+        if excess <= 0: return
+        to_delete = children[:excess] if from_top else children[-excess:]
+        self.tree.delete(*to_delete)
+        for iid in to_delete:
+            del self.row_keys[iid]
+        if from_top:
+            self.has_more_newer = True
+            self.tree.yview_scroll(-excess, "units")
+        else:
+            self.has_more_older = True
 
     def export_to_csv(self):
-        # Obtener los datos actualmente mostrados en la tabla
-        data = []
-        columns = [self.tree.heading(col)["text"] for col in self.tree["columns"]]
-        for item in self.tree.get_children():
-            data.append(self.tree.item(item)["values"])
-
-        if not data:
+        # Se exporta todo lo que cumple el filtro actual, directamente desde la BD
+        if not self.current_filter or not self.tree.get_children():
             print("No hay datos para exportar.")
             return
 
         # Pedir al usuario que elija la ubicación del archivo
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            filetypes=export_engine.FILE_TYPES,
             title="Guardar historial como CSV"
         )
         if not file_path:
             return
 
-        # Usar pandas para crear y guardar el CSV
-        try:
-            df = pd.DataFrame(data, columns=columns)
-            df.to_csv(file_path, index=False)
-            print(f"Datos exportados exitosamente a {file_path}")
-        except Exception as e:
-            print(f"Error al exportar a CSV: {e}")
+        columns = [self.tree.heading(col)["text"] for col in self.tree["columns"]]
+        history_filter = dict(self.current_filter)
+        job = export_engine.ExportJob(
+            self.db_manager, columns,
+            row_source=lambda conn: self.db_manager.iter_telemetry_history(conn, chunk_size=config.EXPORT_CHUNK_SIZE, **history_filter),
+            count_source=lambda conn: self.db_manager.count_telemetry_history(conn=conn, **history_filter),
+            file_path=file_path)
+        job.start()
+        ExportProgressDialog(self, job, title="Exportando historial")
 
     def on_tab_selected(self):
         """Llamado cuando la pestaña se hace visible."""
@@ -4,6 +4,7 @@
 import customtkinter as ctk
 from datetime import datetime
 import re
+import config
 
 class MessagingTab(ctk.CTkFrame):
     def __init__(self, master, app_instance):
@@ -12,6 +13,12 @@ class MessagingTab(ctk.CTkFrame):
         self.db = app_instance.db_manager
         self.serial = app_instance.serial_manager
 
+        # Cachés de nombres: se renuevan al cambiar la lista de nodos o de canales
+        self.alias_cache = {}
+        self.channel_names = {}
+        self.oldest_message_key = None   # (timestamp, id) del mensaje más antiguo mostrado
+        self.has_older_messages = False
+
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
         
@@ -21,6 +28,9 @@ class MessagingTab(ctk.CTkFrame):
         self.message_display.tag_config("directo_recibido", foreground="#d62728")
         self.message_display.tag_config("enviado", foreground="#2ca02c")
         self.message_display.tag_config("info", foreground="gray")
+        # Al llegar arriba con la rueda del ratón se cargan mensajes anteriores
+        self.message_display.bind("<MouseWheel>", self.on_scroll, add="+")
+        self.message_display.bind("<Button-4>", self.on_scroll, add="+")
         
         send_frame = ctk.CTkFrame(self, fg_color="transparent")
         send_frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="ew")
@@ -46,39 +56,72 @@ class MessagingTab(ctk.CTkFrame):
         if match:
             channel_index = int(match.group(1))
 
-        if self.serial.send_text_message(text, channel_index=channel_index):
+        queued = self.serial.send_text_message(text, channel_index=channel_index)
+        if queued:
+            eta = next((eta for message, eta in self.serial.tx.pending() if message is queued), 0)
+            if eta >= 1:
+                self.app.log_queue.put(("INFO", f"Mensaje en cola de transmisión, envío estimado en ~{eta:.0f}s."))
             self.msg_entry.delete(0, 'end')
             self.db.save_message(self.app.local_node_id, '^all', channel_index, text, False) 
             self.display_message(self.app.local_node_id, '^all', text, datetime.now(), False, channel_index)
         else:
             self.app.log_queue.put("ERROR: No se pudo enviar el mensaje.")
 
-    def handle_text_message(self, packet):
-        from_id = packet['fromId']
-        text = packet['decoded'].get('payload', b'').decode('utf-8', 'ignore')
-        channel = packet.get('channel')
-        to_id = f"!{packet.get('to'):x}"
-        is_direct = packet.get('isDirect', False)
-        
-        self.db.save_message(from_id, to_id, channel, text, is_direct)
-        self.display_message(from_id, to_id, text, datetime.now(), is_direct, channel)
+    def handle_text_message(self, record):
+        self.db.save_message(record.node_id, record.to_id, record.channel, record.text, record.is_direct)
+        self.display_message(record.node_id, record.to_id, record.text, datetime.now(), record.is_direct, record.channel)
 
     # === MÉTODOS AÑADIDOS PARA CORREGIR EL ERROR ===
 
     def load_message_history(self):
+        self.refresh_alias_cache()
         self.message_display.configure(state="normal")
         self.message_display.delete("1.0", "end")
-        messages = self.db.get_messages()
-        for from_id, to_id, text, timestamp, is_direct, channel in messages:
-            dt_obj = datetime.fromisoformat(timestamp)
-            self.display_message(from_id, to_id, text, dt_obj, is_direct, channel)
+        messages = self.db.get_messages(limit=config.MESSAGES_PAGE_SIZE)
+        self.has_older_messages = len(messages) == config.MESSAGES_PAGE_SIZE
+        self.oldest_message_key = (messages[0][4], messages[0][0]) if messages else None
+        for segments in map(self.format_message_row, messages):
+            for text, tags in segments:
+                self.message_display.insert("end", text, tags)
         self.message_display.configure(state="disabled")
+        self.message_display.see("end")
 
-    def display_message(self, from_id, to_id, text, timestamp, is_direct, channel):
-        node_info = self.db.get_node(from_id)
-        sender_name = node_info[1] if node_info and node_info[1] else from_id
-        
+    def on_scroll(self, event=None):
+        if self.has_older_messages and self.message_display.yview()[0] <= 0.0:
+            self.after_idle(self.load_older_messages)
+
+    def load_older_messages(self):
+        """Antepone la página anterior de mensajes (paginación por clave en get_messages)."""
+        if not self.has_older_messages or not self.oldest_message_key: return
+        messages = self.db.get_messages(limit=config.MESSAGES_PAGE_SIZE, before=self.oldest_message_key)
+        self.has_older_messages = len(messages) == config.MESSAGES_PAGE_SIZE
+        if not messages: return
+        self.oldest_message_key = (messages[0][4], messages[0][0])
+
+        # Insertando siempre en "1.0" y en orden inverso el resultado queda cronológico
         self.message_display.configure(state="normal")
+        inserted_lines = 0
+        for segments in map(self.format_message_row, reversed(messages)):
+            for text, tags in reversed(segments):
+                self.message_display.insert("1.0", text, tags)
+                inserted_lines += text.count("\n")
+        self.message_display.configure(state="disabled")
+        # Mantener a la vista el que era el primer mensaje
+        self.message_display.see(f"{inserted_lines + 1}.0")
+
+    def refresh_alias_cache(self):
+        self.alias_cache = {node_id: alias for node_id, alias in self.db.get_all_nodes() if alias}
+
+    def update_node_selector(self, node_list):
+        self.refresh_alias_cache()
+
+    def format_message_row(self, row):
+        _, from_id, to_id, text, timestamp, is_direct, channel = row
+        return self.format_message(from_id, to_id, text, datetime.fromisoformat(timestamp), is_direct, channel)
+
+    def format_message(self, from_id, to_id, text, timestamp, is_direct, channel):
+        """Devuelve los fragmentos [(texto, tags)] de un mensaje usando los nombres en caché."""
+        sender_name = self.alias_cache.get(from_id, from_id)
         time_str = f"[{timestamp.strftime('%H:%M:%S')}] "
         
         header, tag = "", ""
@@ -86,8 +129,7 @@ class MessagingTab(ctk.CTkFrame):
             tag = "enviado"
             dest_name = "TODOS"
             if to_id != '^all':
-                dest_node_info = self.db.get_node(to_id)
-                dest_name = dest_node_info[1] if dest_node_info and dest_node_info[1] else to_id
+                dest_name = self.alias_cache.get(to_id, to_id)
             header = f"Tú a {dest_name}"
         else:
             if is_direct:
@@ -95,25 +137,26 @@ class MessagingTab(ctk.CTkFrame):
                 header = f"{sender_name} (Directo)"
             else:
                 tag = "canal_recibido"
-                channel_name = f"Canal #{channel}" 
-                channels = self.serial.get_channels()
-                if channels and channel is not None and channel < len(channels):
-                    ch_settings = channels[channel].settings
-                    if ch_settings and ch_settings.name:
-                        channel_name = ch_settings.name
+                channel_name = self.channel_names.get(channel, f"Canal #{channel}")
                 header = f"{sender_name} ({channel_name})"
                 
-        self.message_display.insert("end", time_str, ("info",))
-        self.message_display.insert("end", f"{header}: ", (tag,))
-        self.message_display.insert("end", f"{text}\n")
+        return [(time_str, ("info",)), (f"{header}: ", (tag,)), (f"{text}\n", ())]
+
+    def display_message(self, from_id, to_id, text, timestamp, is_direct, channel):
+        self.message_display.configure(state="normal")
+        for segment, tags in self.format_message(from_id, to_id, text, timestamp, is_direct, channel):
+            self.message_display.insert("end", segment, tags)
         self.message_display.configure(state="disabled")
         self.message_display.see("end")
 
     def update_channel_list(self):
         channels = self.serial.get_channels()
         destinations = ["Canal Primario"]
+        self.channel_names = {}
         if channels:
             for i, ch in enumerate(channels):
+                if hasattr(ch, 'settings') and ch.settings and ch.settings.name:
+                    self.channel_names[i] = ch.settings.name
                 if i > 0 and hasattr(ch, 'settings') and ch.settings.name:
                     destinations.append(f"{ch.settings.name} (Ch {i})")
         self.msg_dest_selector.configure(values=destinations)
@@ -4,11 +4,15 @@
 import customtkinter as ctk
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import matplotlib.dates as mdates
 from tkinter import messagebox
-from datetime import datetime
-import json
+import math
+import queue
 import config
+from poll_scheduler import POLL_TELEMETRY
+from packet_record import parse_binary_sensor
 import utils
+from history_pager import HistoryPager
 
 class NodeDetailTab(ctk.CTkFrame):
     def __init__(self, master, app_instance):
@@ -18,7 +22,12 @@ class NodeDetailTab(ctk.CTkFrame):
         
         self.latest_sensor_data = {}
         self.latest_binary_data = {}
-        self.node_graph_data = {}
+        self.store = app_instance.timeseries_store
+
+        # --- Navegación por el historial (paneo/zoom) ---
+        self.history_pager = HistoryPager(self.db, config.HISTORY_CACHE_WINDOWS)
+        self.history_view = None        # xlim mostrado cuando no se está en modo "en vivo"
+        self.pending_history_key = None
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(2, weight=1)
@@ -100,6 +109,7 @@ class NodeDetailTab(ctk.CTkFrame):
 
         ctk.CTkButton(graph_controls_frame, text="<", width=40, command=self.pan_left).grid(row=0, column=0)
         ctk.CTkButton(graph_controls_frame, text=">", width=40, command=self.pan_right).grid(row=0, column=1)
+        ctk.CTkButton(graph_controls_frame, text="En Vivo", width=80, command=self.return_to_live).grid(row=0, column=2)
         ctk.CTkButton(graph_controls_frame, text="-", width=40, command=self.zoom_out).grid(row=0, column=3)
         ctk.CTkButton(graph_controls_frame, text="+", width=40, command=self.zoom_in).grid(row=0, column=4)
 
@@ -107,10 +117,10 @@ class NodeDetailTab(ctk.CTkFrame):
         if not self.app.selected_node_id:
             messagebox.showwarning("Sin Nodo", "No hay ningún nodo seleccionado.", parent=self)
             return
-        command = "!request_telemetry"
         self.app.log_queue.put(("CONTROL", f"Solicitando telemetría al nodo {self.app.selected_node_id}"))
-        self.app.serial_manager.send_text_message(command, destination_id=self.app.selected_node_id)
-        messagebox.showinfo("Comando Enviado", f"Solicitud de telemetría enviada al nodo {self.app.selected_node_id[-4:]}.", parent=self)
+        # Pasa por el programador de sondeos para no coincidir con una ronda en curso
+        self.app.poll_scheduler.request([self.app.selected_node_id], POLL_TELEMETRY, force=True)
+        messagebox.showinfo("Comando Enviado", f"Solicitud de telemetría en cola para el nodo {self.app.selected_node_id[-4:]}.", parent=self)
 
     def create_info_cards(self, parent):
         parent.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
@@ -159,50 +169,91 @@ class NodeDetailTab(ctk.CTkFrame):
         self.gauge_canvas.draw()
         
     def update_graph_plot(self):
+        # Mientras se navega por el historial, las lecturas nuevas no mueven la vista
+        if self.history_view is not None: return
         node_id = self.app.selected_node_id
-        graph_data = self.node_graph_data.get(node_id)
+        graph_data = self.store.get_graph_data(node_id) if node_id else None
         utils.draw_graph_widget(self.live_ax_temp, self.live_ax_hum, graph_data)
         self.live_canvas.draw()
 
+    def return_to_live(self):
+        self.history_view = None
+        self.pending_history_key = None
+        self.update_graph_plot()
+
     def pan_left(self):
         cur_xlim = self.live_ax_temp.get_xlim()
         range_val = cur_xlim[1] - cur_xlim[0]
-        self.live_ax_temp.set_xlim(cur_xlim[0] - range_val*0.1, cur_xlim[1] - range_val*0.1)
-        self.live_canvas.draw()
+        self.show_history_window((cur_xlim[0] - range_val*0.1, cur_xlim[1] - range_val*0.1))
 
     def pan_right(self):
         cur_xlim = self.live_ax_temp.get_xlim()
         range_val = cur_xlim[1] - cur_xlim[0]
-        self.live_ax_temp.set_xlim(cur_xlim[0] + range_val*0.1, cur_xlim[1] + range_val*0.1)
-        self.live_canvas.draw()
+        self.show_history_window((cur_xlim[0] + range_val*0.1, cur_xlim[1] + range_val*0.1))
 
     def zoom_in(self):
         cur_xlim = self.live_ax_temp.get_xlim()
         center = (cur_xlim[1] + cur_xlim[0]) / 2
         range_val = (cur_xlim[1] - cur_xlim[0]) * 0.8 / 2
-        self.live_ax_temp.set_xlim(center - range_val, center + range_val)
-        self.live_canvas.draw()
+        self.show_history_window((center - range_val, center + range_val))
 
     def zoom_out(self):
         cur_xlim = self.live_ax_temp.get_xlim()
         center = (cur_xlim[1] + cur_xlim[0]) / 2
         range_val = (cur_xlim[1] - cur_xlim[0]) * 1.25 / 2
-        self.live_ax_temp.set_xlim(center - range_val, center + range_val)
+        self.show_history_window((center - range_val, center + range_val))
+
+    def show_history_window(self, xlim):
+        """Muestra la ventana xlim (fechas de matplotlib) cargando el historial desde la BD si hace falta."""
+        node_id = self.app.selected_node_id
+        if not node_id or xlim[1] <= xlim[0]: return
+        self.history_view = xlim
+
+        # La ventana que se pide a la BD se alinea a una rejilla potencia de 2 y
+        # se amplía a ambos lados, así los paneos cortos reutilizan la caché.
+        span = xlim[1] - xlim[0]
+        grid = 2 ** math.ceil(math.log2(span))
+        fetch_start = (math.floor(xlim[0] / grid) - 1) * grid
+        fetch_end = fetch_start + 4 * grid
+        start = mdates.num2date(fetch_start).replace(tzinfo=None)
+        end = mdates.num2date(fetch_end).replace(tzinfo=None)
+        n_buckets = max(100, int(self.live_ax_temp.get_window_extent().width) * 4)
+
+        key = (node_id, start, end, n_buckets)
+        data = self.history_pager.request(*key)
+        if data is not None:
+            self.pending_history_key = None
+            self.draw_history(data)
+            return
+
+        # Mientras llega la ventana se desplaza lo que ya está dibujado
+        self.live_ax_temp.set_xlim(*xlim)
+        self.live_canvas.draw_idle()
+        if self.pending_history_key is None:
+            self.after(50, self.poll_history_results)
+        self.pending_history_key = key
+
+    def poll_history_results(self):
+        try:
+            while True:
+                key, data = self.history_pager.results.get_nowait()
+                if key == self.pending_history_key:
+                    self.pending_history_key = None
+                    if data is not None and self.history_view is not None:
+                        self.draw_history(data)
+        except queue.Empty:
+            pass
+        if self.pending_history_key is not None:
+            self.after(50, self.poll_history_results)
+
+    def draw_history(self, data):
+        utils.draw_graph_widget(self.live_ax_temp, self.live_ax_hum, data, xlim=self.history_view)
         self.live_canvas.draw()
 
     def update_graph_data(self, data):
+        # Los datos ya están en el almacén compartido; solo hay que redibujar
         node_id = data.get('node_id')
         if not node_id: return
-        if node_id not in self.node_graph_data:
-            self.node_graph_data[node_id] = {'timestamps': [], 'temperature': [], 'humidity': []}
-        d = self.node_graph_data[node_id]
-        if data.get('temperature') is not None and data.get('humidity') is not None:
-            d['timestamps'].append(datetime.now())
-            d['temperature'].append(data.get('temperature'))
-            d['humidity'].append(data.get('humidity'))
-            for key in d:
-                if len(d[key]) > config.GRAPH_MAX_POINTS:
-                    d[key].pop(0)
         if node_id == self.app.selected_node_id:
             self.update_graph_plot()
             
@@ -234,14 +285,8 @@ class NodeDetailTab(ctk.CTkFrame):
         alias = node_info[1] or 'Sin Alias'
         display_name = f"{alias} ({node_id[-4:]})"
         self.node_selector.set(display_name)
-
-        self.node_graph_data[node_id] = {'timestamps': [], 'temperature': [], 'humidity': []}
-        recent_data = self.db.get_recent_readings(node_id, config.GRAPH_MAX_POINTS)
-        for row in recent_data:
-            timestamp, temp, hum = row
-            self.node_graph_data[node_id]['timestamps'].append(datetime.fromisoformat(timestamp))
-            self.node_graph_data[node_id]['temperature'].append(temp)
-            self.node_graph_data[node_id]['humidity'].append(hum)
+        self.history_view = None
+        self.pending_history_key = None
 
         last_data = self.db.get_last_reading(node_id)
         self.update_ui(last_data or {})
@@ -287,19 +332,19 @@ class NodeDetailTab(ctk.CTkFrame):
         sensor_name = self.db.get_setting("binary_sensor_name", "Sensor Binario")
         self.binary_indicator_label.configure(text=f"{sensor_name}: {tooltip_text}")
 
-    def handle_binary_sensor(self, packet):
-        node_id = packet['fromId']
-        try:
-            payload_str = packet['decoded']['payload'].decode('utf-8')
-            data = json.loads(payload_str)
-            if 'sensor' in data and 'state' in data:
-                state = data['state']
-                self.db.insert_binary_reading(node_id, data['sensor'], state)
-                self.latest_binary_data[node_id] = state
-                if node_id == self.app.selected_node_id:
-                    self.update_binary_indicator()
-        except (UnicodeDecodeError, json.JSONDecodeError):
-            self.app.log_queue.put(("ERROR", f"Paquete binario malformado recibido de {node_id}"))
+    def handle_binary_sensor(self, record):
+        reading = parse_binary_sensor(record.payload)
+        if reading is None:
+            self.app.log_queue.put(("ERROR", f"Paquete binario malformado recibido de {record.node_id}"))
+            return
+        sensor, state = reading
+        self.db.insert_binary_reading(record.node_id, sensor, state)
+        self.show_binary_state(record.node_id, state)
+
+    def show_binary_state(self, node_id, state):
+        self.latest_binary_data[node_id] = state
+        if node_id == self.app.selected_node_id:
+            self.update_binary_indicator()
         
     def update_actuator_button_state(self):
         actuator_node_display = self.db.get_setting("actuator_node_display")
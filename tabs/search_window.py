@@ -0,0 +1,106 @@
+# =============================================================================
+# ### ARCHIVO: tabs/search_window.py ###
+# =============================================================================
+import customtkinter as ctk
+from tkinter import ttk
+from tkcalendar import DateEntry
+import config
+
+SCOPES = {"Todo": "all", "Mensajes": "messages", "Alertas": "alerts"}
+
+class SearchWindow(ctk.CTkToplevel):
+    """Búsqueda de texto completo en el historial de mensajes y alertas."""
+    def __init__(self, master, app_instance):
+        super().__init__(master)
+        self.app = app_instance
+        self.db = app_instance.db_manager
+        self.results = {}   # iid -> fila de resultado
+
+        self.title("Buscar en Mensajes y Alertas")
+        self.geometry("900x550")
+        self.transient(master)
+
+        # --- Consulta y filtros ---
+        query_frame = ctk.CTkFrame(self)
+        query_frame.pack(fill="x", padx=10, pady=(10, 5))
+        self.query_entry = ctk.CTkEntry(query_frame, placeholder_text="Palabras a buscar...")
+        self.query_entry.pack(side="left", expand=True, fill="x", padx=(10, 5), pady=10)
+        self.query_entry.bind("<Return>", lambda e: self.run_search())
+        self.scope_combobox = ctk.CTkComboBox(query_frame, values=list(SCOPES.keys()), width=110, command=lambda _: self.run_search())
+        self.scope_combobox.set("Todo")
+        self.scope_combobox.pack(side="left", padx=5)
+        ctk.CTkButton(query_frame, text="Buscar", width=90, command=self.run_search).pack(side="left", padx=(5, 10))
+
+        filter_frame = ctk.CTkFrame(self)
+        filter_frame.pack(fill="x", padx=10, pady=5)
+        ctk.CTkLabel(filter_frame, text="Nodo:").pack(side="left", padx=(10, 5))
+        nodes = self.db.get_nodes()
+        self.node_combobox = ctk.CTkComboBox(filter_frame, values=["Todos"] + [f"{n[1] or 'Sin Alias'} ({n[0][-4:]})" for n in nodes])
+        self.node_combobox.set("Todos")
+        self.node_combobox.pack(side="left", padx=5)
+        ctk.CTkLabel(filter_frame, text="Canal:").pack(side="left", padx=(15, 5))
+        self.channel_combobox = ctk.CTkComboBox(filter_frame, values=["Todos"] + [str(i) for i in range(8)], width=80)
+        self.channel_combobox.set("Todos")
+        self.channel_combobox.pack(side="left", padx=5)
+
+        self.use_dates = ctk.CTkCheckBox(filter_frame, text="Fechas:")
+        self.use_dates.pack(side="left", padx=(15, 5))
+        self.start_date_entry = DateEntry(filter_frame, date_pattern='y-mm-dd')
+        self.start_date_entry.pack(side="left", padx=5)
+        self.end_date_entry = DateEntry(filter_frame, date_pattern='y-mm-dd')
+        self.end_date_entry.pack(side="left", padx=5)
+
+        # --- Resultados ---
+        table_frame = ctk.CTkFrame(self, fg_color="transparent")
+        table_frame.pack(expand=True, fill="both", padx=10, pady=5)
+        self.tree = ttk.Treeview(table_frame, columns=("Tipo", "Fecha", "Nodo", "Texto", "Canal/Severidad"), show="headings")
+        headers = {"Tipo": 70, "Fecha": 140, "Nodo": 120, "Texto": 420, "Canal/Severidad": 110}
+        for col, width in headers.items():
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="w" if col == "Texto" else "center")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", expand=True, fill="both")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.bind("<Double-1>", self.open_result)
+
+        self.status_label = ctk.CTkLabel(self, text="", anchor="w")
+        self.status_label.pack(fill="x", padx=15, pady=(0, 10))
+        if not self.db.fts_available:
+            self.status_label.configure(text="FTS5 no disponible: se usa búsqueda simple, sin orden por relevancia.")
+
+        self.query_entry.focus()
+
+    def run_search(self):
+        text = self.query_entry.get().strip()
+        self.tree.delete(*self.tree.get_children())
+        self.results = {}
+        if not text: return
+
+        node_display = self.node_combobox.get()
+        channel = self.channel_combobox.get()
+        filters = {
+            "scope": SCOPES.get(self.scope_combobox.get(), "all"),
+            "node_id": None if node_display == "Todos" else self.app.get_full_node_id_from_display(node_display),
+            "channel": None if channel == "Todos" else int(channel),
+            "limit": config.SEARCH_RESULTS_LIMIT,
+        }
+        if self.use_dates.get():
+            filters["start_date"] = self.start_date_entry.get_date().strftime("%Y-%m-%dT00:00:00")
+            filters["end_date"] = self.end_date_entry.get_date().strftime("%Y-%m-%dT23:59:59.999999")
+
+        rows = self.db.search(text, **filters)
+        for row in rows:
+            kind, _, timestamp, node_id, alias, snippet, extra, _ = row
+            node_text = f"{alias} ({node_id[-4:]})" if alias else (node_id or "N/A")
+            iid = self.tree.insert("", "end", values=(kind, timestamp[:19].replace('T', ' '), node_text, snippet.replace("\n", " "), extra))
+            self.results[iid] = row
+        self.status_label.configure(text=f"{len(rows)} resultado(s).")
+
+    def open_result(self, event=None):
+        """Lleva al nodo del resultado seleccionado."""
+        selection = self.tree.selection()
+        if not selection: return
+        node_id = self.results[selection[0]][3]
+        if node_id and node_id.startswith("!"):
+            self.app.select_node_and_switch_tab(node_id)
@@ -2,8 +2,13 @@
 # ### ARCHIVO: tabs/serial_monitor_tab.py ###
 # =============================================================================
 import customtkinter as ctk
+import collections
 import queue
 from datetime import datetime
+import config
+from serial_log import SerialLogStore
+
+LOG_LEVELS = ["Todos", "DEBUG", "INFO", "WARNING", "ERROR", "CONTROL", "RECV", "SENT", "HEARTBEAT", "PROFILE"]
 
 class SerialMonitorTab(ctk.CTkFrame):
     def __init__(self, master, app_instance):
@@ -11,19 +16,150 @@ class SerialMonitorTab(ctk.CTkFrame):
         self.app = app_instance
         self.log_queue = app_instance.log_queue # Referencia directa a la cola
 
+        # Índice en memoria de los últimos mensajes: (posición en el log, timestamp, nivel, texto)
+        self.log_index = collections.deque(maxlen=config.SERIAL_MONITOR_INDEX_SIZE)
+        self.log_store = SerialLogStore(config.SERIAL_LOG_FILE, config.SERIAL_LOG_MAX_BYTES)
+        # Entradas que hay en el widget: (posición, número de líneas)
+        self.displayed = collections.deque()
+        self.displayed_lines = 0
+        self.follow = True
+
         self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(0, weight=1)
-        
+        self.grid_rowconfigure(1, weight=1)
+
+        controls_frame = ctk.CTkFrame(self, fg_color="transparent")
+        controls_frame.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="ew")
+        ctk.CTkLabel(controls_frame, text="Nivel:").pack(side="left", padx=(0, 5))
+        self.level_filter = ctk.CTkComboBox(controls_frame, values=LOG_LEVELS, width=130, command=lambda _: self.refresh_view())
+        self.level_filter.set("Todos")
+        self.level_filter.pack(side="left", padx=(0, 15))
+        ctk.CTkLabel(controls_frame, text="Nodo:").pack(side="left", padx=(0, 5))
+        self.node_filter = ctk.CTkEntry(controls_frame, placeholder_text="ID o sufijo", width=120)
+        self.node_filter.pack(side="left")
+        self.node_filter.bind("<Return>", lambda e: self.refresh_view())
+        ctk.CTkButton(controls_frame, text="Seguir en Vivo", width=110, command=self.refresh_view).pack(side="right")
+        ctk.CTkButton(controls_frame, text="Cargar Anteriores", width=130, command=self.load_older).pack(side="right", padx=10)
+
         self.serial_monitor_textbox = ctk.CTkTextbox(self, state="disabled", font=ctk.CTkFont(family="monospace", size=12))
-        self.serial_monitor_textbox.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.serial_monitor_textbox.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+
+    @staticmethod
+    def normalize(message):
+        """Convierte un mensaje de la cola ((nivel, texto) o texto suelto) en (timestamp, nivel, texto)."""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(message, tuple) and len(message) == 2:
+            return (timestamp, str(message[0]), str(message[1]))
+        return (timestamp, "INFO", str(message))
+
+    @staticmethod
+    def format_entry(timestamp, level, text):
+        return f"[{timestamp[11:]}] [{level}] {text}\n"
+
+    def matches(self, level, text):
+        level_filter = self.level_filter.get()
+        if level_filter != "Todos" and level != level_filter:
+            return False
+        node_filter = self.node_filter.get().strip()
+        return not node_filter or node_filter in text
 
     def process_log_queue(self):
+        batch = []
         try:
             while not self.log_queue.empty():
-                message = self.log_queue.get_nowait()
-                self.serial_monitor_textbox.configure(state="normal")
-                self.serial_monitor_textbox.insert("end", f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
-                self.serial_monitor_textbox.configure(state="disabled")
-                self.serial_monitor_textbox.see("end")
+                batch.append(self.normalize(self.log_queue.get_nowait()))
         except queue.Empty:
-            pass
\ No newline at end of file
+            pass
+        if not batch: return
+
+        positions = self.log_store.append(batch)
+        new_entries = [(pos,) + entry for pos, entry in zip(positions, batch)]
+        self.log_index.extend(new_entries)
+
+        # Mientras se revisan mensajes antiguos la vista no se toca
+        if not self.follow: return
+        self.append_entries([e for e in new_entries if self.matches(e[2], e[3])])
+
+    def append_entries(self, entries):
+        """Inserta un lote de entradas al final con una sola operación y recorta el inicio."""
+        if not entries: return
+        textbox = self.serial_monitor_textbox
+        at_bottom = textbox.yview()[1] >= 0.999
+        chunks = []
+        for position, timestamp, level, text in entries:
+            line = self.format_entry(timestamp, level, text)
+            chunks.append(line)
+            n_lines = line.count("\n")
+            self.displayed.append((position, n_lines))
+            self.displayed_lines += n_lines
+
+        textbox.configure(state="normal")
+        textbox.insert("end", "".join(chunks))
+        excess_lines = 0
+        while self.displayed_lines - excess_lines > config.SERIAL_MONITOR_MAX_LINES and len(self.displayed) > 1:
+            excess_lines += self.displayed.popleft()[1]
+        if excess_lines:
+            textbox.delete("1.0", f"{excess_lines + 1}.0")
+            self.displayed_lines -= excess_lines
+        textbox.configure(state="disabled")
+        if at_bottom:
+            textbox.see("end")
+
+    def refresh_view(self):
+        """Vuelve a pintar los mensajes más recientes que cumplen los filtros desde el índice en memoria."""
+        self.follow = True
+        selected, lines = [], 0
+        for entry in reversed(self.log_index):
+            if lines >= config.SERIAL_MONITOR_MAX_LINES: break
+            if self.matches(entry[2], entry[3]):
+                selected.append(entry)
+                lines += self.format_entry(*entry[1:]).count("\n")
+
+        textbox = self.serial_monitor_textbox
+        textbox.configure(state="normal")
+        textbox.delete("1.0", "end")
+        textbox.configure(state="disabled")
+        self.displayed.clear()
+        self.displayed_lines = 0
+        self.append_entries(selected[::-1])
+        textbox.see("end")
+
+    def load_older(self):
+        """Antepone mensajes anteriores leídos del log persistente (no de la memoria del widget)."""
+        if self.displayed:
+            position = self.displayed[0][0]
+        elif self.log_index:
+            position = self.log_index[-1][0]
+        else:
+            return
+        self.follow = False
+
+        older = []
+        for _ in range(config.SERIAL_LOG_MAX_READS):
+            page = self.log_store.read_before(position, config.SERIAL_MONITOR_PAGE_SIZE)
+            if not page: break
+            position = page[0][0]
+            older[:0] = [(pos,) + tuple(entry) for pos, entry in page if self.matches(entry[1], entry[2])]
+            if len(older) >= config.SERIAL_MONITOR_PAGE_SIZE: break
+        if not older: return
+
+        chunks, new_displayed = [], []
+        for position, timestamp, level, text in older:
+            line = self.format_entry(timestamp, level, text)
+            chunks.append(line)
+            new_displayed.append((position, line.count("\n")))
+
+        textbox = self.serial_monitor_textbox
+        textbox.configure(state="normal")
+        textbox.insert("1.0", "".join(chunks))
+        self.displayed.extendleft(reversed(new_displayed))
+        self.displayed_lines += sum(n for _, n in new_displayed)
+        # Se recortan los mensajes más recientes para respetar el límite de líneas
+        excess_lines = 0
+        while self.displayed_lines - excess_lines > config.SERIAL_MONITOR_MAX_LINES and len(self.displayed) > 1:
+            excess_lines += self.displayed.pop()[1]
+        if excess_lines:
+            first_deleted = self.displayed_lines - excess_lines + 1
+            textbox.delete(f"{first_deleted}.0", "end")
+            self.displayed_lines -= excess_lines
+        textbox.configure(state="disabled")
+        textbox.see("1.0")
@@ -6,6 +6,7 @@ from tkinter import simpledialog, messagebox
 import json
 import os
 from PIL import Image
+import config
 
 class SettingsWindow(ctk.CTkToplevel):
     def __init__(self, master, app_instance, channel_names, node_list):
@@ -279,6 +280,14 @@ class SettingsWindow(ctk.CTkToplevel):
         ctk.CTkLabel(action_frame, text="Mensaje de Alerta:").grid(row=2, column=0, padx=10, pady=5, sticky="w")
         self.action_message_entry = ctk.CTkEntry(action_frame, placeholder_text="T: {temperature}, H: {humidity}")
         self.action_message_entry.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+
+        ctk.CTkLabel(action_frame, text="Enfriamiento (s):").grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        self.action_cooldown_entry = ctk.CTkEntry(action_frame, placeholder_text=f"{config.RULE_DEFAULT_COOLDOWN_S}")
+        self.action_cooldown_entry.grid(row=3, column=1, padx=10, pady=5, sticky="ew")
+
+        ctk.CTkLabel(action_frame, text="Histéresis:").grid(row=4, column=0, padx=10, pady=5, sticky="w")
+        self.action_hysteresis_entry = ctk.CTkEntry(action_frame, placeholder_text="Margen para rearmar la regla, p. ej. 1.5")
+        self.action_hysteresis_entry.grid(row=4, column=1, padx=10, pady=5, sticky="ew")
         
         ctk.CTkButton(add_frame, text="Guardar Nueva Regla", command=self.add_new_rule).grid(row=4, column=0, columnspan=4, pady=10)
 
@@ -343,10 +352,20 @@ class SettingsWindow(ctk.CTkToplevel):
                 messagebox.showerror("Error", f"El valor '{row_data['value'].get()}' no es un número válido.", parent=self)
                 return
         action = {"type": "notify_channel", "channel_name": channel, "message": message}
+        try:
+            if self.action_cooldown_entry.get().strip():
+                action["cooldown_s"] = float(self.action_cooldown_entry.get())
+            if self.action_hysteresis_entry.get().strip():
+                action["hysteresis"] = float(self.action_hysteresis_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "El enfriamiento y la histéresis deben ser números.", parent=self)
+            return
         self.db.add_bot_rule(alias, conditions, action)
         self.update_rules_list_view()
         self.rule_alias_entry.delete(0, 'end')
         self.action_message_entry.delete(0, 'end')
+        self.action_cooldown_entry.delete(0, 'end')
+        self.action_hysteresis_entry.delete(0, 'end')
         for i in range(len(self.condition_rows) -1, 0, -1): self.remove_condition_row(i)
         self.condition_rows[0]['value'].delete(0, 'end')
         messagebox.showinfo("Éxito", "Regla añadida correctamente.", parent=self)
@@ -366,7 +385,13 @@ class SettingsWindow(ctk.CTkToplevel):
                 action = json.loads(action_json)
                 conditions_str = " Y ".join([f"{c['metric']} {c['operator']} {c['value']}" for c in conditions])
                 action_str = f"-> Notificar a '{action['channel_name']}'"
-                rule_text = f"'{alias}':  SI ({conditions_str}) ENTONCES {action_str}"
+                cooldown = action.get('cooldown_s', config.RULE_DEFAULT_COOLDOWN_S)
+                stats = self.app.data_processor.rule_throttle.get_stats(rule_id)
+                suppressed = stats['hysteresis'] + stats['cooldown'] + stats['rate']
+                rule_text = (f"'{alias}':  SI ({conditions_str}) ENTONCES {action_str}\n"
+                             f"Enfriamiento: {cooldown:g}s, histéresis: {action.get('hysteresis', 0):g} | "
+                             f"Disparos: {stats['fired']}, suprimidos: {suppressed} "
+                             f"(histéresis {stats['hysteresis']}, enfriamiento {stats['cooldown']}, límite global {stats['rate']})")
                 rule_frame = ctk.CTkFrame(self.rules_list_frame)
                 rule_frame.pack(fill="x", pady=2)
                 ctk.CTkLabel(rule_frame, text=rule_text, wraplength=700, justify="left").pack(side="left", padx=10, pady=5, expand=True, fill="x")
@@ -0,0 +1,150 @@
+# =============================================================================
+# ### ARCHIVO: timeseries_store.py ###
+# =============================================================================
+# Almacén en memoria, compartido por todo el proceso, de las lecturas
+# recientes de cada nodo. Lo alimenta directamente la ruta de ingesta y lo
+# leen todas las vistas, de modo que las gráficas no consultan SQLite.
+#
+# Cada nodo guarda columnas alineadas (una marca de tiempo y un valor por
+# métrica, None si la lectura no incluía esa métrica) con tamaño máximo fijo.
+# Cuando se supera el número máximo de nodos se descarta el menos usado (LRU).
+import collections
+import threading
+from datetime import datetime
+
+METRICS = ('temperature', 'humidity', 'pressure', 'iaq', 'battery')
+STORED_METRICS = ('temperature', 'humidity', 'pressure', 'iaq')    # Las que guarda la tabla readings
+SAME_READING_WINDOW_S = 5   # Una fila precargada así de cercana y con los mismos valores es la misma lectura
+
+class TimeSeriesStore:
+    def __init__(self, max_points, max_nodes, loader=None):
+        self.max_points = max_points
+        self.max_nodes = max_nodes
+        self.loader = loader # Función (node_id, limit) -> filas (timestamp, *METRICS) para nodos sin datos
+        self.nodes = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def _new_buffer(self):
+        buffer = {'timestamps': collections.deque(maxlen=self.max_points)}
+        for metric in METRICS:
+            buffer[metric] = collections.deque(maxlen=self.max_points)
+        return buffer
+
+    def _touch(self, node_id):
+        """Devuelve el buffer del nodo marcándolo como el más reciente (requiere el lock)."""
+        buffer = self.nodes.get(node_id)
+        if buffer is None:
+            buffer = self._new_buffer()
+            self.nodes[node_id] = buffer
+            while len(self.nodes) > self.max_nodes:
+                self.nodes.popitem(last=False)
+        else:
+            self.nodes.move_to_end(node_id)
+        return buffer
+
+    def _append_row(self, buffer, timestamp, values):
+        buffer['timestamps'].append(timestamp)
+        for metric in METRICS:
+            buffer[metric].append(values.get(metric))
+
+    def append(self, node_id, data, timestamp=None):
+        """Añade una lectura procesada (dict con las métricas) al buffer del nodo."""
+        if not any(data.get(metric) is not None for metric in METRICS):
+            return
+        timestamp = timestamp or datetime.now()
+        with self.lock:
+            if node_id not in self.nodes:
+                self._load(node_id)
+                # La lectura suele estar ya en la BD (insert_reading va antes): se sustituye
+                # la fila precargada en lugar de duplicarla
+                self._drop_loaded_copy(self.nodes[node_id], timestamp, data)
+            self._append_row(self._touch(node_id), timestamp, data)
+
+    def _drop_loaded_copy(self, buffer, timestamp, data):
+        if not buffer['timestamps']: return
+        if abs((timestamp - buffer['timestamps'][-1]).total_seconds()) > SAME_READING_WINDOW_S: return
+        if any(buffer[metric][-1] != data.get(metric) for metric in STORED_METRICS): return
+        for column in buffer.values():
+            column.pop()
+
+    def _load(self, node_id):
+        """Precarga el buffer de un nodo desde la base de datos (requiere el lock)."""
+        buffer = self._touch(node_id)
+        if not self.loader: return
+        for row in self.loader(node_id, self.max_points):
+            timestamp, values = row[0], dict(zip(METRICS, row[1:]))
+            self._append_row(buffer, datetime.fromisoformat(timestamp), values)
+
+    def has_node(self, node_id):
+        with self.lock:
+            return node_id in self.nodes
+
+    def get_series(self, node_id, metrics, require_all=True):
+        """Devuelve {'timestamps': [...], metric: [...]} con copias de las columnas pedidas.
+
+        Con require_all=True solo se incluyen las lecturas en las que todas las
+        métricas pedidas tienen valor (como espera la gráfica de sensores).
+        """
+        with self.lock:
+            if node_id not in self.nodes:
+                self._load(node_id)
+            buffer = self._touch(node_id)
+            columns = [buffer['timestamps']] + [buffer[m] for m in metrics]
+            rows = list(zip(*columns))
+
+        series = {'timestamps': []}
+        for metric in metrics: series[metric] = []
+        for row in rows:
+            values = row[1:]
+            if require_all and any(v is None for v in values):
+                continue
+            series['timestamps'].append(row[0])
+            for metric, value in zip(metrics, values):
+                series[metric].append(value)
+        return series
+
+    def get_graph_data(self, node_id):
+        return self.get_series(node_id, ('temperature', 'humidity'))
+
+    def get_latest(self, node_id):
+        """Último valor conocido de cada métrica del nodo en memoria, o None."""
+        with self.lock:
+            buffer = self.nodes.get(node_id)
+            if not buffer or not buffer['timestamps']:
+                return None
+            latest = {'timestamp': buffer['timestamps'][-1]}
+            for metric in METRICS:
+                latest[metric] = next((v for v in reversed(buffer[metric]) if v is not None), None)
+            return latest
+
+    def get_all_latest(self):
+        """Últimos valores de todos los nodos en memoria: {node_id: {...}}."""
+        with self.lock:
+            node_ids = list(self.nodes)
+        latest = {}
+        for node_id in node_ids:
+            values = self.get_latest(node_id)
+            if values: latest[node_id] = values
+        return latest
+
+    def export_state(self):
+        with self.lock:
+            return {
+                node_id: {
+                    'timestamps': [ts.isoformat() for ts in buffer['timestamps']],
+                    **{metric: list(buffer[metric]) for metric in METRICS},
+                }
+                for node_id, buffer in self.nodes.items()
+            }
+
+    def import_state(self, state):
+        with self.lock:
+            for node_id, columns in state.items():
+                try:
+                    buffer = self._touch(node_id)
+                    buffer['timestamps'].extend(datetime.fromisoformat(ts) for ts in columns['timestamps'])
+                    for metric in METRICS:
+                        values = columns.get(metric) or [None] * len(columns['timestamps'])
+                        buffer[metric].extend(values)
+                except (KeyError, TypeError, ValueError):
+                    self.nodes.pop(node_id, None)
@@ -0,0 +1,185 @@
+# =============================================================================
+# ### ARCHIVO: tx_queue.py ###
+# =============================================================================
+# Cola única de transmisión hacia la malla. Los mensajes salen por prioridad
+# (actuadores antes que mensajes del usuario y estos antes que las alertas del
+# bot), espaciados según el ciclo de trabajo (duty cycle) de la región. Los que
+# piden ACK se siguen de forma asíncrona y se reintentan si no llega a tiempo.
+import heapq
+import itertools
+import threading
+import time
+
+from metrics import TX_MESSAGES
+
+PRIORITY_CONTROL = 0    # Comandos de actuadores
+PRIORITY_USER = 1       # Mensajes y comandos enviados a mano
+PRIORITY_BOT = 2        # Avisos automáticos de las reglas del bot
+PRIORITY_POLL = 3       # Solicitudes periódicas de posición/telemetría
+
+KIND_TEXT = "text"
+KIND_POSITION_REQUEST = "position_request"
+
+class OutboundMessage:
+    def __init__(self, msg_id, text, destination_id, channel_index, want_ack, priority, on_result, not_before, kind=KIND_TEXT):
+        self.msg_id = msg_id
+        self.kind = kind
+        self.text = text
+        self.destination_id = destination_id
+        self.channel_index = channel_index
+        self.want_ack = want_ack
+        self.priority = priority
+        self.on_result = on_result      # on_result(mensaje, éxito), llamado desde el hilo de transmisión
+        self.not_before = not_before    # No se envía antes de este instante (epoch)
+        self.attempts = 0
+        self.packet_id = None
+        self.ack_deadline = None
+
+class TxScheduler:
+    def __init__(self, transmit, log_queue, duty_cycle, bitrate_bps, ack_timeout_s, max_retries, overhead_bytes=32):
+        self.transmit = transmit        # transmit(mensaje) -> id de paquete; lanza excepción si falla
+        self.log_queue = log_queue
+        self.duty_cycle = duty_cycle
+        self.bitrate_bps = bitrate_bps
+        self.ack_timeout_s = ack_timeout_s
+        self.max_retries = max_retries
+        self.overhead_bytes = overhead_bytes
+
+        self.ready = []         # (prioridad, secuencia, mensaje)
+        self.delayed = []       # (not_before, secuencia, mensaje)
+        self.awaiting_ack = {}  # id de paquete -> mensaje
+        self.early_acks = {}    # id de paquete -> (éxito, instante): ACK llegado antes de registrar el envío
+        self.next_tx_time = 0.0
+        self.sequence = itertools.count()
+        self.ids = itertools.count(1)
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def airtime(self, message):
+        """Tiempo en el aire estimado (s) del mensaje con la tasa de datos configurada."""
+        return (len(message.text.encode("utf-8")) + self.overhead_bytes) * 8 / self.bitrate_bps
+
+    def spacing(self, message):
+        # Tras emitir durante t segundos hay que callar t * (1/duty_cycle - 1)
+        return self.airtime(message) / self.duty_cycle
+
+    def enqueue(self, text, destination_id=None, channel_index=0, want_ack=False, priority=PRIORITY_USER, on_result=None, delay_s=0, kind=KIND_TEXT):
+        message = OutboundMessage(next(self.ids), text, destination_id, channel_index, want_ack, priority, on_result, time.time() + delay_s, kind)
+        with self.condition:
+            self._push(message)
+            self.condition.notify()
+        return message
+
+    def _push(self, message):
+        if message.not_before > time.time():
+            heapq.heappush(self.delayed, (message.not_before, next(self.sequence), message))
+        else:
+            heapq.heappush(self.ready, (message.priority, next(self.sequence), message))
+
+    def on_ack(self, packet_id, success):
+        """Confirmación (o rechazo) de la malla para un paquete enviado con want_ack."""
+        with self.condition:
+            message = self.awaiting_ack.pop(packet_id, None)
+            if message is None:
+                # Puede llegar mientras transmit() aún no ha devuelto el id: se guarda para _send
+                now = time.time()
+                self.early_acks = {pid: ack for pid, ack in self.early_acks.items() if now - ack[1] < self.ack_timeout_s}
+                self.early_acks[packet_id] = (success, now)
+                return
+        self._apply_ack(message, success)
+
+    def _apply_ack(self, message, success):
+        if success:
+            self._finish(message, True)
+        else:
+            self.log_queue.put(("WARNING", f"El destino rechazó el mensaje #{message.msg_id}."))
+            self._retry_or_fail(message)
+
+    def depth(self):
+        with self.condition:
+            return len(self.ready) + len(self.delayed) + len(self.awaiting_ack)
+
+    def pending(self):
+        """Mensajes pendientes con el tiempo estimado (s) hasta su envío: [(mensaje, eta)]."""
+        now = time.time()
+        with self.condition:
+            queued = [m for _, _, m in sorted(self.ready, key=lambda e: e[:2])]
+            delayed = [m for _, _, m in sorted(self.delayed, key=lambda e: e[:2])]
+        result, t = [], max(now, self.next_tx_time)
+        for message in queued:
+            result.append((message, t - now))
+            t += self.spacing(message)
+        for message in delayed:
+            start = max(t, message.not_before)
+            result.append((message, start - now))
+            t = start + self.spacing(message)
+        return result
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                now = time.time()
+                while self.delayed and self.delayed[0][0] <= now:
+                    _, _, message = heapq.heappop(self.delayed)
+                    heapq.heappush(self.ready, (message.priority, next(self.sequence), message))
+
+                expired = [m for m in self.awaiting_ack.values() if m.ack_deadline <= now]
+                for message in expired:
+                    del self.awaiting_ack[message.packet_id]
+
+                message = None
+                if self.ready and self.next_tx_time <= now:
+                    _, _, message = heapq.heappop(self.ready)
+                    self.next_tx_time = now + self.spacing(message)
+                else:
+                    # Esperar al siguiente evento: hueco de transmisión, mensaje diferido o plazo de ACK
+                    wake_times = [m.ack_deadline for m in self.awaiting_ack.values()]
+                    if self.ready: wake_times.append(self.next_tx_time)
+                    if self.delayed: wake_times.append(self.delayed[0][0])
+                    if not expired:
+                        self.condition.wait(timeout=max(0.01, min(wake_times) - now) if wake_times else None)
+                        continue
+
+            for timed_out in expired:
+                self.log_queue.put(("WARNING", f"Sin ACK para el mensaje #{timed_out.msg_id} tras {self.ack_timeout_s}s."))
+                self._retry_or_fail(timed_out)
+            if message is not None:
+                self._send(message)
+
+    def _send(self, message):
+        message.attempts += 1
+        try:
+            message.packet_id = self.transmit(message)
+        except Exception as e:
+            self.log_queue.put(("ERROR", f"Error al transmitir el mensaje #{message.msg_id}: {e}"))
+            self._finish(message, False)
+            return
+        if message.want_ack and message.packet_id is not None:
+            with self.condition:
+                early = self.early_acks.pop(message.packet_id, None)
+                if early is None:
+                    message.ack_deadline = time.time() + self.ack_timeout_s
+                    self.awaiting_ack[message.packet_id] = message
+                    self.condition.notify()
+            if early is not None: self._apply_ack(message, early[0])
+        else:
+            self._finish(message, True)
+
+    def _retry_or_fail(self, message):
+        if message.attempts <= self.max_retries:
+            TX_MESSAGES.inc(result="retried")
+            self.log_queue.put(("INFO", f"Reintentando mensaje #{message.msg_id} ({message.attempts}/{self.max_retries})."))
+            with self.condition:
+                heapq.heappush(self.ready, (message.priority, next(self.sequence), message))
+                self.condition.notify()
+        else:
+            self._finish(message, False)
+
+    def _finish(self, message, success):
+        TX_MESSAGES.inc(result="sent" if success else "failed")
+        if message.on_result:
+            try:
+                message.on_result(message, success)
+            except Exception as e:
+                self.log_queue.put(("ERROR", f"Error en la respuesta del mensaje #{message.msg_id}: {e}"))
@@ -1,9 +1,10 @@
 # =============================================================================
 # ### ARCHIVO: utils.py ###
 # =============================================================================
-import matplotlib.patches as mpatches
-import numpy as np
-import matplotlib.dates as mdates
+import math
+
+# matplotlib se importa dentro de las funciones de dibujo para que las
+# conversiones de unidades puedan usarse sin cargar la pila gráfica.
 
 def convert_temp(value, unit_pref):
     """Convierte temperatura a la unidad preferida por el usuario."""
@@ -23,6 +24,7 @@ def convert_pressure(value, unit_pref):
 
 def create_gauge(ax, label, value, min_val, max_val, unit, color):
     """Dibuja un único medidor (gauge) en un eje de Matplotlib (ax)."""
+    import matplotlib.patches as mpatches
     ax.clear()
     ax.set_facecolor("#242424")
     ax.set_aspect('equal')
@@ -31,7 +33,7 @@ def create_gauge(ax, label, value, min_val, max_val, unit, color):
     angle, value_display, draw_wedge = 180, "--", False
     try:
         numeric_value = float(value)
-        if np.isfinite(numeric_value):
+        if math.isfinite(numeric_value):
             clipped = max(min_val, min(max_val, numeric_value))
             norm_value = (clipped - min_val) / (max_val - min_val)
             angle = 180 * (1 - norm_value)
@@ -75,8 +77,13 @@ def create_multi_gauge(ax, title, temp_val, temp_unit, hum_val, pres_val, pres_u
     ax.text(0.05, 0.2, "Presión", ha='left', va='center', fontsize=12, color='gray')
     ax.text(0.95, 0.2, f"{pres_val or '--':>5} {pres_unit}", ha='right', va='center', fontsize=16, color=pres_color, family='monospace')
 
-def draw_graph_widget(ax_temp, ax_hum, data):
-    """Dibuja una gráfica de sensores en los ejes proporcionados."""
+def draw_graph_widget(ax_temp, ax_hum, data, xlim=None):
+    """Dibuja una gráfica de sensores en los ejes proporcionados.
+
+    Si se indica xlim (en unidades de fecha de matplotlib) se fija esa ventana
+    y el formato del eje se adapta a su duración.
+    """
+    import matplotlib.dates as mdates
     ax_temp.clear()
     ax_hum.clear()
     ax_temp.grid(True, linestyle='--', alpha=0.5, color='gray')
@@ -88,4 +95,8 @@ def draw_graph_widget(ax_temp, ax_hum, data):
     ax_temp.set_ylim(0, 50)
     ax_hum.set_ylim(0, 100)
     ax_temp.figure.autofmt_xdate()
-    ax_temp.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
\ No newline at end of file
+    date_format = '%H:%M:%S'
+    if xlim is not None:
+        ax_temp.set_xlim(*xlim)
+        if xlim[1] - xlim[0] > 1: date_format = '%d/%m %H:%M'
+    ax_temp.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
\ No newline at end of file